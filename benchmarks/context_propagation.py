@@ -0,0 +1,76 @@
+"""Verifica che job, priorità ed eventi della run raggiungano le chiamate LLM degli agenti.
+
+CrewAI esegue gli agenti con ``max_execution_time`` in un thread proprio. La
+verifica esegue lo stesso task con timeout, contro un :class:`FakeOllama`, con
+l'``Agent`` di CrewAI e con :class:`~utils.async_crew.ContextAgent`, dentro
+``request_context(priority="interactive")`` e con un :class:`RunEventLog`
+attivo. Per ciascuno controlla la priorità vista da
+:class:`~llm.request_scheduler.RequestScheduler` e gli eventi ``llm_call`` /
+``prompt_eval`` registrati. Esce con codice 1 se ``ContextAgent`` non li propaga.
+
+Esecuzione::
+
+    poetry run python -m benchmarks.context_propagation
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import sys
+from typing import Any, Dict
+
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+
+from crewai import Agent, Crew, Task  # noqa: E402
+
+from benchmarks.fake_ollama import FakeOllama  # noqa: E402
+from llm.concurrency import get_default_limiter, set_default_limiter  # noqa: E402
+from llm.local_llm_tool import LocalLLMTool  # noqa: E402
+from llm.request_scheduler import RequestScheduler, request_context  # noqa: E402
+from utils.async_crew import ContextAgent, kickoff_crew  # noqa: E402
+from utils.run_events import RunEventLog, current_run_events  # noqa: E402
+
+
+async def run_case(agent_cls: type, tool: LocalLLMTool) -> Dict[str, Any]:
+    scheduler = RequestScheduler(default_limit=1)
+    previous = get_default_limiter()
+    set_default_limiter(scheduler)
+    events = RunEventLog()
+    kinds = []
+    events.subscribe(lambda event: kinds.append(event["kind"]))
+    agent = agent_cls(role="Verificatore", goal="Rispondere", backstory="Test", llm=tool.llm, max_execution_time=30)
+    task = Task(description="Rispondi 'ok' a {domanda}", expected_output="ok", agent=agent)
+    token = current_run_events.set(events)
+    try:
+        with request_context("job-verifica", priority="interactive"):
+            await kickoff_crew(Crew(agents=[agent], tasks=[task]), inputs={"domanda": "ping"})
+    finally:
+        current_run_events.reset(token)
+        set_default_limiter(previous)
+    priorities = scheduler.stats()["priorities"]
+    return {
+        "priorities": {priority: stats["granted"] for priority, stats in priorities.items()},
+        "llm_call": kinds.count("llm_call"),
+        "prompt_eval": kinds.count("prompt_eval"),
+    }
+
+
+def main() -> None:
+    with FakeOllama(models=["phi4"], reply="ok") as server:
+        tool = LocalLLMTool(model="ollama/phi4", base_url=server.url, temperature=0, coalesce=False)
+        results = {
+            "Agent": asyncio.run(run_case(Agent, tool)),
+            "ContextAgent": asyncio.run(run_case(ContextAgent, tool)),
+        }
+    print(json.dumps(results, indent=2))
+    propagated = results["ContextAgent"]
+    if set(propagated["priorities"]) != {"interactive"} or not propagated["llm_call"]:
+        print("❌ Il contesto della richiesta non raggiunge le chiamate LLM di ContextAgent.")
+        sys.exit(1)
+    print("✅ Priorità ed eventi della run raggiungono le chiamate LLM nel thread del timeout.")
+
+
+if __name__ == "__main__":
+    main()
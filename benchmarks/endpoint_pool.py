@@ -0,0 +1,99 @@
+"""Verifica di :class:`~llm.endpoint_pool.EndpointPool` contro più server Ollama finti.
+
+Avvia tre :class:`~benchmarks.fake_ollama.FakeOllama` locali e controlla:
+
+- **filtro per modello**: ``lento`` e ``veloce`` espongono ``phi4``, ``altro``
+  solo ``gemma3``. Le richieste ``phi4`` non raggiungono mai ``altro`` e il
+  warm-up precarica ``phi4`` solo dove è disponibile;
+- **least outstanding**: con richieste concorrenti l'endpoint ``veloce``, che
+  ha meno richieste in corso, ne serve più di ``lento``;
+- **salute**: un endpoint che risponde ``503`` a ``/api/tags`` esce dal pool
+  alla sonda successiva e vi rientra quando torna disponibile.
+
+Esce con codice 1 se un controllo fallisce.
+
+Esecuzione::
+
+    poetry run python -m benchmarks.endpoint_pool --requests 40 --concurrency 8
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+
+from benchmarks.fake_ollama import FakeOllama  # noqa: E402
+from llm.endpoint_pool import EndpointPool  # noqa: E402
+from llm.local_llm_tool import LocalLLMTool  # noqa: E402
+from llm.model_warmup import collect_warmup_targets  # noqa: E402
+
+MODEL = "ollama/phi4"
+
+
+def served(server: FakeOllama) -> int:
+    return sum(count for (path, _), count in server.requests.items() if path.startswith("/api/"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Verifica del pool di endpoint Ollama su server finti")
+    parser.add_argument("--requests", type=int, default=40, help="Richieste concorrenti. Default: 40")
+    parser.add_argument("--concurrency", type=int, default=8, help="Thread chiamanti. Default: 8")
+    args = parser.parse_args()
+
+    checks: List[Tuple[str, bool]] = []
+    with FakeOllama(models=["phi4"], delay=0.2) as slow, \
+            FakeOllama(models=["phi4"], delay=0.02) as fast, \
+            FakeOllama(models=["gemma3"]) as other:
+        names: Dict[str, FakeOllama] = {"lento": slow, "veloce": fast, "altro": other}
+        pool = EndpointPool([slow.url, fast.url, other.url], refresh_interval=3600)
+        tool = LocalLLMTool(model=MODEL, endpoint_pool=pool, temperature=0, coalesce=False)
+
+        available = sorted(ep.base_url for ep in pool.endpoints_for(MODEL))
+        checks.append(("filtro per modello", available == sorted([slow.url, fast.url])))
+        with tempfile.TemporaryDirectory() as tmp:
+            agents_yaml = Path(tmp) / "agents.yaml"
+            agents_yaml.write_text("verificatore:\n  role: r\n  goal: g\n  backstory: b\n  llm: small_llm\n", encoding="utf-8")
+            warmup = collect_warmup_targets({"small_llm": tool}, [agents_yaml])
+        checks.append(("warm-up solo dove c'è il modello", sorted(t.base_url for t in warmup) == available))
+
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            list(executor.map(lambda i: tool.run(f"richiesta {i}"), range(args.requests)))
+        counts = {name: served(server) for name, server in names.items()}
+        checks.append(("nessuna richiesta phi4 su 'altro'", counts["altro"] == 0))
+        checks.append(("least outstanding favorisce 'veloce'", counts["veloce"] > counts["lento"]))
+
+        slow.healthy = False
+        pool.refresh(force=True)
+        excluded = slow.url not in [ep.base_url for ep in pool.endpoints_for(MODEL)]
+        before = served(slow)
+        for i in range(5):
+            tool.run(f"dopo il guasto {i}")
+        checks.append(("endpoint non sano escluso", excluded and served(slow) == before))
+
+        slow.healthy = True
+        pool.refresh(force=True)
+        checks.append(("endpoint tornato disponibile", slow.url in [ep.base_url for ep in pool.endpoints_for(MODEL)]))
+
+        summary = {
+            "requests_per_endpoint": counts,
+            "peak_concurrency": {name: server.peak for name, server in names.items()},
+            "pool": {name: pool.stats()[server.url]["latency"] for name, server in names.items()},
+        }
+
+    print(json.dumps(summary, indent=2))
+    for name, ok in checks:
+        print(f"{'✅' if ok else '❌'} {name}")
+    if not all(ok for _, ok in checks):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Server Ollama finti (solo stdlib) per verifiche e benchmark senza modelli.
+
+Ogni :class:`FakeOllama` ascolta su una porta locale libera ed espone:
+
+- ``GET /api/tags``: i ``models`` dichiarati (usato da
+  :class:`~llm.endpoint_pool.EndpointPool` per salute e modelli disponibili);
+- ``POST /api/generate`` e ``POST /api/chat``: risposta ``reply`` (stringa o
+  funzione del corpo della richiesta) dopo ``delay`` secondi.
+
+Con ``healthy = False`` ogni richiesta riceve ``503``. Il server conta le
+richieste per percorso e modello e il massimo di richieste contemporanee::
+
+    with FakeOllama(models=["phi4"]) as server:
+        tool = LocalLLMTool(model="ollama/phi4", base_url=server.url)
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Union
+
+Reply = Union[str, Callable[[Dict[str, Any]], str]]
+
+
+class FakeOllama:
+    def __init__(self, models: Iterable[str] = ("phi4",), reply: Reply = "ok", delay: float = 0.0) -> None:
+        self.models: List[str] = [m if ":" in m else f"{m}:latest" for m in models]
+        self.reply = reply
+        self.delay = delay
+        self.healthy = True
+        self.requests: Counter = Counter()
+        self.bodies: List[Dict[str, Any]] = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-ollama", daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def __enter__(self) -> "FakeOllama":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _text(self, body: Dict[str, Any]) -> str:
+        return self.reply(body) if callable(self.reply) else self.reply
+
+    def _handler(self) -> type:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _send(self, status: int, payload: Dict[str, Any]) -> None:
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self) -> None:
+                if not fake.healthy:
+                    return self._send(503, {"error": "unavailable"})
+                if self.path.startswith("/api/tags"):
+                    return self._send(200, {"models": [{"name": m, "model": m} for m in fake.models]})
+                self._send(200, {"version": "0.0.0"})
+
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or "{}")
+                with fake._lock:
+                    fake.requests[(self.path, body.get("model"))] += 1
+                    fake.bodies.append(body)
+                    fake.active += 1
+                    fake.peak = max(fake.peak, fake.active)
+                try:
+                    if not fake.healthy:
+                        return self._send(503, {"error": "unavailable"})
+                    if fake.delay:
+                        time.sleep(fake.delay)
+                    text = fake._text(body)
+                    usage = {"done": True, "prompt_eval_count": 10, "eval_count": 5}
+                    if self.path.startswith("/api/chat"):
+                        self._send(200, {"model": body.get("model"), "message": {"role": "assistant", "content": text}, **usage})
+                    else:
+                        self._send(200, {"model": body.get("model"), "response": text, **usage})
+                finally:
+                    with fake._lock:
+                        fake.active -= 1
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        return Handler
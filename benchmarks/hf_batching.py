@@ -0,0 +1,162 @@
+"""Benchmark del backend ``huggingface`` con batching dinamico, senza rete.
+
+Costruisce in una cartella temporanea un modello GPT-2 minuscolo (pesi casuali)
+e un tokenizer BPE addestrato al volo, li carica con
+``LocalLLMTool(backend="huggingface")`` e invia ``--requests`` prompt distinti da
+``--concurrency`` thread. La stessa batteria gira una volta con batch da 1
+(una generazione alla volta) e una con ``--batch_size``; il report confronta
+throughput, latenza e dimensione media dei batch e verifica che il batching
+(greedy, padding a sinistra) non cambi le risposte.
+
+Esecuzione::
+
+    poetry run python -m benchmarks.hf_batching --requests 64 --concurrency 16 --batch_size 8
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List
+
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+
+from llm.local_llm_tool import LocalLLMTool  # noqa: E402
+
+CORPUS = [
+    "Il modello linguistico genera una sezione dell'articolo a partire dal titolo e dall'abstract.",
+    "La revisione editoriale segnala paragrafi poco chiari, ripetizioni e passaggi da approfondire.",
+    "Il codice Python di esempio viene validato, eseguito in isolamento e poi commentato.",
+    "Ogni sezione riassunta diventa contesto per la successiva, mantenendo coerenza e stile.",
+]
+
+
+def build_tiny_model(path: str | Path, layers: int = 2, hidden: int = 128, vocab_size: int = 512) -> Path:
+    """Modello causale e tokenizer locali, salvati in ``path`` nel formato di ``from_pretrained``."""
+    import torch
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+    from transformers import GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+
+    path = Path(path)
+    tokenizer = Tokenizer(models.BPE(unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    tokenizer.train_from_iterator(
+        CORPUS * 20,
+        trainers.BpeTrainer(
+            vocab_size=vocab_size,
+            special_tokens=["<pad>", "<eos>", "<unk>"],
+            initial_alphabet=pre_tokenizers.ByteLevel.alphabet(),
+        ),
+    )
+    hf_tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer, pad_token="<pad>", eos_token="<eos>", unk_token="<unk>", padding_side="left"
+    )
+    hf_tokenizer.save_pretrained(path)
+
+    torch.manual_seed(0)
+    config = GPT2Config(
+        vocab_size=len(hf_tokenizer),
+        n_positions=512,
+        n_embd=hidden,
+        n_layer=layers,
+        n_head=4,
+        bos_token_id=hf_tokenizer.eos_token_id,
+        eos_token_id=hf_tokenizer.eos_token_id,
+        pad_token_id=hf_tokenizer.pad_token_id,
+    )
+    GPT2LMHeadModel(config).save_pretrained(path)
+    return path
+
+
+def run_batch(tool: LocalLLMTool, prompts: List[str], concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+
+    def _call(prompt: str) -> str:
+        started = time.perf_counter()
+        text = tool.run(prompt).raw
+        latencies.append(time.perf_counter() - started)
+        return text
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outputs = list(pool.map(_call, prompts))
+    wall = time.perf_counter() - started
+    ordered = sorted(latencies)
+    return {
+        "outputs": outputs,
+        "wall_s": wall,
+        "latency_p50_s": statistics.median(ordered),
+        "latency_p95_s": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark batching dinamico del backend huggingface")
+    parser.add_argument("--requests", type=int, default=64, help="Prompt inviati per modalità. Default: 64")
+    parser.add_argument("--concurrency", type=int, default=16, help="Thread chiamanti. Default: 16")
+    parser.add_argument("--batch_size", type=int, default=8, help="Batch massimo della modalità a batch. Default: 8")
+    parser.add_argument("--wait_ms", type=float, default=10.0, help="Finestra di raccolta del batch. Default: 10")
+    parser.add_argument("--max_new_tokens", type=int, default=32, help="Token generati per richiesta. Default: 32")
+    parser.add_argument("--layers", type=int, default=2, help="Layer del modello minuscolo. Default: 2")
+    parser.add_argument("--hidden", type=int, default=128, help="Dimensione nascosta del modello. Default: 128")
+    parser.add_argument("--model_dir", default=None, help="Cartella del modello (default: temporanea, ricreata).")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_dir = Path(args.model_dir) if args.model_dir else build_tiny_model(Path(tmp) / "tiny", args.layers, args.hidden)
+        prompts = [f"{CORPUS[i % len(CORPUS)]} Richiesta {i}." for i in range(args.requests)]
+
+        results = {}
+        for mode, batch_size in (("sequenziale", 1), ("batch", args.batch_size)):
+            tool = LocalLLMTool(
+                model=str(model_dir),
+                backend="huggingface",
+                temperature=0,
+                coalesce=False,
+                max_new_tokens=args.max_new_tokens,
+                hf_max_batch_size=batch_size,
+                hf_batch_wait_ms=args.wait_ms,
+            )
+            tool.run("riscaldamento")
+            warmup = tool.batching_stats()
+            result = run_batch(tool, prompts, args.concurrency)
+            stats = tool.batching_stats()
+            requests = stats["requests"] - warmup["requests"]
+            batches = stats["batches"] - warmup["batches"]
+            tokens = stats["generated_tokens"] - warmup["generated_tokens"]
+            results[mode] = {
+                "max_batch_size": batch_size,
+                "requests_per_s": round(args.requests / result["wall_s"], 2),
+                "tokens_per_s": round(tokens / result["wall_s"], 1),
+                "latency_p50_s": round(result["latency_p50_s"], 3),
+                "latency_p95_s": round(result["latency_p95_s"], 3),
+                "mean_batch_size": round(requests / batches, 2) if batches else 0.0,
+                "wall_s": round(result["wall_s"], 2),
+                "outputs": result["outputs"],
+            }
+
+    sequential, batched = results["sequenziale"], results["batch"]
+    same = sum(a == b for a, b in zip(sequential.pop("outputs"), batched.pop("outputs")))
+    print(f"{'modalità':<12} {'batch':>5} {'req/s':>8} {'tok/s':>9} {'p50 s':>7} {'p95 s':>7} {'batch medio':>11}")
+    for mode, row in results.items():
+        print(
+            f"{mode:<12} {row['max_batch_size']:>5} {row['requests_per_s']:>8} {row['tokens_per_s']:>9} "
+            f"{row['latency_p50_s']:>7} {row['latency_p95_s']:>7} {row['mean_batch_size']:>11}"
+        )
+    summary = {
+        "speedup": round(batched["requests_per_s"] / sequential["requests_per_s"], 2),
+        "identical_outputs": f"{same}/{args.requests}",
+        "results": results,
+    }
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
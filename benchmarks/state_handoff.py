@@ -0,0 +1,154 @@
+"""Benchmark del passaggio di ``ArticleState`` tra i tre stage della pipeline.
+
+Confronta il passaggio storico (``super().__init__(**state.model_dump())`` più
+le ``deepcopy`` degli eventi CrewAI) con :class:`SharedStateFlowMixin` su uno
+stato sintetico grande. Ogni variante gira in un sottoprocesso separato, così
+il picco di RSS è misurato in modo indipendente.
+
+Esecuzione::
+
+    poetry run python -m benchmarks.state_handoff --sections 200 --paragraph_kb 8 --steps 40
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from typing import Any, Dict
+
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+
+from crewai.flow import Flow, listen, router, start, or_  # noqa: E402
+
+from schema.state import ArticleState  # noqa: E402
+from utils.flow_state import SharedStateFlowMixin  # noqa: E402
+
+STAGES = ("input_validator", "writing", "editing")
+
+
+def build_state(sections: int, paragraph_kb: int) -> ArticleState:
+    """Stato con ``sections`` sezioni complete di paragrafo, riassunto, istruzioni e codice."""
+    structure = [f"Sezione {i}" for i in range(sections)]
+    paragraph = ("Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 18)[:1024] * paragraph_kb
+    return ArticleState(
+        title="Benchmark",
+        abstract="Abstract " * 50,
+        structure=structure,
+        paragraphs={s: f"{s}\n{paragraph}" for s in structure},
+        section_summaries={s: f"{s}: {paragraph[:1024]}" for s in structure},
+        code_instructions={s: [f"{s}: {paragraph[:512]}"] for s in structure},
+        code_snippets={s: [f"# {s}\n" + "print('x')\n" * 400] for s in structure},
+        supervision_report={f"review_{i}": paragraph[:2048] for i in range(10)},
+    )
+
+
+def _legacy_init(self, state: ArticleState, steps: int) -> None:
+    super(type(self), self).__init__(**state.model_dump())
+    self.steps = steps
+
+
+def _shared_init(self, state: ArticleState, steps: int) -> None:
+    super(type(self), self).__init__()
+    self._adopt_state(state)
+    self.steps = steps
+
+
+def _stage_flow(name: str, bases: tuple, init) -> type:
+    """Flow con ``steps`` passi fittizi che toccano lo stato, come il loop per sezione.
+
+    ``FlowMeta`` registra solo i metodi dichiarati nel corpo della classe: per
+    questo le due varianti sono costruite dalla stessa factory.
+    """
+
+    class StageFlow(*bases):
+        __init__ = init
+
+        @start()
+        def begin(self):
+            self.state.current_section_index = 0
+
+        @router(or_(begin, "step"))
+        def check(self):
+            return "done" if self.state.current_section_index >= self.steps else "next"
+
+        @listen("next")
+        def step(self):
+            section = self.state.structure[self.state.current_section_index % len(self.state.structure)]
+            self.state.paragraphs[section] = self.state.paragraphs[section]
+            self.state.current_section_index += 1
+
+        @listen("done")
+        def finish(self):
+            return self.state
+
+    StageFlow.__name__ = StageFlow.__qualname__ = name
+    return StageFlow
+
+
+LegacyStageFlow = _stage_flow("LegacyStageFlow", (Flow[ArticleState],), _legacy_init)
+SharedStageFlow = _stage_flow("SharedStageFlow", (SharedStateFlowMixin, Flow[ArticleState]), _shared_init)
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss è in KiB su Linux, in byte su macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_variant(variant: str, sections: int, paragraph_kb: int, steps: int) -> Dict[str, Any]:
+    flow_class = LegacyStageFlow if variant == "legacy" else SharedStageFlow
+    state = build_state(sections, paragraph_kb)
+    baseline_rss = _peak_rss_mb()
+    stage_seconds = {}
+    started = time.perf_counter()
+    for stage in STAGES:
+        stage_started = time.perf_counter()
+        state = flow_class(state, steps).kickoff()
+        stage_seconds[stage] = round(time.perf_counter() - stage_started, 4)
+    return {
+        "variant": variant,
+        "total_seconds": round(time.perf_counter() - started, 4),
+        "stage_seconds": stage_seconds,
+        "baseline_rss_mb": round(baseline_rss, 1),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "peak_rss_delta_mb": round(_peak_rss_mb() - baseline_rss, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark passaggio ArticleState tra flow")
+    parser.add_argument("--sections", type=int, default=200, help="Sezioni dello stato sintetico. Default: 200")
+    parser.add_argument("--paragraph_kb", type=int, default=8, help="KiB per paragrafo. Default: 8")
+    parser.add_argument("--steps", type=int, default=40, help="Passi eseguiti da ciascuno stage. Default: 40")
+    parser.add_argument("--variant", choices=["legacy", "shared"], default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, args.sections, args.paragraph_kb, args.steps)))
+        return
+
+    results = []
+    for variant in ("legacy", "shared"):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.state_handoff", "--variant", variant,
+             "--sections", str(args.sections), "--paragraph_kb", str(args.paragraph_kb), "--steps", str(args.steps)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    for result in results:
+        print(
+            f"{result['variant']:>7}: {result['total_seconds']:8.3f}s totali "
+            f"| picco RSS {result['peak_rss_mb']:8.1f} MB (+{result['peak_rss_delta_mb']:.1f} MB sullo stato iniziale)"
+        )
+    legacy, shared = results
+    if shared["total_seconds"] > 0:
+        print(f"Speed-up: {legacy['total_seconds'] / shared['total_seconds']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Benchmark del riassunto estrattivo rispetto al riassunto LLM.
+
+Per ogni sezione misura la latenza del backend ``extractive`` e la
+sovrapposizione (ROUGE-1/2/L F1) con il riassunto LLM di riferimento. Il
+riferimento può arrivare da:
+
+- ``--state``: ``state.json`` di una run (``--run_dir``), che contiene già
+  paragrafi e ``section_summaries`` prodotti da ``phi4``; nessuna chiamata al modello;
+- ``--live_llm``: il riassunto LLM viene generato ora, misurandone anche la latenza.
+
+Esecuzione::
+
+    poetry run python -m benchmarks.summarizer --state runs/<id>/state.json
+    poetry run python -m benchmarks.summarizer --markdown outputs/articolo.md --live_llm
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import statistics
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from utils.context_summarizer_crew import SUMMARIZER_MODEL, summarize_section
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _f1(overlap: int, candidate: int, reference: int) -> float:
+    if not overlap or not candidate or not reference:
+        return 0.0
+    precision, recall = overlap / candidate, overlap / reference
+    return 2 * precision * recall / (precision + recall)
+
+
+def rouge_n(candidate: str, reference: str, n: int) -> float:
+    def grams(tokens: List[str]) -> Dict[Tuple[str, ...], int]:
+        counts: Dict[Tuple[str, ...], int] = {}
+        for i in range(len(tokens) - n + 1):
+            gram = tuple(tokens[i:i + n])
+            counts[gram] = counts.get(gram, 0) + 1
+        return counts
+
+    cand, ref = grams(_tokens(candidate)), grams(_tokens(reference))
+    overlap = sum(min(count, ref.get(gram, 0)) for gram, count in cand.items())
+    return _f1(overlap, sum(cand.values()), sum(ref.values()))
+
+
+def rouge_l(candidate: str, reference: str) -> float:
+    cand, ref = _tokens(candidate), _tokens(reference)
+    if not cand or not ref:
+        return 0.0
+    previous = [0] * (len(ref) + 1)
+    for token in cand:
+        current = [0]
+        for j, ref_token in enumerate(ref, start=1):
+            current.append(previous[j - 1] + 1 if token == ref_token else max(previous[j], current[j - 1]))
+        previous = current
+    return _f1(previous[-1], len(cand), len(ref))
+
+
+def load_sections(state_path: Optional[str], markdown_path: Optional[str]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """Paragrafi per sezione e, se disponibili, i riassunti LLM di riferimento."""
+    if state_path:
+        payload = json.loads(Path(state_path).read_text(encoding="utf-8"))
+        state = payload.get("state", payload)
+        return dict(state.get("paragraphs", {})), dict(state.get("section_summaries", {}))
+    text = Path(markdown_path).read_text(encoding="utf-8")
+    parts = re.split(r"^##\s+(.+)$", text, flags=re.MULTILINE)
+    return {title.strip(): body.strip() for title, body in zip(parts[1::2], parts[2::2])}, {}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark riassunto estrattivo vs LLM")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--state", help="state.json di una run con paragraphs e section_summaries.")
+    source.add_argument("--markdown", help="Articolo Markdown con sezioni '## Titolo'.")
+    parser.add_argument("--live_llm", action="store_true", help=f"Genera ora i riassunti di riferimento con {SUMMARIZER_MODEL}.")
+    parser.add_argument("--repeat", type=int, default=20, help="Ripetizioni per la latenza estrattiva. Default: 20")
+    args = parser.parse_args()
+
+    paragraphs, references = load_sections(args.state, args.markdown)
+    if not paragraphs:
+        raise ValueError("Nessuna sezione trovata nell'input.")
+
+    rows = []
+    for section, content in paragraphs.items():
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            summary = summarize_section(section, content, backend="extractive")
+        extractive_ms = (time.perf_counter() - started) * 1000 / args.repeat
+
+        llm_seconds = None
+        reference = references.get(section)
+        if args.live_llm:
+            started = time.perf_counter()
+            reference = summarize_section(section, content, backend="llm")
+            llm_seconds = time.perf_counter() - started
+
+        row = {"section": section, "extractive_ms": extractive_ms, "llm_s": llm_seconds}
+        if reference:
+            row.update(
+                rouge1=rouge_n(summary, reference, 1),
+                rouge2=rouge_n(summary, reference, 2),
+                rougeL=rouge_l(summary, reference),
+            )
+        rows.append(row)
+
+    print(f"{'sezione':<40} {'estr. ms':>9} {'LLM s':>7} {'R-1':>6} {'R-2':>6} {'R-L':>6}")
+    for row in rows:
+        llm = f"{row['llm_s']:.2f}" if row["llm_s"] is not None else "-"
+        scores = [f"{row[k]:.3f}" if k in row else "-" for k in ("rouge1", "rouge2", "rougeL")]
+        print(f"{row['section'][:40]:<40} {row['extractive_ms']:>9.2f} {llm:>7} {scores[0]:>6} {scores[1]:>6} {scores[2]:>6}")
+
+    summary = {"sections": len(rows), "extractive_ms_mean": round(statistics.mean(r["extractive_ms"] for r in rows), 3)}
+    llm_times = [r["llm_s"] for r in rows if r["llm_s"] is not None]
+    if llm_times:
+        summary["llm_s_mean"] = round(statistics.mean(llm_times), 3)
+        summary["speedup"] = round(summary["llm_s_mean"] * 1000 / summary["extractive_ms_mean"], 1)
+    for key in ("rouge1", "rouge2", "rougeL"):
+        values = [r[key] for r in rows if key in r]
+        if values:
+            summary[f"{key}_mean"] = round(statistics.mean(values), 3)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,9 @@ from pathlib import Path
 from crews.editing.flow import EditingFlow
 from schema.state import ArticleState
 from utils.config_loader import build_agents_from_yaml, build_tasks_from_yaml
+from utils.incremental import BuildCache
+from utils.section_artifacts import SectionArtifactWriter
+from utils.section_supervision import SectionSupervisionBuffer
 
 config_dir = Path(__file__).parent
 
@@ -12,17 +15,23 @@ class EditingCrew:
                  state: ArticleState,
                  agent_yaml_path: str = os.path.join(config_dir, "agents.yaml"),
                  task_yaml_path: str = os.path.join(config_dir, "tasks.yaml"),
-                 agent_registry: dict | None = None
+                 agent_registry: dict | None = None,
+                 agents: dict | None = None,
+                 tasks: dict | None = None
                  ) -> ArticleState:
-        self.agents = build_agents_from_yaml(agent_yaml_path, agent_registry=agent_registry)
-        self.tasks = build_tasks_from_yaml(task_yaml_path, self.agents)
+        # Agenti e task già costruiti (es. dal servizio) evitano di rileggere gli YAML
+        self.agents = agents if agents is not None else build_agents_from_yaml(agent_yaml_path, agent_registry=agent_registry)
+        self.tasks = tasks if tasks is not None else build_tasks_from_yaml(task_yaml_path, self.agents, agent_registry)
         self.state = state
         self.flow = None
 
     async def kickoff(self, 
                       num_reviews: int = 10,
                       write_output: bool = False,
-                      markdown_outpath: str | None = None
+                      markdown_outpath: str | None = None,
+                      build_cache: BuildCache | None = None,
+                      artifacts: SectionArtifactWriter | None = None,
+                      section_supervision: SectionSupervisionBuffer | None = None
                       ):
         self.flow = EditingFlow(
             agents=self.agents,
@@ -30,6 +39,9 @@ class EditingCrew:
             state=self.state,
             num_reviews=num_reviews,
             write_output=write_output,
-            markdown_outpath=markdown_outpath
+            markdown_outpath=markdown_outpath,
+            build_cache=build_cache,
+            artifacts=artifacts,
+            section_supervision=section_supervision
         )
         return await self.flow.run_async()
\ No newline at end of file
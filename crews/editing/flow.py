@@ -1,21 +1,29 @@
 from __future__ import annotations
 
 import json
+import re
 from logging.handlers import RotatingFileHandler
-from typing import Any
+from typing import Any, Iterable, Optional
 from pathlib import Path
 
 from crewai.flow import Flow, listen, start
 
 from schema.state import ArticleState
+from utils.async_crew import kickoff_crew
 from utils.config_loader import build_crew
+from utils.flow_state import SharedStateFlowMixin
+from utils.incremental import BuildCache, fingerprint, record_build
 from utils.logger import get_logger, summarize_log_metrics
 from utils.markdown_utils import MarkdownUtils
+from utils.run_events import emit_event
+from utils.section_artifacts import ABSTRACT, SectionArtifactWriter
+from utils.section_supervision import SectionSupervisionBuffer
+from utils.structured_output import REVIEW_REPORT_SCHEMA, StructuredOutputError, parse_structured_output, render_review_report
 
 logger = get_logger("EditingFlow")
 
 
-class EditingFlow(Flow[ArticleState]):
+class EditingFlow(SharedStateFlowMixin, Flow[ArticleState]):
     """Gestisce la collaborazione tra agenti per l'editing dell'articolo."""
 
     def __init__(
@@ -25,39 +33,84 @@ class EditingFlow(Flow[ArticleState]):
         state: ArticleState, 
         num_reviews: int = 10,
         write_output: bool = False,
-        markdown_outpath: str | None = None
+        markdown_outpath: str | None = None,
+        copy_state: bool = False,
+        build_cache: Optional[BuildCache] = None,
+        artifacts: Optional[SectionArtifactWriter] = None,
+        section_supervision: Optional[SectionSupervisionBuffer] = None
     ) -> ArticleState:
-        """Inizializza il flow con lo stato dell'articolo da revisionare."""
-        super().__init__(**state.model_dump())
+        """Inizializza il flow con lo stato dell'articolo da revisionare.
+
+        Lo stato viene adottato senza copie; ``copy_state=True`` lavora su una copia.
+        Con ``build_cache`` review, consolidamento ed editing delle sezioni con
+        input invariati vengono riusati dalla run precedente.
+        Con ``artifacts`` ogni sezione viene pubblicata in versione finale appena
+        l'editor l'ha rivista (o subito, se il report non la cita).
+        Con ``section_supervision`` le review di sezione avviate durante la
+        scrittura si aggiungono a quelle sull'intero articolo prima del consolidamento."""
+        super().__init__()
+        self._adopt_state(state, copy_state=copy_state)
         self.agents = dict(agents)
         self.tasks = dict(tasks)
         self.num_reviews = num_reviews
         self.write_output = write_output
         self.md_outpath = markdown_outpath
+        self.build_cache = build_cache
+        self.artifacts = artifacts
+        self.section_supervision = section_supervision
+
+    def _cached(self, key: str, digest: str):
+        return self.build_cache.lookup(key, digest) if self.build_cache is not None else None
 
     @start()
-    def review_article(self):
+    async def review_article(self):
         self.state.original_article = MarkdownUtils.generate_markdown(title=self.state.title, abstract=self.state.abstract, 
                                                            structure=self.state.structure, paragraphs=self.state.paragraphs, 
-                                                           code_snippets=self.state.code_snippets, write_output=False)
+                                                           code_snippets=self.state.code_snippets, code_instructions=self.state.code_instructions,
+                                                           write_output=False)
         
-        logger.info("🕵️ Avvio della supervisione editoriale.")
-        for i in range(self.num_reviews):
-            supervision_crew = build_crew(
-                agents=self.agents,
-                tasks=self.tasks,
-                agent_keys=["supervisor"],
-                task_keys=["supervision_task"],
-            )
+        digest = fingerprint(original_article=self.state.original_article, num_reviews=self.num_reviews)
+        cached = self._cached("reviews", digest)
+        if cached is not None:
+            logger.info("♻️ Articolo invariato: riuso le review della run precedente.")
+            self.state.supervision_report = dict(cached["reports"])
+            for i in range(self.num_reviews):
+                emit_event("review_completed", index=i + 1, total=self.num_reviews, reused=True)
+        else:
+            logger.info("🕵️ Avvio della supervisione editoriale.")
+            # Review in sequenza: l'agente supervisor è condiviso e non va usato da più crew insieme
+            for i in range(self.num_reviews):
+                supervision_crew = build_crew(
+                    agents=self.agents,
+                    tasks=self.tasks,
+                    agent_keys=["supervisor"],
+                    task_keys=["supervision_task"],
+                )
+
+                result = await kickoff_crew(supervision_crew, inputs={"original_article": self.state.original_article})
+                self.state.supervision_report[f"Reviews_{i+1}"] = self._extract_raw_output(result)
+                logger.info(f"Review {i+1}/{self.num_reviews} terminata.")
+                emit_event("review_completed", index=i + 1, total=self.num_reviews)
 
-            result = supervision_crew.kickoff(inputs={"original_article": self.state.original_article})
-            self.state.supervision_report[f"Reviews_{i+1}"] = self._extract_raw_output(result)
-            logger.info(f"Review {i+1}/{self.num_reviews} terminata.")
+            record_build(self.state, "reviews", digest, reports=dict(self.state.supervision_report))
 
+        if self.section_supervision is not None:
+            section_reviews = await self.section_supervision.collect()
+            logger.info(f"🕵️ Aggiunte al report {len(section_reviews)} review di sezione avviate durante la scrittura.")
+            self.state.supervision_report.update(section_reviews)
+            for section, (section_digest, review) in self.section_supervision.records.items():
+                record_build(self.state, f"section_review:{section}", section_digest, review=review)
         return self.state
     
     @listen(review_article)
-    def review_consolidator(self):
+    async def review_consolidator(self):
+        digest = fingerprint(reviews=self.state.supervision_report)
+        cached = self._cached("review_report", digest)
+        if cached is not None:
+            logger.info("♻️ Review invariate: riuso il report consolidato della run precedente.")
+            self.state.final_revision_report = cached["report"]
+            return self.state
+
         logger.info("🕵️ Avvio consolidamento della supervisione editoriale in unica review.")
         review_consolidator_crew = build_crew(
                 agents=self.agents,
@@ -66,15 +119,22 @@ class EditingFlow(Flow[ArticleState]):
                 task_keys=["consolidate_reviews_task"],
             )
         
-        result = review_consolidator_crew.kickoff(inputs={
+        result = await kickoff_crew(review_consolidator_crew, inputs={
             "reviews": self.state.supervision_report
             })
-        self.state.final_revision_report = self._extract_raw_output(result)
-        
+        raw_report = self._extract_raw_output(result)
+        try:
+            self.state.final_revision_report = parse_structured_output(raw_report, REVIEW_REPORT_SCHEMA)
+        except StructuredOutputError as e:
+            # Il testo grezzo resta utilizzabile: l'editor lo riceve così com'è
+            logger.warning(f"⚠️ Report consolidato non in formato JSON, uso il testo grezzo: {e}")
+            self.state.final_revision_report = raw_report
+        record_build(self.state, "review_report", digest, report=self.state.final_revision_report)
+
         return self.state
     
     @listen(review_consolidator)
-    def final_article_generator(self):
+    async def final_article_generator(self):
         logger.info("🚀 Attivo la crew per la generazione della versione finale dell'articolo.")
 
         section_modifier_crew = build_crew(
@@ -83,31 +143,38 @@ class EditingFlow(Flow[ArticleState]):
                 agent_keys=["editor_profile"],
                 task_keys=["edit_article_task"],
             )
-        # final_review_dict = json.loads(self.state.final_revision_report.replace("```json\n", "").replace("```", ""))
-
-        # if final_review_dict.get("Abstract", "") != "":
-        if "Abstract" in self.state.final_revision_report:
-            new_abstract_result = section_modifier_crew.kickoff(
-                inputs={
-                    "section_name": "Abstract",
-                    "section_text": self.state.abstract,
-                    "review_text": self.state.final_revision_report #final_review_dict.get("Abstract", "")
-                    }
-                )
-            self.state.abstract = self._extract_raw_output(new_abstract_result)
+        report = self.state.final_revision_report
+        # Report completo (identico per tutte le sezioni) per il riuso del prefisso
+        review_text = render_review_report(report) if isinstance(report, dict) else report
+
+        if self._has_review(report, ABSTRACT, self.state.structure):
+            self.state.abstract = await self._edit_section(section_modifier_crew, ABSTRACT, self.state.abstract, review_text)
+        self._emit_final(ABSTRACT, self.state.abstract)
         for section in self.state.structure:
-            # if final_review_dict.get(section, "") != "":
-            if section in self.state.final_revision_report:
-                new_section_result = section_modifier_crew.kickoff(
-                    inputs={
-                        "section_name": section,
-                        "section_text": self.state.paragraphs[section],
-                        "review_text": self.state.final_revision_report # final_review_dict.get(section, "")
-                        }
-                    )
-                self.state.paragraphs[section] = self._extract_raw_output(new_section_result)
+            if self._has_review(report, section, self.state.structure):
+                self.state.paragraphs[section] = await self._edit_section(
+                    section_modifier_crew, section, self.state.paragraphs[section], review_text
+                )
+                emit_event("section_edited", section=section)
+            self._emit_final(section, self.state.paragraphs[section])
         
         return self.state
+
+    def _emit_final(self, section: str, text: str) -> None:
+        if self.artifacts is not None:
+            self.artifacts.emit("final", section, text, self.state.code_snippets, self.state.code_instructions)
+
+    async def _edit_section(self, section_modifier_crew, section: str, text: str, review_text: str) -> str:
+        inputs = {"section_name": section, "section_text": text, "review_text": review_text}
+        digest = fingerprint(**inputs)
+        cached = self._cached(f"edit:{section}", digest)
+        if cached is not None:
+            logger.info(f"♻️ Sezione {section} e review invariate: riuso la versione editata della run precedente.")
+            return cached["text"]
+        result = await kickoff_crew(section_modifier_crew, inputs=inputs)
+        edited = self._extract_raw_output(result)
+        record_build(self.state, f"edit:{section}", digest, text=edited)
+        return edited
     
     @listen(final_article_generator)
     def edit_article(self) -> ArticleState:
@@ -116,7 +183,8 @@ class EditingFlow(Flow[ArticleState]):
 
         self.state.edited_article = MarkdownUtils.generate_markdown(title=self.state.title, abstract=self.state.abstract, 
                                                                     structure=self.state.structure, paragraphs=self.state.paragraphs, 
-                                                                    code_snippets=self.state.code_snippets, write_output=self.write_output, output_path=self.md_outpath)
+                                                                    code_snippets=self.state.code_snippets, code_instructions=self.state.code_instructions,
+                                                                    write_output=self.write_output, output_path=self.md_outpath)
         if self.write_output:
             logger.info(f"✅ File Markdown generato: {self.state.title.lower().replace(' ', '_').replace('/', '-')}.md")
 
@@ -146,6 +214,24 @@ class EditingFlow(Flow[ArticleState]):
         self.final_state = final_state
         return final_state
 
+    @staticmethod
+    def _has_review(report: Any, section: str, sections: Iterable[str] = ()) -> bool:
+        """Vero se il report consolidato contiene modifiche per ``section``.
+
+        Le chiavi si confrontano senza distinguere maiuscole/minuscole. Solo se
+        nessuna chiave coincide si ignora un suffisso numerico aggiunto dal
+        modello (es. "Introduzione_1"), e mai per le chiavi che sono il nome
+        esatto di un'altra sezione in ``sections`` (es. "Fase 2").
+        """
+        if isinstance(report, dict):
+            reviewed = {key.strip().lower() for key, items in report.items() if items}
+            wanted = section.strip().lower()
+            if wanted in reviewed:
+                return True
+            known = {name.strip().lower() for name in sections}
+            return any(key not in known and re.sub(r"[_\s]*\d+$", "", key) == wanted for key in reviewed)
+        return section in (report or "")
+
     @staticmethod
     def _extract_raw_output(result: Any) -> Any:
         """Estrae la rappresentazione grezza dal risultato della crew."""
@@ -14,7 +14,9 @@ class InputValidatorCrew:
     def __init__(self, 
                  agent_yaml_path: str = os.path.join(config_dir, "agents.yaml"), 
                  task_yaml_path: str = os.path.join(config_dir, "tasks.yaml"),
-                 agent_registry: dict | None = None
+                 agent_registry: dict | None = None,
+                 agents: dict | None = None,
+                 tasks: dict | None = None
                  ) -> ArticleState:
         """Classe di orchestrazione per il flusso di validazione degli input iniziali.
 
@@ -27,9 +29,12 @@ class InputValidatorCrew:
         agent_registry:
             Registro opzionale per risolvere gli identificativi degli LLM. Se
             non fornito viene utilizzato il registro di default.
+        agents, tasks:
+            Agenti e task già costruiti da riutilizzare al posto degli YAML.
         """
-        self.agents = build_agents_from_yaml(agent_yaml_path, agent_registry=agent_registry)
-        self.tasks = build_tasks_from_yaml(task_yaml_path, self.agents)
+        # Agenti e task già costruiti (es. dal servizio) evitano di rileggere gli YAML
+        self.agents = agents if agents is not None else build_agents_from_yaml(agent_yaml_path, agent_registry=agent_registry)
+        self.tasks = tasks if tasks is not None else build_tasks_from_yaml(task_yaml_path, self.agents, agent_registry)
         self.flow = None
     
     async def kickoff(self, title: str = "", abstract: str = "", structure: list[str] = []):
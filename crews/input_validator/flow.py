@@ -1,4 +1,3 @@
-import ast
 from typing import Optional
 from typing import List
 from pathlib import Path
@@ -6,13 +5,17 @@ from pathlib import Path
 from crewai.flow import Flow, start, router, listen, or_
 from schema.state import ArticleState
 from utils.logger import get_logger, summarize_log_metrics
+from utils.async_crew import kickoff_crew
 from utils.config_loader import build_crew
+from utils.flow_state import SharedStateFlowMixin
+from utils.run_events import emit_event
+from utils.structured_output import SECTION_LIST_SCHEMA, StructuredOutputError, parse_structured_output
 from logging.handlers import RotatingFileHandler
 
 logger = get_logger("InputValidatorFlow")
 
 
-class InputValidatorFlow(Flow[ArticleState]):
+class InputValidatorFlow(SharedStateFlowMixin, Flow[ArticleState]):
     def __init__(
         self,
         agents: dict,
@@ -41,7 +44,7 @@ class InputValidatorFlow(Flow[ArticleState]):
         return "generate_abstract"
 
     @listen("generate_abstract")
-    def abstract_creator(self):
+    async def abstract_creator(self):
         logger.info("🚀 Attivo la crew per generare l’abstract...")
         crew = build_crew(
             agents=self.agents,
@@ -49,16 +52,14 @@ class InputValidatorFlow(Flow[ArticleState]):
             agent_keys=["abstract_writer"],
             task_keys=["generate_abstract_task"]
             )
-        output = crew.kickoff(
-            inputs={"title": self.state.title}
-            )
+        output = await kickoff_crew(crew, inputs={"title": self.state.title})
 
         self.state.abstract = output
         logger.info(f"[OUTPUT abstract] {self.state.abstract}")
         return self.state.abstract
     
     @listen("abstract_presente")
-    def abstract_modifier(self):
+    async def abstract_modifier(self):
         logger.info("🚀 Attivo la crew per migliorare l’abstract esistente...")
         crew = build_crew(
             agents=self.agents,
@@ -66,16 +67,14 @@ class InputValidatorFlow(Flow[ArticleState]):
             agent_keys=["abstract_writer"],
             task_keys=["modify_abstract_task"]
             )
-        output = crew.kickoff(
-            inputs={"title": self.state.title, 
-                    "abstract": self.state.abstract}
-            )
+        output = await kickoff_crew(crew, inputs={"title": self.state.title,
+                                                  "abstract": self.state.abstract})
         self.state.abstract = output.__dict__['raw']
         logger.info(f"[OUTPUT abstract] {self.state.abstract}")
         return self.state.abstract
 
     @listen(or_(abstract_creator, abstract_modifier))
-    def migliora_struttura(self):
+    async def migliora_struttura(self):
         logger.info("🎯 Attivazione Crew per miglioramento struttura")
         crew = build_crew(
             agents=self.agents,
@@ -83,13 +82,20 @@ class InputValidatorFlow(Flow[ArticleState]):
             agent_keys=["project_manager"],
             task_keys=["structure_analysis_task"]
         )
-        result = crew.kickoff(inputs={
+        result = await kickoff_crew(crew, inputs={
             "title": self.state.title,
             "abstract": self.state.abstract,
             "structure": self.state.structure
         })
         logger.info(f"✅ Crew completata, output : {result.__dict__['raw']}")
-        self.state.structure = InputValidatorFlow.safe_literal_list_parse(result.__dict__['raw'])
+        try:
+            self.state.structure = parse_structured_output(result.__dict__['raw'], SECTION_LIST_SCHEMA)
+        except StructuredOutputError as e:
+            # Meglio la scaletta fornita che una struttura vuota: la scrittura non produrrebbe nulla
+            if not self.state.structure:
+                raise ValueError(f"Struttura non interpretabile e nessuna scaletta iniziale: {e}") from e
+            logger.warning(f"⚠️ Struttura non interpretabile, mantengo quella fornita: {e}")
+        emit_event("structure_ready", sections=len(self.state.structure))
         return self.state.structure
 
     @listen(migliora_struttura)
@@ -116,16 +122,12 @@ class InputValidatorFlow(Flow[ArticleState]):
     @staticmethod
     def safe_literal_list_parse(output: str) -> List[str]:
         """
-        Estrae e parse in sicurezza una lista Python da un blocco di testo.
-        Ritorna una lista di stringhe, o una lista vuota in caso di errore.
+        Estrae una lista di stringhe da un blocco di testo (JSON, lista Python,
+        blocco fenced o elenco puntato). Ritorna una lista vuota in caso di errore.
         """
         try:
-            parsed = ast.literal_eval(output)
-            if isinstance(parsed, list) and all(isinstance(x, str) for x in parsed):
-                return parsed
-            else:
-                return []
-        except (SyntaxError, ValueError):
+            return parse_structured_output(output, SECTION_LIST_SCHEMA)
+        except StructuredOutputError:
             return []
 
     async def run_async(self, export_log_summary: bool = True) -> ArticleState:
@@ -1,8 +1,13 @@
 # crew.py
 import os
 from crews.writing.flow import WritingArticleFlow
+from utils.context_summarizer_crew import SUMMARIZER_LLM
 from schema.state import ArticleState
+from utils.code_validation import CodeValidator
 from utils.config_loader import build_agents_from_yaml, build_tasks_from_yaml
+from utils.incremental import BuildCache
+from utils.section_artifacts import SectionArtifactWriter
+from utils.section_supervision import SectionSupervisionBuffer
 from pathlib import Path
 
 # Load agent and task registry from YAML
@@ -14,18 +19,36 @@ class WritingCrew:
                  state: ArticleState,
                  agent_yaml_path: str = os.path.join(config_dir, "agents.yaml"), 
                  task_yaml_path: str = os.path.join(config_dir, "tasks.yaml"),
-                 agent_registry: dict | None = None
+                 agent_registry: dict | None = None,
+                 agents: dict | None = None,
+                 tasks: dict | None = None
                  ) -> ArticleState:
         """Classe di orchestrazione per il flusso di validazione degli input iniziali."""
-        self.agents = build_agents_from_yaml(agent_yaml_path, agent_registry=agent_registry)
-        self.tasks = build_tasks_from_yaml(task_yaml_path, self.agents)
+        # Agenti e task già costruiti (es. dal servizio) evitano di rileggere gli YAML
+        self.agents = agents if agents is not None else build_agents_from_yaml(agent_yaml_path, agent_registry=agent_registry)
+        self.tasks = tasks if tasks is not None else build_tasks_from_yaml(task_yaml_path, self.agents, agent_registry)
         self.state = state
+        # Il riassunto delle sezioni usa il tool del registry (pool, metriche, warm-up)
+        self.summarizer_llm = (agent_registry or {}).get(SUMMARIZER_LLM)
         self.flow = None
     
-    async def kickoff(self):
+    async def kickoff(self,
+                      defer_code_generation: bool = False,
+                      code_validator: CodeValidator | None = None,
+                      summarizer_backend: str = "llm",
+                      build_cache: BuildCache | None = None,
+                      artifacts: SectionArtifactWriter | None = None,
+                      section_supervision: SectionSupervisionBuffer | None = None):
         self.flow = WritingArticleFlow(
             agents=self.agents,
             tasks=self.tasks,
-            state=self.state
+            state=self.state,
+            defer_code_generation=defer_code_generation,
+            code_validator=code_validator,
+            summarizer_backend=summarizer_backend,
+            summarizer_llm=self.summarizer_llm,
+            build_cache=build_cache,
+            artifacts=artifacts,
+            section_supervision=section_supervision
         )
         return await self.flow.run_async()
\ No newline at end of file
@@ -1,30 +1,92 @@
 import ast
+import asyncio
 import os
-from typing import Optional
+from contextlib import AbstractContextManager, nullcontext
+from typing import Dict, List, Optional, Tuple
 import json
-import re
 from pathlib import Path
 
 from crewai.flow import Flow, start, router, listen, or_
+from llm.affinity_scheduler import deferred_section, get_default_scheduler
 from schema.state import ArticleState
 from utils.logger import get_logger, summarize_log_metrics
+from utils.code_validation import CodeValidationResult, CodeValidator
+from utils.async_crew import kickoff_crew
 from utils.config_loader import build_crew
-from utils.context_summarizer_crew import summarize_section
+from utils.flow_state import SharedStateFlowMixin
+from utils.incremental import BuildCache, fingerprint, record_build
+from llm.local_llm_tool import LocalLLMTool
+from utils.context_summarizer_crew import asummarize_section
 from utils.markdown_utils import MarkdownUtils
+from utils.run_events import emit_event
+from utils.section_artifacts import SectionArtifactWriter
+from utils.section_supervision import SectionSupervisionBuffer
 from logging.handlers import RotatingFileHandler
 
 logger = get_logger("WritingArticleFlow")
 
+# Blocco di codice di una sezione: (sezione, posizione del marker nel testo)
+CodeBlock = Tuple[str, int]
 
-class WritingArticleFlow(Flow[ArticleState]):
+
+class WritingArticleFlow(SharedStateFlowMixin, Flow[ArticleState]):
     def __init__(self, 
                  agents: dict, 
                  tasks: dict, 
-                 state: ArticleState
+                 state: ArticleState,
+                 defer_code_generation: bool = False,
+                 copy_state: bool = False,
+                 code_validator: Optional[CodeValidator] = None,
+                 summarizer_backend: str = "llm",
+                 summarizer_llm: Optional[LocalLLMTool] = None,
+                 build_cache: Optional[BuildCache] = None,
+                 artifacts: Optional[SectionArtifactWriter] = None,
+                 section_supervision: Optional[SectionSupervisionBuffer] = None
                  ):
-        super().__init__(**state.model_dump())
+        """Ogni marker ``[CODICE_RICHIESTO]`` di una sezione è un blocco di codice
+        a sé: i blocchi vengono generati e revisionati in parallelo e inseriti
+        ciascuno al posto del proprio marker.
+
+        Con ``defer_code_generation`` la generazione e la revisione del codice
+        vengono rimandate a fine scrittura e raggruppate per modello, evitando di
+        alternare writer e coder a ogni sezione.
+
+        Lo stato ricevuto viene adottato senza copie (vedi
+        :class:`SharedStateFlowMixin`); ``copy_state=True`` lavora su una copia.
+
+        Con ``code_validator`` il codice generato viene prima validato in locale:
+        la revisione LLM si salta se la validazione passa e riceve le
+        diagnostiche se fallisce.
+
+        ``summarizer_backend`` sceglie come riassumere le sezioni per il contesto
+        delle successive (``"llm"`` o ``"extractive"``, vedi :func:`summarize_section`);
+        con ``"llm"`` usa ``summarizer_llm``, la voce ``summarizer_llm`` del registry.
+
+        Con ``build_cache`` (run incrementale) le sezioni e il codice i cui input
+        non sono cambiati rispetto alla run precedente vengono riusati senza
+        chiamare i modelli (vedi :mod:`utils.incremental`).
+
+        Con ``artifacts`` ogni sezione viene pubblicata come bozza appena testo e
+        codice sono completi (vedi :mod:`utils.section_artifacts`).
+
+        Con ``section_supervision`` nello stesso momento parte anche la review
+        della sezione, in parallelo alla scrittura delle successive (vedi
+        :mod:`utils.section_supervision`)."""
+        super().__init__()
+        self._adopt_state(state, copy_state=copy_state)
         self.agents = agents
         self.tasks = tasks
+        self.defer_code_generation = defer_code_generation
+        self.deferred_code_sections: List[str] = []
+        # Marker da generare per sezione (esclusi quelli riusati dalla run precedente)
+        self.pending_code_blocks: Dict[str, List[int]] = {}
+        self.code_validator = code_validator
+        self.skipped_code_reviews = 0
+        self.summarizer_backend = summarizer_backend
+        self.summarizer_llm = summarizer_llm
+        self.build_cache = build_cache
+        self.artifacts = artifacts
+        self.section_supervision = section_supervision
 
     @start()
     def start_article(self):
@@ -39,84 +101,254 @@ class WritingArticleFlow(Flow[ArticleState]):
             return "article_writing"
 
     @listen("article_writing")
-    def write_section(self): 
+    async def write_section(self):
         if self.state.current_section_index==0:
             logger.info("🚀 Attivo la crew per la generazione sezioni articolo...")
 
-        writing_crew = build_crew(
-            agents=self.agents,
-            tasks=self.tasks,
-            agent_keys=["writer"],
-            task_keys=["write_task"]
-        )
-        
-        logger.info(f"📝 Scrittura sezione {self.state.structure[self.state.current_section_index]}")
-        result = writing_crew.kickoff(inputs={
-                "section": self.state.structure[self.state.current_section_index],
-                "title": self.state.title,
-                "abstract": self.state.abstract,
-                "previous_sections_summary": self.state.section_summaries if self.state.current_section_index>0 else {}
-            })
-        
-        self.state.paragraphs[self.state.structure[self.state.current_section_index]] = result.__dict__['raw']
-        self.state.section_summaries[self.state.structure[self.state.current_section_index]] = summarize_section(section=self.state.structure[self.state.current_section_index], 
-                                                                                                                 content=result.__dict__['raw'])
-        self.state.code_instructions[self.state.structure[self.state.current_section_index]] = WritingArticleFlow.extract_code_request(result.__dict__['raw'])
+        section = self.state.structure[self.state.current_section_index]
+        inputs = {
+            "section": section,
+            "title": self.state.title,
+            "abstract": self.state.abstract,
+            "previous_sections_summary": self._render_previous_summaries()
+        }
+        digest = fingerprint(summarizer=self.summarizer_backend, **inputs)
+        cached = self.build_cache.lookup(f"section:{section}", digest) if self.build_cache is not None else None
+        if cached is not None:
+            logger.info(f"♻️ Sezione {section} invariata: riuso il testo della run precedente")
+            paragraph, summary = cached["paragraph"], cached["summary"]
+        else:
+            writing_crew = build_crew(
+                agents=self.agents,
+                tasks=self.tasks,
+                agent_keys=["writer"],
+                task_keys=["write_task"]
+            )
+            logger.info(f"📝 Scrittura sezione {section}")
+            result = await kickoff_crew(writing_crew, inputs=inputs)
+            paragraph = result.__dict__['raw']
+            summary = await asummarize_section(
+                section=section, content=paragraph, backend=self.summarizer_backend, llm_tool=self.summarizer_llm
+            )
+
+        self.state.paragraphs[section] = paragraph
+        self.state.section_summaries[section] = summary
+        self.state.code_instructions[section] = WritingArticleFlow.extract_code_requests(paragraph)
+        record_build(self.state, f"section:{section}", digest, paragraph=paragraph, summary=summary)
+        emit_event("section_written",
+                   section=section,
+                   index=self.state.current_section_index,
+                   total=len(self.state.structure),
+                   reused=cached is not None)
 
         return self.state
     
+    def _render_previous_summaries(self) -> str:
+        """Riassunti delle sezioni già scritte, in ordine di struttura.
+
+        Il blocco cresce solo in coda da una sezione all'altra: il prompt della
+        sezione successiva condivide con il precedente tutto il prefisso, che
+        Ollama riusa dalla KV-cache invece di rivalutarlo.
+        """
+        written = self.state.structure[:self.state.current_section_index]
+        blocks = [f"### {s}\n{self.state.section_summaries[s].strip()}" for s in written if s in self.state.section_summaries]
+        return "\n\n".join(blocks) if blocks else "(nessuna sezione precedente)"
+
     @router(write_section)
     def code_generation_node(self):
-        if self.state.code_instructions[self.state.structure[self.state.current_section_index]] != "":
-            return "code_generation"
-        else:
-            self.state.code_snippets[self.state.structure[self.state.current_section_index]] = ""
+        section = self.state.structure[self.state.current_section_index]
+        instructions = self.state.code_instructions[section]
+        self.state.code_snippets[section] = [""] * len(instructions)
+        if not any(instructions):
             return "no_coding_section"
 
+        pending = []
+        for index, instruction in enumerate(instructions):
+            if not instruction:
+                continue
+            block = (section, index)
+            cached = self.build_cache.lookup(self._code_key(block), self._code_digest(block)) if self.build_cache is not None else None
+            if cached is not None:
+                self.state.code_snippets[section][index] = cached["code"]
+                self._record_code(block)
+            else:
+                pending.append(index)
+        reused = sum(1 for instruction in instructions if instruction) - len(pending)
+        if reused:
+            logger.info(f"♻️ Istruzioni di codice invariate per {reused} blocchi della sezione {section}: riuso il codice della run precedente")
+        if not pending:
+            return "reused_code"
+        self.pending_code_blocks[section] = pending
+        if self.defer_code_generation:
+            self.deferred_code_sections.append(section)
+            scheduler = get_default_scheduler()
+            if scheduler is not None:
+                scheduler.mark_deferral(section)
+            return "defer_code"
+        return "code_generation"
+
     @listen("code_generation")
-    def write_code(self):
-        logger.info(f"🚀 Attivo la crew per la generazione del codice interno alla sezione {self.state.structure[self.state.current_section_index]}")
-        coding_crew = build_crew(
+    async def write_code(self):
+        section = self.state.structure[self.state.current_section_index]
+        logger.info(f"🚀 Attivo la crew per la generazione del codice interno alla sezione {section}")
+        await self._generate_code(self._build_coding_crew(), self._code_blocks([section]))
+        return self.state 
+    
+    @listen(write_code)
+    async def update_code(self):
+        section = self.state.structure[self.state.current_section_index]
+        await self._validate_and_review(self._code_blocks([section]))
+        return self.state
+
+    @listen(or_("no_coding_section", "defer_code", "reused_code", update_code))
+    def loop_till_last_section(self):
+        section = self.state.structure[self.state.current_section_index]
+        if section not in self.deferred_code_sections:
+            self._emit_draft(section)
+        self.state.current_section_index = self.state.current_section_index + 1
+        return "loop_till_last_section"
+
+    @listen("end_article_writing")
+    async def generate_deferred_code(self):
+        """Genera e revisiona il codice rimandato, una fase per modello."""
+        if not self.deferred_code_sections:
+            return self.state
+
+        blocks = self._code_blocks(self.deferred_code_sections)
+        logger.info(f"🚀 Generazione codice raggruppata per {len(blocks)} blocchi in {len(self.deferred_code_sections)} sezioni")
+        await self._generate_code(self._build_coding_crew(), blocks)
+        await self._validate_and_review(blocks)
+        self._emit_drafts(self.deferred_code_sections)
+        return self.state
+
+    async def _validate_and_review(self, blocks: List[CodeBlock]) -> None:
+        """Valida i blocchi e revisiona insieme quelli senza una validazione conclusiva.
+
+        La revisione si salta solo se un linter o l'esecuzione hanno confermato
+        il codice: la sola sintassi corretta non basta."""
+        validations = await self._validate_code(blocks)
+        to_review = []
+        for block in blocks:
+            if validations[block] is not None and validations[block].conclusive:
+                self._skip_code_review(block, validations[block])
+            else:
+                to_review.append(block)
+        if not to_review:
+            return
+        logger.info(f"🚀 Attivo la crew per la modifica del codice generato ({len(to_review)} blocchi)")
+        await self._review_code(self._build_code_review_crew(), to_review, validations)
+
+    def _deferral_scope(self, section: str) -> AbstractContextManager:
+        """Attribuisce le chiamate del codice rimandato alla sezione, per il riferimento FIFO dello scheduler."""
+        return deferred_section(section) if section in self.deferred_code_sections else nullcontext()
+
+    def _code_blocks(self, sections: List[str]) -> List[CodeBlock]:
+        return [(section, index) for section in sections for index in self.pending_code_blocks.get(section, [])]
+
+    def _emit_draft(self, section: str) -> None:
+        """Sezione definitiva per la scrittura: bozza pubblicata e review di sezione avviata."""
+        if self.artifacts is not None:
+            self.artifacts.emit(
+                "draft", section, self.state.paragraphs[section], self.state.code_snippets, self.state.code_instructions
+            )
+        if self.section_supervision is not None:
+            self.section_supervision.submit(
+                section, self.state.paragraphs[section], self.state.code_snippets, self.state.code_instructions
+            )
+
+    def _emit_drafts(self, sections: List[str]) -> None:
+        for section in sections:
+            self._emit_draft(section)
+
+    def _build_coding_crew(self):
+        return build_crew(
             agents=self.agents,
             tasks=self.tasks,
             agent_keys=["code_writer"],
             task_keys=["generate_code_task"]
         )
 
-        logger.info("📝 Generazione codice...")
-        result = coding_crew.kickoff(inputs={
-            "instruction": self.state.code_instructions[self.state.structure[self.state.current_section_index]]
-        })
-        
-        # self.state.code_instructions[self.state.structure[self.state.current_section_index]] = self.state.code_instructions[self.state.structure[self.state.current_section_index]]
-        self.state.code_snippets[self.state.structure[self.state.current_section_index]] = result.__dict__['raw'] if result != "" else result
-
-        return self.state 
-    
-    @listen(write_code)
-    def update_code(self):
-        logger.info(f"🚀 Attivo la crew per la modifica del codice generato per la sezione {self.state.structure[self.state.current_section_index]}")
-        coding_review_crew = build_crew(
+    def _build_code_review_crew(self):
+        return build_crew(
             agents=self.agents,
             tasks=self.tasks,
             agent_keys=["code_reviewer"],
             task_keys=["review_code_task"]
         )
 
-        logger.info(f"📝 Modifiche al codice...")
-        result = coding_review_crew.kickoff(inputs={
-            "code": self.state.code_snippets[self.state.structure[self.state.current_section_index]]
-            })
-        self.state.code_snippets[self.state.structure[self.state.current_section_index]] = result.__dict__['raw'] 
+    async def _generate_code(self, coding_crew, blocks: List[CodeBlock]) -> None:
+        """Genera in parallelo il codice dei blocchi, ognuno su una copia della crew.
 
-        return self.state
+        Gli agenti sono condivisi e non vanno usati da più crew insieme: ogni
+        blocco lavora su ``crew.copy()`` (stessi modelli, agenti e task copiati)."""
+        async def _generate(block: CodeBlock) -> None:
+            section, index = block
+            logger.info(f"📝 Generazione codice per la sezione {section} (blocco {index + 1})...")
+            with self._deferral_scope(section):
+                result = await kickoff_crew(coding_crew.copy(), inputs={
+                    "instruction": self.state.code_instructions[section][index]
+                })
+            self.state.code_snippets[section][index] = result.__dict__['raw'] if result != "" else result
 
-    @listen(or_("no_coding_section", update_code))
-    def loop_till_last_section(self):
-        self.state.current_section_index = self.state.current_section_index + 1
-        return "loop_till_last_section"
+        await asyncio.gather(*(_generate(block) for block in blocks))
 
-    @listen("end_article_writing")
+    async def _validate_code(self, blocks: List[CodeBlock]) -> Dict[CodeBlock, Optional[CodeValidationResult]]:
+        """Valida in parallelo il codice dei blocchi; ``None`` se la validazione è disattivata.
+
+        I future del pool di validazione vengono attesi senza bloccare l'event loop."""
+        if self.code_validator is None:
+            return {block: None for block in blocks}
+        futures = [asyncio.wrap_future(self.code_validator.submit(self.state.code_snippets[s][i])) for s, i in blocks]
+        results = dict(zip(blocks, await asyncio.gather(*futures)))
+        for (section, index), result in results.items():
+            emit_event("code_validated", section=section, block=index, ok=result.ok, linted=result.linted, executed=result.executed, seconds=result.seconds)
+        return results
+
+    def _skip_code_review(self, block: CodeBlock, validation: CodeValidationResult) -> None:
+        section, index = block
+        self.skipped_code_reviews += 1
+        suffix = " ed eseguito" if validation.executed else " dal linter"
+        logger.info(f"✅ Codice della sezione {section} (blocco {index + 1}) validato{suffix} in locale: revisione saltata")
+        self._record_code(block)
+        emit_event("code_reviewed", section=section, block=index, skipped=True)
+
+    @staticmethod
+    def _code_key(block: CodeBlock) -> str:
+        section, index = block
+        return f"code:{section}:{index}"
+
+    def _code_digest(self, block: CodeBlock) -> str:
+        section, index = block
+        return fingerprint(instruction=self.state.code_instructions[section][index])
+
+    def _record_code(self, block: CodeBlock) -> None:
+        """Registra il codice definitivo (validato, revisionato o riusato) del blocco."""
+        section, index = block
+        record_build(self.state, self._code_key(block), self._code_digest(block), code=self.state.code_snippets[section][index])
+
+    async def _review_code(
+        self,
+        coding_review_crew,
+        blocks: List[CodeBlock],
+        validations: Optional[Dict[CodeBlock, Optional[CodeValidationResult]]] = None,
+    ) -> None:
+        """Revisiona in parallelo il codice dei blocchi, ognuno su una copia della crew."""
+        async def _review(block: CodeBlock) -> None:
+            section, index = block
+            validation = (validations or {}).get(block)
+            logger.info(f"📝 Modifiche al codice della sezione {section} (blocco {index + 1})...")
+            with self._deferral_scope(section):
+                result = await kickoff_crew(coding_review_crew.copy(), inputs={
+                    "code": self.state.code_snippets[section][index],
+                    "diagnostics": validation.report() if validation is not None else "Validazione automatica non eseguita."
+                    })
+            self.state.code_snippets[section][index] = result.__dict__['raw']
+            self._record_code(block)
+            emit_event("code_reviewed", section=section, block=index, skipped=False)
+
+        await asyncio.gather(*(_review(block) for block in blocks))
+
+    @listen(generate_deferred_code)
     def conclude(self):
         logger.info("🏁 Flow terminato con successo.")
         
@@ -134,9 +366,8 @@ class WritingArticleFlow(Flow[ArticleState]):
         return self.state
 
     @staticmethod
-    def extract_code_request(paragraph: str) -> str:
-        match = re.search(r"\[CODICE_RICHIESTO\]\[START\]\s*(.*?)\s*\[END\]", paragraph, re.DOTALL)
-        return match.group(1).strip() if match else ""
+    def extract_code_requests(paragraph: str) -> List[str]:
+        return MarkdownUtils.extract_code_requests(paragraph)
     
     async def run_async(self, export_log_summary: bool = True) -> ArticleState:
         logger.info("🚀 Avvio asincrono del flow WritingArticleFlow")
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+from typing import Tuple
+
+import pandas as pd
+import streamlit as st
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from utils.run_audit import (
+    STAGES,
+    cache_hit_rates,
+    combine_events,
+    latency_distribution,
+    load_run_events,
+    load_run_state,
+    model_latencies,
+    run_summary,
+    section_durations,
+    stage_durations,
+    tokens_per_run,
+)
+from utils.run_monitor import EVENTS_FILE, STATE_FILE
+
+DEFAULT_RUNS_DIR = os.environ.get("BLOGWRITER_RUNS_DIR", "runs")
+
+st.set_page_config(page_title="Audit run", layout="wide")
+st.title("📊 Audit delle run")
+
+st.sidebar.header("Impostazioni")
+runs_root = Path(st.sidebar.text_input("Cartella delle run", value=DEFAULT_RUNS_DIR))
+
+
+def _mtime(path: Path) -> float:
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return 0.0
+
+
+def history_signature(root: Path) -> Tuple[Tuple[str, float, float], ...]:
+    """(run, mtime eventi, mtime stato) per ogni run: cambia solo se una run è stata aggiornata."""
+    signature = []
+    for entry in os.scandir(root):
+        if entry.is_dir() and os.path.exists(os.path.join(entry.path, EVENTS_FILE)):
+            run_dir = Path(entry.path)
+            signature.append((entry.name, _mtime(run_dir / EVENTS_FILE), _mtime(run_dir / STATE_FILE)))
+    return tuple(sorted(signature))
+
+
+@st.cache_data(show_spinner=False, max_entries=5000)
+def cached_run_events(run_dir: str, mtime: float) -> pd.DataFrame:
+    return load_run_events(run_dir)
+
+
+@st.cache_data(show_spinner=False, max_entries=5000)
+def cached_run_state(run_dir: str, mtime: float) -> dict:
+    return load_run_state(run_dir)
+
+
+@st.cache_data(show_spinner="Caricamento dello storico…")
+def load_history(root: str, signature: Tuple[Tuple[str, float, float], ...]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Eventi e snapshot di tutte le run; solo le run modificate vengono rilette."""
+    events = combine_events(cached_run_events(str(Path(root) / name), events_mtime) for name, events_mtime, _ in signature)
+    states = pd.DataFrame([cached_run_state(str(Path(root) / name), state_mtime) for name, _, state_mtime in signature])
+    return events, states
+
+
+if not runs_root.is_dir():
+    st.info(f"La cartella '{runs_root}' non esiste ancora: avvia una run con --run_dir o il servizio HTTP.")
+    st.stop()
+
+events, states = load_history(str(runs_root.resolve()), history_signature(runs_root))
+if events.empty:
+    st.info("Nessuna run trovata.")
+    st.stop()
+
+runs = run_summary(events, states)
+first_day, last_day = runs["started_at"].min().date(), runs["started_at"].max().date()
+period = st.sidebar.date_input("Periodo", value=(first_day, last_day), min_value=first_day, max_value=last_day)
+statuses = st.sidebar.multiselect("Esito", ["completata", "fallita", "in corso"], default=["completata", "fallita", "in corso"])
+if isinstance(period, tuple) and len(period) == 2:
+    day = runs["started_at"].dt.date
+    runs = runs[(day >= period[0]) & (day <= period[1])]
+runs = runs[runs["status"].isin(statuses)]
+events = events[events["run_id"].isin(runs["run_id"])]
+
+col_runs, col_ok, col_failed, col_duration = st.columns(4)
+col_runs.metric("Run", len(runs))
+col_ok.metric("Completate", int((runs["status"] == "completata").sum()))
+col_failed.metric("Fallite", int((runs["status"] == "fallita").sum()))
+col_duration.metric("Durata mediana (min)", f"{runs['duration_s'].median() / 60:.1f}" if len(runs) else "-")
+
+tab_stages, tab_models, tab_tokens, tab_cache, tab_sections, tab_runs = st.tabs(
+    ["Stage", "Modelli", "Token", "Cache", "Sezioni lente", "Run"]
+)
+
+with tab_stages:
+    stages = stage_durations(events)
+    table = latency_distribution(stages, "stage")
+    table["stage"] = pd.Categorical(table["stage"], categories=STAGES + sorted(set(table["stage"]) - set(STAGES)), ordered=True)
+    table = table.sort_values("stage")
+    st.dataframe(table, use_container_width=True, hide_index=True)
+    st.bar_chart(table.set_index("stage")[["p50", "p90", "p95"]])
+
+with tab_models:
+    calls = model_latencies(events)
+    if calls.empty:
+        st.info("Nessun evento llm_call nel periodo selezionato.")
+    else:
+        st.markdown("**Latenza di inferenza (s)**")
+        st.dataframe(latency_distribution(calls, "model"), use_container_width=True, hide_index=True)
+        st.markdown("**Attesa in coda (s)**")
+        st.dataframe(latency_distribution(calls, "model", "wait_seconds"), use_container_width=True, hide_index=True)
+
+with tab_tokens:
+    tokens = tokens_per_run(events)
+    if tokens.empty:
+        st.info("Nessun evento prompt_eval nel periodo selezionato.")
+    else:
+        st.dataframe(tokens[["prompt_tokens", "eval_tokens", "total_tokens"]].describe().round(0), use_container_width=True)
+        per_run = tokens.merge(runs[["run_id", "started_at"]], on="run_id").sort_values("started_at")
+        st.line_chart(per_run.set_index("started_at")[["prompt_tokens", "eval_tokens"]])
+
+with tab_cache:
+    rates = cache_hit_rates(events)
+    if rates.empty:
+        st.info("Nessun dato di cache nel periodo selezionato.")
+    else:
+        col_resident, col_skipped = st.columns(2)
+        col_resident.metric("Chiamate con modello già residente", f"{rates['model_resident_rate'].mean():.0%}")
+        col_skipped.metric("Code review evitate", f"{rates['code_review_skip_rate'].mean():.0%}")
+        per_run = rates.merge(runs[["run_id", "started_at"]], on="run_id").sort_values("started_at")
+        st.line_chart(per_run.set_index("started_at")[["model_resident_rate", "code_review_skip_rate"]])
+
+with tab_sections:
+    sections = section_durations(events)
+    top_n = int(st.number_input("Sezioni da mostrare", min_value=5, max_value=500, value=25, step=5))
+    slowest = sections.nlargest(top_n, "seconds").merge(runs[["run_id", "title"]], on="run_id", how="left")
+    st.dataframe(slowest[["title", "section", "seconds", "run_id"]].round(1), use_container_width=True, hide_index=True)
+    st.markdown("**Sezioni più lente in media (per nome)**")
+    st.dataframe(latency_distribution(sections, "section").nlargest(top_n, "mean"), use_container_width=True, hide_index=True)
+
+with tab_runs:
+    st.dataframe(runs.sort_values("started_at", ascending=False), use_container_width=True, hide_index=True)
@@ -17,12 +17,15 @@ st.sidebar.write("I file markdown vengono letti e salvati nella cartella:")
 st.sidebar.code(str(MARKDOWN_DIR.resolve()))
 
 
-def get_markdown_files(directory: Path) -> List[str]:
-    """Return the available markdown files sorted alphabetically."""
+@st.cache_data(show_spinner=False)
+def get_markdown_files(directory: Path, directory_mtime: float) -> List[str]:
+    """Return the available markdown files sorted alphabetically.
+
+    Cached on the directory mtime, which changes only when files are added or removed."""
     return sorted(f.name for f in directory.glob("*.md"))
 
 
-markdown_files = get_markdown_files(MARKDOWN_DIR)
+markdown_files = get_markdown_files(MARKDOWN_DIR, MARKDOWN_DIR.stat().st_mtime)
 
 if "current_file" not in st.session_state:
     st.session_state["current_file"] = None
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import streamlit as st
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from utils.run_monitor import STATE_FILE, RunProgress, list_run_dirs
+
+# Cartella con una sottocartella per run (--run_dir dell'orchestratore, <data_dir>/runs del servizio)
+DEFAULT_RUNS_DIR = os.environ.get("BLOGWRITER_RUNS_DIR", "runs")
+
+st.set_page_config(page_title="Monitor run", layout="wide")
+st.title("📡 Monitor delle run")
+
+st.sidebar.header("Impostazioni")
+runs_root = Path(st.sidebar.text_input("Cartella delle run", value=DEFAULT_RUNS_DIR))
+page_size = int(st.sidebar.number_input("Run per pagina", min_value=5, max_value=200, value=20, step=5))
+refresh_seconds = float(st.sidebar.number_input("Aggiornamento automatico (s, 0 = off)", min_value=0.0, value=5.0, step=1.0))
+
+
+@st.cache_data(show_spinner=False)
+def get_run_index(root: str, root_mtime: float) -> List[Tuple[str, float]]:
+    """Indice delle run; ricalcolato solo quando cambia l'mtime della cartella (nuove run)."""
+    return list_run_dirs(root)
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def load_state_snapshot(path: str, mtime: float) -> Dict[str, Any]:
+    """``state.json`` viene sostituito atomicamente: si rilegge solo se l'mtime è cambiato."""
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def get_progress(run_dir: Path) -> RunProgress:
+    """Avanzamento della run, aggiornato leggendo solo i byte nuovi di ``events.jsonl``."""
+    tracked: Dict[str, RunProgress] = st.session_state.setdefault("run_progress", {})
+    key = str(run_dir.resolve())
+    if key not in tracked:
+        tracked[key] = RunProgress(run_dir)
+    tracked[key].refresh()
+    return tracked[key]
+
+
+def _format_ts(ts: float | None) -> str:
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S") if ts else "-"
+
+
+def render_run(name: str, progress: RunProgress) -> None:
+    icon = {"in corso": "🟢", "completata": "✅", "fallita": "❌"}.get(progress.status, "⏳")
+    label = f"{icon} {progress.title or name} — {progress.status}"
+    with st.expander(label, expanded=progress.active):
+        col_sections, col_reviews, col_code = st.columns(3)
+        written, total = len(progress.sections_written), progress.sections_total
+        col_sections.metric("Sezioni scritte", f"{written}/{total or '?'}")
+        if total:
+            col_sections.progress(min(written / total, 1.0))
+        col_reviews.metric("Revisioni", f"{progress.reviews_done}/{progress.reviews_total or '?'}")
+        if progress.reviews_total:
+            col_reviews.progress(min(progress.reviews_done / progress.reviews_total, 1.0))
+        col_code.metric("Code review (saltate)", f"{progress.code_reviews} ({progress.code_reviews_skipped})")
+
+        st.caption(
+            f"Run `{name}` · stage completato: {progress.stage or '-'} · avvio: {_format_ts(progress.started_at)}"
+            f" · ultimo evento: {progress.last_event or '-'} ({_format_ts(progress.last_event_at)})"
+        )
+        if progress.error:
+            st.error(progress.error)
+        latencies = progress.latency_summary()
+        if latencies:
+            st.dataframe(latencies, use_container_width=True, hide_index=True)
+
+        state_path = progress.run_dir / STATE_FILE
+        if not progress.active and state_path.exists():
+            snapshot = load_state_snapshot(str(state_path), state_path.stat().st_mtime)
+            metrics = snapshot.get("state", {}).get("llm_metrics")
+            if metrics:
+                st.json(metrics, expanded=False)
+
+
+if not runs_root.is_dir():
+    st.info(f"La cartella '{runs_root}' non esiste ancora: avvia una run con --run_dir o il servizio HTTP.")
+    st.stop()
+
+run_index = get_run_index(str(runs_root.resolve()), runs_root.stat().st_mtime)
+if not run_index:
+    st.info("Nessuna run trovata.")
+    st.stop()
+
+num_pages = max(1, -(-len(run_index) // page_size))
+page = int(st.sidebar.number_input(f"Pagina (1–{num_pages})", min_value=1, max_value=num_pages, value=1))
+st.sidebar.caption(f"{len(run_index)} run totali")
+
+page_runs = run_index[(page - 1) * page_size: page * page_size]
+progresses = [(name, get_progress(runs_root / name)) for name, _ in page_runs]
+active = [item for item in progresses if item[1].active]
+
+st.subheader(f"Run attive: {len(active)}")
+for name, progress in active:
+    render_run(name, progress)
+
+st.subheader("Altre run")
+for name, progress in progresses:
+    if not progress.active:
+        render_run(name, progress)
+
+if refresh_seconds > 0 and active:
+    time.sleep(refresh_seconds)
+    st.rerun()
@@ -0,0 +1,196 @@
+"""Scheduler con affinità di modello per host a GPU singola.
+
+Quando più chiamate sono in coda, quelle dirette a un modello già residente
+vengono servite per prime: Ollama evita così di scaricare e ricaricare i modelli
+a ogni alternanza writer → summarizer → coder. Lo scheduler conta gli switch di
+modello effettivi e quelli che un ordine FIFO avrebbe causato.
+
+Il riferimento FIFO è l'ordine che le chiamate avrebbero avuto senza rinviare
+il codice a fine scrittura: il flow segna con :meth:`ModelAffinityScheduler.mark_deferral`
+il punto in cui la generazione di una sezione è stata rimandata ed esegue le
+chiamate rimandate dentro :func:`deferred_section`; nel riferimento queste
+tornano subito dopo la scrittura della loro sezione. Così
+``switches_avoided`` conta sia gli switch evitati dal rinvio sia quelli evitati
+dallo scheduler.
+
+Lo scheduler di una run si attiva con :data:`current_scheduler` (una
+``ContextVar``, come il log eventi): job concorrenti sullo stesso processo non
+si scambiano lo scheduler. :func:`set_default_scheduler` resta per un default
+di processo.
+"""
+from __future__ import annotations
+
+import itertools
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+@dataclass
+class _Ticket:
+    seq: int
+    model: str
+    bypassed: int = 0
+    granted: bool = False
+
+
+class _ResidentSet:
+    """Insieme LRU dei modelli che si assume siano caricati sul server."""
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = max(1, capacity)
+        self._models: "OrderedDict[str, None]" = OrderedDict()
+        self.switches = 0
+
+    def __contains__(self, model: str) -> bool:
+        return model in self._models
+
+    def touch(self, model: str) -> None:
+        if model in self._models:
+            self._models.move_to_end(model)
+            return
+        # Il primo caricamento non è uno switch: lo è solo sostituire un modello residente
+        if len(self._models) >= self.capacity:
+            self._models.popitem(last=False)
+            self.switches += 1
+        self._models[model] = None
+
+
+class ModelAffinityScheduler:
+    """Serializza le chiamate LLM privilegiando i modelli già residenti.
+
+    Parameters
+    ----------
+    max_resident_models:
+        Quanti modelli il server riesce a tenere in memoria contemporaneamente.
+    max_concurrency:
+        Numero di chiamate eseguite in parallelo (1 su GPU singola).
+    max_bypass:
+        Quante volte una richiesta può essere scavalcata prima di essere servita
+        comunque, per evitare starvation dei modelli meno richiesti.
+    """
+
+    def __init__(self, max_resident_models: int = 1, max_concurrency: int = 1, max_bypass: int = 8) -> None:
+        self.max_resident_models = max(1, max_resident_models)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_bypass = max_bypass
+        self._cond = threading.Condition()
+        self._waiting: List[_Ticket] = []
+        self._running = 0
+        self._seq = itertools.count()
+        self._resident = _ResidentSet(self.max_resident_models)
+        self._per_model: Dict[str, int] = {}
+        # (modello, sezione rimandata o None) in ordine di arrivo, per il riferimento FIFO
+        self._arrivals: List[Tuple[str, Optional[str]]] = []
+        # sezione rimandata -> chiamate non rimandate arrivate prima del rinvio
+        self._deferral_marks: Dict[str, int] = {}
+
+    def mark_deferral(self, section: str) -> None:
+        """Segna che il codice di ``section`` è rimandato: senza rinvio partirebbe a questo punto."""
+        with self._cond:
+            self._deferral_marks[section] = sum(1 for _, deferred in self._arrivals if deferred is None)
+
+    def _fifo_order(self) -> List[str]:
+        """Modelli nell'ordine di arrivo che le chiamate avrebbero avuto senza rinvio del codice."""
+        inline = [model for model, deferred in self._arrivals if deferred is None]
+        deferred_at: Dict[int, List[str]] = {}
+        for model, deferred in self._arrivals:
+            if deferred is not None:
+                deferred_at.setdefault(self._deferral_marks[deferred], []).append(model)
+        order: List[str] = []
+        for position in range(len(inline) + 1):
+            order.extend(deferred_at.get(position, []))
+            if position < len(inline):
+                order.append(inline[position])
+        return order
+
+    def _fifo_switches(self) -> int:
+        resident = _ResidentSet(self.max_resident_models)
+        for model in self._fifo_order():
+            resident.touch(model)
+        return resident.switches
+
+    def _pick(self) -> _Ticket:
+        oldest = self._waiting[0]
+        if oldest.bypassed >= self.max_bypass:
+            return oldest
+        for ticket in self._waiting:
+            if ticket.model in self._resident:
+                return ticket
+        return oldest
+
+    def _dispatch(self) -> None:
+        while self._waiting and self._running < self.max_concurrency:
+            ticket = self._pick()
+            self._waiting.remove(ticket)
+            for other in self._waiting:
+                if other.seq < ticket.seq:
+                    other.bypassed += 1
+            ticket.granted = True
+            self._running += 1
+            self._resident.touch(ticket.model)
+            self._per_model[ticket.model] = self._per_model.get(ticket.model, 0) + 1
+        self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, model: str) -> Iterator[None]:
+        """Attende il turno per ``model`` e rilascia lo slot all'uscita."""
+        with self._cond:
+            ticket = _Ticket(seq=next(self._seq), model=model)
+            deferred = current_deferred_section.get()
+            self._arrivals.append((model, deferred if deferred in self._deferral_marks else None))
+            self._waiting.append(ticket)
+            self._dispatch()
+            while not ticket.granted:
+                self._cond.wait()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._running -= 1
+                self._dispatch()
+
+    def stats(self) -> Dict[str, object]:
+        """Switch effettivi e del riferimento FIFO senza rinvio del codice (``fifo_model_switches``)."""
+        with self._cond:
+            fifo_switches = self._fifo_switches()
+            return {
+                "max_resident_models": self.max_resident_models,
+                "model_switches": self._resident.switches,
+                "fifo_model_switches": fifo_switches,
+                "switches_avoided": max(0, fifo_switches - self._resident.switches),
+                "calls_per_model": dict(self._per_model),
+                "queued": len(self._waiting),
+            }
+
+
+_default_scheduler: Optional[ModelAffinityScheduler] = None
+
+# Scheduler della run corrente; ha la precedenza sul default di processo
+current_scheduler: ContextVar[Optional[ModelAffinityScheduler]] = ContextVar("current_scheduler", default=None)
+# Sezione di cui si sta eseguendo il codice rimandato (vedi ``mark_deferral``)
+current_deferred_section: ContextVar[Optional[str]] = ContextVar("current_deferred_section", default=None)
+
+
+@contextmanager
+def deferred_section(section: str) -> Iterator[None]:
+    """Attribuisce a ``section`` le chiamate LLM del blocco, per il riferimento FIFO senza rinvio."""
+    token = current_deferred_section.set(section)
+    try:
+        yield
+    finally:
+        current_deferred_section.reset(token)
+
+
+def set_default_scheduler(scheduler: Optional[ModelAffinityScheduler]) -> None:
+    """Imposta lo scheduler usato da tutti i :class:`LocalLLMTool` senza scheduler esplicito."""
+    global _default_scheduler
+    _default_scheduler = scheduler
+
+
+def get_default_scheduler() -> Optional[ModelAffinityScheduler]:
+    """Scheduler della run corrente (:data:`current_scheduler`) o, in sua assenza, quello di processo."""
+    return current_scheduler.get() or _default_scheduler
@@ -0,0 +1,66 @@
+"""Limiti globali di concorrenza per modello.
+
+Quando più articoli girano nello stesso processo (servizio HTTP), ogni modello
+accetta al massimo ``limit`` richieste contemporanee, indipendentemente da
+quale job le generi. I nomi dei modelli si confrontano in forma canonica
+(``qwen2.5:14b`` vale quanto ``ollama/qwen2.5:14b``, ``phi4`` quanto ``phi4:latest``).
+"""
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Mapping, Optional
+
+from llm.endpoint_pool import _canonical_model
+
+
+class ModelConcurrencyLimiter:
+    """Semaforo per modello; ``limits`` sovrascrive ``default_limit`` per i singoli modelli."""
+
+    def __init__(self, default_limit: int = 1, limits: Optional[Mapping[str, int]] = None) -> None:
+        self.default_limit = max(1, default_limit)
+        self.limits = {_canonical_model(model): limit for model, limit in (limits or {}).items()}
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, model: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if model not in self._semaphores:
+                self._semaphores[model] = threading.BoundedSemaphore(self._limit(model))
+            return self._semaphores[model]
+
+    def _limit(self, model: str) -> int:
+        return self.limits.get(_canonical_model(model), self.default_limit)
+
+    @contextmanager
+    def slot(self, model: str) -> Iterator[None]:
+        semaphore = self._semaphore(model)
+        with semaphore:
+            with self._lock:
+                self._in_flight[model] = self._in_flight.get(model, 0) + 1
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self._in_flight[model] -= 1
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {
+                model: {"in_flight": self._in_flight.get(model, 0), "limit": self._limit(model)}
+                for model in self._semaphores
+            }
+
+
+_default_limiter: Optional[ModelConcurrencyLimiter] = None
+
+
+def set_default_limiter(limiter: Optional[ModelConcurrencyLimiter]) -> None:
+    """Imposta il limitatore usato da tutti i :class:`LocalLLMTool` del processo."""
+    global _default_limiter
+    _default_limiter = limiter
+
+
+def get_default_limiter() -> Optional[ModelConcurrencyLimiter]:
+    return _default_limiter
@@ -0,0 +1,204 @@
+"""Pool di server Ollama con bilanciamento least-outstanding-requests.
+
+Ogni richiesta viene instradata all'endpoint sano, che espone il modello
+richiesto, con meno richieste in corso. La disponibilità dei modelli è letta da
+``/api/tags`` e aggiornata periodicamente; per ogni endpoint sono raccolte
+statistiche di latenza e gli errori alimentano un circuit breaker dedicato.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Iterable, List, Optional, Sequence
+
+from llm.model_warmup import ollama_model_name
+from llm.resilience import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+
+class NoEndpointAvailable(RuntimeError):
+    """Nessun endpoint sano espone il modello richiesto."""
+
+
+def _canonical_model(model: str) -> str:
+    name = ollama_model_name(model)
+    return name if ":" in name else f"{name}:latest"
+
+
+def _percentile(sorted_values: Sequence[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+@dataclass
+class Endpoint:
+    base_url: str
+    outstanding: int = 0
+    healthy: bool = True
+    # None = modelli non ancora noti: l'endpoint è considerato compatibile
+    models: Optional[set[str]] = None
+    requests: int = 0
+    failures: int = 0
+    last_checked: float = 0.0
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=512), repr=False)
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker, repr=False)
+
+    def has_model(self, model: str) -> bool:
+        return self.models is None or _canonical_model(model) in self.models
+
+    def latency_quantile(self, q: float) -> float:
+        return _percentile(sorted(self.latencies), q)
+
+    def latency_stats(self) -> Dict[str, float]:
+        values = sorted(self.latencies)
+        return {
+            "count": len(values),
+            "avg": round(sum(values) / len(values), 3) if values else 0.0,
+            "p50": round(_percentile(values, 0.50), 3),
+            "p95": round(_percentile(values, 0.95), 3),
+            "max": round(values[-1], 3) if values else 0.0,
+        }
+
+
+class EndpointPool:
+    """Insieme di endpoint Ollama condivisibile tra più :class:`LocalLLMTool`.
+
+    Parameters
+    ----------
+    base_urls:
+        URL dei server Ollama.
+    refresh_interval:
+        Secondi dopo i quali salute e modelli disponibili vengono riletti.
+    probe_timeout:
+        Timeout delle chiamate a ``/api/tags``.
+    failure_threshold, reset_timeout:
+        Parametri del circuit breaker di ciascun endpoint.
+    """
+
+    def __init__(
+        self,
+        base_urls: Iterable[str],
+        refresh_interval: float = 30.0,
+        probe_timeout: float = 2.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+    ) -> None:
+        self.endpoints: List[Endpoint] = [
+            Endpoint(base_url=url.rstrip("/"), breaker=CircuitBreaker(failure_threshold, reset_timeout))
+            for url in dict.fromkeys(base_urls)
+        ]
+        if not self.endpoints:
+            raise ValueError("EndpointPool richiede almeno un base_url.")
+        self.refresh_interval = refresh_interval
+        self.probe_timeout = probe_timeout
+        self._lock = threading.Lock()
+
+    @property
+    def base_urls(self) -> List[str]:
+        return [ep.base_url for ep in self.endpoints]
+
+    def _probe(self, endpoint: Endpoint) -> None:
+        try:
+            with urllib.request.urlopen(f"{endpoint.base_url}/api/tags", timeout=self.probe_timeout) as response:
+                body = json.loads(response.read().decode("utf-8") or "{}")
+            models = {_canonical_model(m.get("name") or m.get("model", "")) for m in body.get("models", [])}
+            healthy = True
+        except (urllib.error.URLError, OSError, ValueError) as exc:
+            logger.warning("Endpoint %s non raggiungibile: %s", endpoint.base_url, exc)
+            models, healthy = endpoint.models, False
+        with self._lock:
+            endpoint.models = models
+            endpoint.healthy = healthy
+            endpoint.last_checked = time.monotonic()
+
+    def refresh(self, force: bool = False) -> None:
+        """Aggiorna salute e modelli degli endpoint scaduti (o di tutti con ``force``)."""
+        now = time.monotonic()
+        for endpoint in self.endpoints:
+            if force or now - endpoint.last_checked >= self.refresh_interval:
+                self._probe(endpoint)
+
+    def endpoints_for(self, model: str) -> List[Endpoint]:
+        self.refresh()
+        with self._lock:
+            return [ep for ep in self.endpoints if ep.healthy and ep.has_model(model)]
+
+    def _candidates(self, model: str, exclude: Sequence[str]) -> List[Endpoint]:
+        candidates = [
+            ep for ep in self.endpoints
+            if ep.healthy and ep.has_model(model) and ep.base_url not in exclude and ep.breaker.is_available()
+        ]
+        # Least outstanding; a parità si preferisce la latenza media più bassa
+        return sorted(candidates, key=lambda ep: (ep.outstanding, ep.latency_stats()["avg"]))
+
+    def _reserve(self, model: str, exclude: Sequence[str]) -> Optional[Endpoint]:
+        with self._lock:
+            for endpoint in self._candidates(model, exclude):
+                if endpoint.breaker.allow():
+                    endpoint.outstanding += 1
+                    endpoint.requests += 1
+                    return endpoint
+        return None
+
+    def acquire(self, model: str, exclude: Sequence[str] = ()) -> Endpoint:
+        """Riserva l'endpoint migliore per ``model``; va sempre seguito da :meth:`release`."""
+        self.refresh()
+        endpoint = self._reserve(model, exclude)
+        if endpoint is None:
+            # Gli endpoint marcati non sani potrebbero essere tornati disponibili
+            self.refresh(force=True)
+            endpoint = self._reserve(model, exclude)
+        if endpoint is None:
+            raise NoEndpointAvailable(f"Nessun endpoint disponibile per il modello {model}.")
+        return endpoint
+
+    def can_hedge(self, model: str, exclude: Sequence[str]) -> bool:
+        with self._lock:
+            return bool(self._candidates(model, exclude))
+
+    def release(self, endpoint: Endpoint, elapsed: float, ok: bool = True) -> None:
+        with self._lock:
+            endpoint.outstanding = max(0, endpoint.outstanding - 1)
+            if ok:
+                endpoint.latencies.append(elapsed)
+            else:
+                endpoint.failures += 1
+        if ok:
+            endpoint.breaker.record_success()
+        else:
+            endpoint.breaker.record_failure()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                ep.base_url: {
+                    "healthy": ep.healthy,
+                    "outstanding": ep.outstanding,
+                    "requests": ep.requests,
+                    "failures": ep.failures,
+                    "circuit": ep.breaker.state,
+                    "models": sorted(ep.models) if ep.models is not None else None,
+                    "latency": ep.latency_stats(),
+                }
+                for ep in self.endpoints
+            }
+
+
+def detect_model_capabilities(base_urls: Sequence[str]) -> List[str]:
+    """Tag ``ollama/<modello>`` per i modelli presenti su almeno un endpoint."""
+    pool = EndpointPool(base_urls)
+    pool.refresh(force=True)
+    models = set()
+    for endpoint in pool.endpoints:
+        if endpoint.healthy:
+            models.update(f"ollama/{name}" for name in endpoint.models)
+    return sorted(models)
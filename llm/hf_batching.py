@@ -0,0 +1,172 @@
+"""Generazione in-process su CPU con batching dinamico (backend ``huggingface``).
+
+Le chiamate concorrenti a :class:`LocalLLMTool` (review o editing in parallelo,
+più job nel servizio) vengono messe in coda: un unico thread di generazione
+prende la prima richiesta, attende al più ``max_wait_ms`` che ne arrivino altre
+fino a ``max_batch_size`` e le genera insieme con un solo ``model.generate``
+su input con padding a sinistra. Su CPU ogni passo di decodifica costa quasi lo
+stesso per una o più sequenze, per cui il batch moltiplica il throughput a
+fronte di una piccola attesa in coda.
+
+``transformers`` e ``torch`` sono dipendenze facoltative, importate solo quando
+si crea un tool con ``backend="huggingface"``.
+"""
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH_SIZE = 8
+DEFAULT_MAX_WAIT_MS = 10.0
+DEFAULT_MAX_NEW_TOKENS = 512
+
+
+def load_hf_model(model_name: str, trust_remote_code: bool = False, device: int | str | None = None) -> tuple:
+    """Tokenizer e modello causale da un nome dell'Hub o da una cartella locale."""
+    try:
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+        from transformers import logging as hf_logging
+    except ImportError as e:
+        raise ValueError(
+            "Il backend 'huggingface' richiede `transformers` e `torch` (pip install torch transformers)."
+        ) from e
+    hf_logging.set_verbosity_error()
+    logger.info("Caricamento del modello Hugging Face '%s'...", model_name)
+    tokenizer = AutoTokenizer.from_pretrained(model_name, padding_side="left", trust_remote_code=trust_remote_code)
+    if tokenizer.pad_token_id is None and tokenizer.eos_token_id is not None:
+        tokenizer.pad_token = tokenizer.eos_token
+    model = AutoModelForCausalLM.from_pretrained(model_name, trust_remote_code=trust_remote_code)
+    if device is not None:
+        model = model.to(device if isinstance(device, str) else f"cuda:{device}")
+    model.eval()
+    return tokenizer, model
+
+
+def messages_to_prompt(messages: Any, tokenizer: Any) -> str:
+    """Prompt testuale dai messaggi CrewAI (chat template del tokenizer, se presente)."""
+    if isinstance(messages, str):
+        return messages
+    chat = []
+    for message in messages:
+        if isinstance(message, Mapping):
+            chat.append({"role": str(message.get("role", "user")), "content": str(message.get("content") or "")})
+        else:
+            chat.append({"role": "user", "content": str(message)})
+    if getattr(tokenizer, "chat_template", None):
+        return tokenizer.apply_chat_template(chat, tokenize=False, add_generation_prompt=True)
+    lines = [f"{item['role'].upper()}: {item['content']}" for item in chat]
+    return "\n".join(lines + ["ASSISTANT:"])
+
+
+def _truncate_at_stop(text: str, stop: Optional[Sequence[str]]) -> str:
+    cut = min((text.find(word) for word in stop or () if word and word in text), default=-1)
+    return text[:cut] if cut >= 0 else text
+
+
+@dataclass
+class _Request:
+    prompt: str
+    stop: Optional[Sequence[str]]
+    future: Future = field(default_factory=Future)
+    enqueued: float = field(default_factory=time.perf_counter)
+
+
+class BatchingGenerator:
+    """Coda di richieste servita da un thread che genera a batch dinamici."""
+
+    def __init__(
+        self,
+        model: Any,
+        tokenizer: Any,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+        max_new_tokens: int = DEFAULT_MAX_NEW_TOKENS,
+        generation_kwargs: Optional[Mapping[str, Any]] = None,
+        name: str = "hf",
+    ) -> None:
+        if max_batch_size < 1:
+            raise ValueError("`max_batch_size` deve essere >= 1.")
+        if max_wait_ms < 0:
+            raise ValueError("`max_wait_ms` deve essere >= 0.")
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_new_tokens = max_new_tokens
+        self.generation_kwargs = dict(generation_kwargs or {})
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "batches": 0, "generated_tokens": 0, "generate_seconds": 0.0, "queue_seconds": 0.0}
+        self._batch_sizes: Dict[int, int] = {}
+        self._thread = threading.Thread(target=self._run, name=f"{name}-batcher", daemon=True)
+        self._thread.start()
+
+    def generate(self, messages: Any, stop: Optional[Sequence[str]] = None) -> str:
+        """Accoda la richiesta e ne attende il testo generato (solo la continuazione)."""
+        request = _Request(prompt=messages_to_prompt(messages, self.tokenizer), stop=stop)
+        if not request.prompt:
+            raise ValueError("Prompt vuoto passato al modello Hugging Face.")
+        self._queue.put(request)
+        return request.future.result()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["batch_sizes"] = dict(sorted(self._batch_sizes.items()))
+        stats["mean_batch_size"] = round(stats["requests"] / stats["batches"], 2) if stats["batches"] else 0.0
+        return stats
+
+    def _collect(self) -> List[_Request]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            try:
+                texts, new_tokens = self._generate([request.prompt for request in batch])
+            except Exception as exc:  # l'errore raggiunge ogni chiamante del batch
+                for request in batch:
+                    request.future.set_exception(exc)
+                continue
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._stats["requests"] += len(batch)
+                self._stats["batches"] += 1
+                self._stats["generated_tokens"] += new_tokens
+                self._stats["generate_seconds"] += elapsed
+                self._stats["queue_seconds"] += sum(started - request.enqueued for request in batch)
+                self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+            for request, text in zip(batch, texts):
+                request.future.set_result(_truncate_at_stop(text, request.stop).strip())
+
+    def _generate(self, prompts: List[str]) -> tuple[List[str], int]:
+        import torch
+
+        inputs = self.tokenizer(prompts, return_tensors="pt", padding=True).to(self.model.device)
+        with torch.inference_mode():
+            output = self.model.generate(
+                **inputs,
+                max_new_tokens=self.max_new_tokens,
+                pad_token_id=self.tokenizer.pad_token_id,
+                **self.generation_kwargs,
+            )
+        # Con il padding a sinistra la continuazione inizia per tutti dopo la stessa colonna
+        generated = output[:, inputs["input_ids"].shape[1]:]
+        new_tokens = int((generated != self.tokenizer.pad_token_id).sum()) if self.tokenizer.pad_token_id is not None else generated.numel()
+        return self.tokenizer.batch_decode(generated, skip_special_tokens=True), new_tokens
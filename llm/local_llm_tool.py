@@ -1,16 +1,33 @@
 from __future__ import annotations
+import contextvars
+import copy
 import logging
-from dataclasses import dataclass
-from typing import Any, Iterable, List, Mapping, MutableMapping, Sequence
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FuturesTimeout, wait
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Mapping, MutableMapping, Sequence
+import json
 from crewai import LLM
 
+from llm.affinity_scheduler import ModelAffinityScheduler, get_default_scheduler
+from llm.concurrency import get_default_limiter
+from llm.request_scheduler import current_request_context
+from llm.endpoint_pool import Endpoint, EndpointPool
+from llm.hf_batching import DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_WAIT_MS, DEFAULT_MAX_NEW_TOKENS, BatchingGenerator, load_hf_model
+from llm.prompt_metrics import instrumented_http_handler
+from llm.resilience import CircuitBreaker, CircuitOpenError, HedgePolicy, RetryPolicy, is_transient_error
+from llm.run_metrics import RunMetrics, current_run_metrics
+from llm.single_flight import get_default_single_flight, request_key
+from utils.run_events import emit_event
+
 logger = logging.getLogger(__name__)
 
-# from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
-# from transformers import logging as hf_logging
 from crewai.llms.base_llm import BaseLLM
 
-# hf_logging.set_verbosity_error()
+# Thread condivisi per le richieste hedged (primaria + duplicato)
+_HEDGE_EXECUTOR = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
 
 
 @dataclass
@@ -22,6 +39,62 @@ class Output:
         return f"Output(raw={self.raw!r})"
 
 
+@dataclass
+class LLMCallStats:
+    """Statistiche cumulative di inferenza di un :class:`LocalLLMTool`.
+
+    Il tempo di caricamento del modello (misurato dal warm-up) è tenuto
+    separato: qui confluisce solo il tempo speso nelle chiamate di inferenza.
+    Dentro una run i contatori vengono aggiornati anche nella copia della run
+    (:meth:`for_run`).
+    """
+    calls: int = 0
+    errors: int = 0
+    retries: int = 0
+    hedged: int = 0
+    hedge_wins: int = 0
+    coalesced: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def for_run(self, run: RunMetrics) -> "LLMCallStats":
+        """Contatori di questo tool limitati alla run ``run``."""
+        return run.entry("inference", id(self), LLMCallStats)
+
+    def _targets(self) -> List["LLMCallStats"]:
+        run = current_run_metrics.get()
+        return [self] if run is None else [self, self.for_run(run)]
+
+    def record(self, elapsed: float, ok: bool = True) -> None:
+        for stats in self._targets():
+            with stats._lock:
+                stats.calls += 1
+                if not ok:
+                    stats.errors += 1
+                stats.total_seconds += elapsed
+                stats.max_seconds = max(stats.max_seconds, elapsed)
+
+    def increment(self, counter: str) -> None:
+        for stats in self._targets():
+            with stats._lock:
+                setattr(stats, counter, getattr(stats, counter) + 1)
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "retries": self.retries,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "coalesced": self.coalesced,
+                "total_seconds": round(self.total_seconds, 3),
+                "avg_seconds": round(self.total_seconds / self.calls, 3) if self.calls else 0.0,
+                "max_seconds": round(self.max_seconds, 3),
+            }
+
+
 def _normalize_content(content: Any) -> str:
     """Converte diversi tipi di contenuto in una stringa."""
 
@@ -39,71 +112,58 @@ def _normalize_content(content: Any) -> str:
     return str(content)
 
 
-# class _HuggingFaceLLMAdapter(BaseLLM):
-#     """Adattatore ``BaseLLM`` che incapsula una pipeline ``transformers``."""
-
-#     def __init__(
-#         self,
-#         model_name: str,
-#         text_generation_pipeline,
-#         # max_new_tokens: int,
-#         temperature: float | None = None,
-#     ) -> None:
-#         super().__init__(model=model_name, temperature=temperature)
-#         self._pipeline = text_generation_pipeline
-
-#     def _messages_to_prompt(self, messages: Sequence[Any]) -> str:
-#         prompt_lines: List[str] = []
-#         for message in messages:
-#             role = "user"
-#             content = ""
-#             if isinstance(message, Mapping):
-#                 role = str(message.get("role", role))
-#                 content = _normalize_content(message.get("content"))
-#             else:
-#                 role = str(getattr(message, "role", getattr(message, "type", role)))
-#                 content = _normalize_content(getattr(message, "content", message))
-
-#             role = role.upper() if role else "USER"
-#             prompt_lines.append(f"{role}: {content}")
-
-#         if prompt_lines and not prompt_lines[-1].startswith("ASSISTANT:"):
-#             prompt_lines.append("ASSISTANT:")
-        
-#         return "\n".join(prompt_lines)
-
-#     def _coerce_prompt(self, messages: Any) -> str:
-#         if isinstance(messages, str):
-#             return messages
-#         if isinstance(messages, Iterable):
-#             return self._messages_to_prompt(list(messages))
-#         return str(messages)
-    
-#     def call(
-#         self,
-#         messages: Any,
-#         tools: list[dict[str, Any]] | None = None,
-#         callbacks: list[Any] | None = None,
-#         available_functions: Mapping[str, Any] | None = None,
-#     ) -> str:
-#         prompt = self._coerce_prompt(messages)
-#         if not prompt:
-#             raise ValueError("Prompt vuoto passato al modello Hugging Face.")
-
-#         generations = self._pipeline(
-#             prompt,
-#             # max_new_tokens=self._max_new_tokens,
-#             pad_token_id=self._pipeline.tokenizer.eos_token_id,
-#             return_full_text=False,
-#         )
-#         if not generations:
-#             raise RuntimeError("La pipeline Hugging Face non ha prodotto output.")
-#         candidate = generations[0]
-#         if isinstance(candidate, MutableMapping):
-#             text = candidate.get("generated_text") or candidate.get("summary_text")
-#             if text is not None:
-#                 return text.strip()
-#         return _normalize_content(candidate).strip()
+class _LocalLLMAdapter(BaseLLM):
+    """Adattatore ``BaseLLM`` passato agli agenti CrewAI.
+
+    Ogni chiamata degli agenti transita da :meth:`LocalLLMTool._call`, così le
+    metriche (e le politiche applicate dal tool) valgono anche per le crew e non
+    solo per :meth:`LocalLLMTool.run`.
+    """
+
+    def __init__(self, tool: "LocalLLMTool", output_schema: Mapping[str, Any] | None = None) -> None:
+        super().__init__(model=tool.model, temperature=tool.temperature)
+        self._tool = tool
+        # JSON Schema passato a Ollama come ``format`` (decoding vincolato)
+        self.output_schema = output_schema
+
+    def call(
+        self,
+        messages: Any,
+        tools: list[dict[str, Any]] | None = None,
+        callbacks: list[Any] | None = None,
+        available_functions: Mapping[str, Any] | None = None,
+    ) -> Any:
+        return self._tool._call(
+            messages,
+            tools=tools,
+            callbacks=callbacks,
+            available_functions=available_functions,
+            stop=self.stop,
+            output_schema=self.output_schema,
+        )
+
+    def supports_function_calling(self) -> bool:
+        return self._tool._llm.supports_function_calling()
+
+    def supports_stop_words(self) -> bool:
+        return self._tool._llm.supports_stop_words()
+
+    def get_context_window_size(self) -> int:
+        return self._tool._llm.get_context_window_size()
+
+
+class _HuggingFaceLLMAdapter(_LocalLLMAdapter):
+    """Adattatore per il backend ``huggingface``: stesse chiamate, modello in-process."""
+
+    def supports_function_calling(self) -> bool:
+        return False
+
+    def supports_stop_words(self) -> bool:
+        # Le stop word vengono applicate al testo generato
+        return True
+
+    def get_context_window_size(self) -> int:
+        return self._tool.num_ctx
 
 
 class LocalLLMTool:
@@ -120,11 +180,47 @@ class LocalLLMTool:
         top_k: int = 40,
         repeat_penalty: float = 1.1,
         num_ctx: int = 4096,
-        base_url: str = "http://localhost:11434",
+        base_url: str | Sequence[str] = "http://localhost:11434",
+        keep_alive: str | int | None = None,
+        scheduler: ModelAffinityScheduler | None = None,
+        endpoint_pool: EndpointPool | None = None,
+        request_timeout: float | None = 600.0,
+        retry_policy: RetryPolicy | None = None,
+        hedge_policy: HedgePolicy | None = None,
+        seed: int | None = None,
+        coalesce: bool = True,
         hf_device: int | str | None = None,
         trust_remote_code: bool = False,
+        max_new_tokens: int = DEFAULT_MAX_NEW_TOKENS,
+        hf_max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        hf_batch_wait_ms: float = DEFAULT_MAX_WAIT_MS,
     ) -> None:
         self.model = model
+        self.temperature = temperature
+        self.num_ctx = num_ctx
+        # Più base_url (o un pool condiviso) abilitano il bilanciamento tra server Ollama
+        if endpoint_pool is None and not isinstance(base_url, str) and len(base_url) > 1:
+            endpoint_pool = EndpointPool(base_url)
+        self.endpoint_pool = endpoint_pool
+        if endpoint_pool is not None:
+            self.base_urls = endpoint_pool.base_urls
+        else:
+            self.base_urls = [base_url] if isinstance(base_url, str) else list(base_url)
+        self.base_url = self.base_urls[0]
+        # Politica di permanenza in memoria lato Ollama ("30m", -1 = sempre, 0 = scarica subito)
+        self.keep_alive = keep_alive
+        # Se assente si usa lo scheduler della run o di processo (vedi get_default_scheduler)
+        self.scheduler = scheduler
+        self.retry_policy = retry_policy or RetryPolicy()
+        # Hedging sensato solo con almeno due endpoint nel pool
+        self.hedge_policy = hedge_policy or HedgePolicy()
+        # Circuit breaker usato quando non c'è un pool (che ne ha uno per endpoint)
+        self._breaker = CircuitBreaker()
+        self.stats = LLMCallStats()
+        # Richieste deterministiche identiche e concorrenti vengono accorpate (vedi llm.single_flight)
+        self.seed = seed
+        self.coalesce = coalesce
+        self.deterministic = temperature == 0 or seed is not None
         self.backend = backend.lower()
         if self.backend not in self.SUPPORTED_BACKENDS:
             raise ValueError(
@@ -133,62 +229,240 @@ class LocalLLMTool:
 
         if self.backend == "ollama":
             # --- Ollama backend ---
-            self.llm = LLM(
-                model=self.model,
-                base_url=base_url,
-                temperature=temperature,
-                top_p=top_p,
-                top_k=top_k,
-                repeat_penalty=repeat_penalty,
-                num_ctx=num_ctx,
-                stream=False,
-            )
+            # Il client strumentato registra prompt_eval_count/duration di ogni risposta
+            self._llm_params: dict[str, Any] = {
+                "model": self.model,
+                "temperature": temperature,
+                "top_p": top_p,
+                "top_k": top_k,
+                "repeat_penalty": repeat_penalty,
+                "num_ctx": num_ctx,
+                "stream": False,
+                "timeout": request_timeout,
+                "client": instrumented_http_handler(request_timeout),
+            }
+            if keep_alive is not None:
+                self._llm_params["keep_alive"] = keep_alive
+            if seed is not None:
+                self._llm_params["seed"] = seed
+            # Un client LiteLLM per endpoint: il routing sceglie quale usare a ogni chiamata
+            self._llms = {url: LLM(base_url=url, **self._llm_params) for url in self.base_urls}
+            self._llm = self._llms[self.base_url]
+            # Client con ``format`` vincolato, creati alla prima richiesta per (endpoint, schema)
+            self._structured_llms: dict[tuple[str, str], LLM] = {}
+            self._structured_adapters: dict[str, _LocalLLMAdapter] = {}
+            self._structured_lock = threading.Lock()
+            self._batcher: BatchingGenerator | None = None
+            self.llm = _LocalLLMAdapter(self)
         else:
-            # # --- Hugging Face backend ---
-            # logger.info("Caricamento del modello Hugging Face '%s'...", self.model)
-
-            # tokenizer = AutoTokenizer.from_pretrained(
-            #     self.model,
-            #     padding_side="left",
-            #     trust_remote_code=trust_remote_code,
-            # )
-            # if tokenizer.pad_token_id is None and tokenizer.eos_token_id is not None:
-            #     tokenizer.pad_token = tokenizer.eos_token
-            # model_hf = AutoModelForCausalLM.from_pretrained(self.model)
-
-            # model_hf = AutoModelForCausalLM.from_pretrained(
-            #     self.model,
-            #     trust_remote_code=trust_remote_code,
-            # )
-
-            # pipeline_kwargs: dict[str, Any] = {
-            #     "temperature": temperature,
-            #     "top_p": top_p,
-            #     "top_k": top_k,
-            #     "repetition_penalty": repeat_penalty,
-            #     "return_full_text": False,
-            # }
-            # if hf_device is not None:
-            #     pipeline_kwargs["device"] = hf_device
-
-            # generation_pipeline = pipeline(
-            #     "text-generation",
-            #     model=model_hf,
-            #     tokenizer=tokenizer,
-            #     **pipeline_kwargs,
-            # )
-
-            # self.llm = _HuggingFaceLLMAdapter(
-            #     model_name=self.model,
-            #     text_generation_pipeline=generation_pipeline,
-            #     temperature=temperature,
-            # )
-            raise ValueError("SORRY: HF NEED TO BE FIXED!!!")
+            # --- Hugging Face backend: modello in-process, chiamate concorrenti a batch ---
+            self._llm_params = {
+                "model": self.model,
+                "temperature": temperature,
+                "top_p": top_p,
+                "top_k": top_k,
+                "repeat_penalty": repeat_penalty,
+                "max_new_tokens": max_new_tokens,
+            }
+            tokenizer, model_hf = load_hf_model(self.model, trust_remote_code=trust_remote_code, device=hf_device)
+            generation_kwargs: dict[str, Any] = {"repetition_penalty": repeat_penalty, "do_sample": temperature > 0}
+            if temperature > 0:
+                generation_kwargs.update(temperature=temperature, top_p=top_p, top_k=top_k)
+            self._batcher = BatchingGenerator(
+                model_hf,
+                tokenizer,
+                max_batch_size=hf_max_batch_size,
+                max_wait_ms=hf_batch_wait_ms,
+                max_new_tokens=max_new_tokens,
+                generation_kwargs=generation_kwargs,
+                name=self.model.rsplit("/", 1)[-1],
+            )
+            self._structured_adapters = {}
+            self._structured_lock = threading.Lock()
+            self.llm = _HuggingFaceLLMAdapter(self)
         
-    def run(self, prompt: Any) -> Output:
+    def structured(self, output_schema: Mapping[str, Any]) -> _LocalLLMAdapter:
+        """Adattatore per gli agenti le cui risposte devono rispettare ``output_schema``.
+
+        Condivide modello, endpoint, metriche e politiche del tool; cambia solo il
+        ``format`` inviato a Ollama. Il backend ``huggingface`` non vincola il
+        decoding: l'output viene interpretato a valle (``parse_structured_output``).
+        """
+        key = json.dumps(output_schema, sort_keys=True)
+        with self._structured_lock:
+            if key not in self._structured_adapters:
+                self._structured_adapters[key] = type(self.llm)(self, output_schema=output_schema)
+            return self._structured_adapters[key]
+
+    def _llm_for(self, base_url: str, output_schema: Mapping[str, Any] | None) -> LLM:
+        if output_schema is None:
+            return self._llms[base_url]
+        key = (base_url, json.dumps(output_schema, sort_keys=True))
+        with self._structured_lock:
+            if key not in self._structured_llms:
+                self._structured_llms[key] = LLM(base_url=base_url, format=dict(output_schema), **self._llm_params)
+            return self._structured_llms[key]
+
+    def _call(
+        self,
+        messages: Any,
+        stop: list[str] | None = None,
+        output_schema: Mapping[str, Any] | None = None,
+        **call_kwargs: Any,
+    ) -> Any:
+        """Punto unico di invocazione del modello, condiviso da agenti e :meth:`run`.
+
+        Le richieste deterministiche (temperatura 0 o ``seed``) identiche a una già
+        in volo non occupano uno slot del modello: attendono quella e ne
+        condividono la risposta.
+        """
+        if not (self.coalesce and self.deterministic):
+            return self._call_model(messages, stop, output_schema, call_kwargs)
+
+        key = request_key(
+            params={k: v for k, v in self._llm_params.items() if k not in ("client", "timeout")},
+            messages=messages,
+            stop=stop,
+            output_schema=output_schema,
+            tools=call_kwargs.get("tools"),
+        )
+        queued = time.perf_counter()
+        result, shared = get_default_single_flight().do(
+            key, lambda: self._call_model(messages, stop, output_schema, call_kwargs), label=self.model
+        )
+        if shared:
+            self.stats.increment("coalesced")
+            emit_event("llm_coalesced", model=self.model, wait_seconds=round(time.perf_counter() - queued, 3))
+        return result
+
+    def _call_model(
+        self, messages: Any, stop: list[str] | None, output_schema: Mapping[str, Any] | None, call_kwargs: dict
+    ) -> Any:
+        # Il backend in-process limita da sé la concorrenza (batch); i limiti per modello lo serializzerebbero
+        in_process = self._batcher is not None
+        limiter = None if in_process else get_default_limiter()
+        scheduler = None if in_process else self.scheduler or get_default_scheduler()
+        request = current_request_context.get()
+        queued = time.perf_counter()
+        with limiter.slot(self.model) if limiter is not None else nullcontext(), \
+                scheduler.slot(self.model) if scheduler is not None else nullcontext():
+            started = time.perf_counter()
+            ok = False
+            try:
+                result = self._call_with_retries(messages, stop, output_schema, call_kwargs)
+                ok = True
+                return result
+            finally:
+                elapsed = time.perf_counter() - started
+                self.stats.record(elapsed, ok=ok)
+                emit_event(
+                    "llm_call",
+                    model=self.model,
+                    seconds=round(elapsed, 3),
+                    wait_seconds=round(started - queued, 3),
+                    priority=request.priority if request is not None else None,
+                    ok=ok,
+                )
+
+    def _call_with_retries(
+        self, messages: Any, stop: list[str] | None, output_schema: Mapping[str, Any] | None, call_kwargs: dict
+    ) -> Any:
+        if self._batcher is not None:
+            # Modello in-process: nessun errore transitorio da ritentare
+            return self._batcher.generate(messages, stop=stop)
+        attempt = 0
+        while True:
+            try:
+                if self.endpoint_pool is not None and self.hedge_policy.enabled:
+                    return self._hedged_attempt(messages, stop, output_schema, call_kwargs)
+                endpoint = self.endpoint_pool.acquire(self.model) if self.endpoint_pool is not None else None
+                return self._attempt(endpoint, messages, stop, output_schema, call_kwargs)
+            except Exception as exc:
+                if attempt + 1 >= self.retry_policy.max_attempts or not is_transient_error(exc):
+                    raise
+                delay = self.retry_policy.delay(attempt)
+                logger.warning(
+                    "Chiamata a %s fallita (%s), nuovo tentativo %d/%d tra %.1fs",
+                    self.model, exc, attempt + 2, self.retry_policy.max_attempts, delay,
+                )
+                self.stats.increment("retries")
+                time.sleep(delay)
+                attempt += 1
+
+    def _attempt(
+        self,
+        endpoint: Endpoint | None,
+        messages: Any,
+        stop: list[str] | None,
+        output_schema: Mapping[str, Any] | None,
+        call_kwargs: dict,
+    ) -> Any:
+        """Singolo tentativo sull'endpoint già riservato (o sull'unico server configurato)."""
+
+        if endpoint is None and not self._breaker.allow():
+            raise CircuitOpenError(f"Circuito aperto per {self.model} su {self.base_url}.")
+        llm = self._llm_for(endpoint.base_url if endpoint is not None else self.base_url, output_schema)
+        if stop is not None:
+            # Il client è condiviso tra i thread dell'endpoint: le stop word vanno su una copia per chiamata
+            llm = copy.copy(llm)
+            llm.stop = list(stop)
+        started = time.perf_counter()
+        # Solo gli errori transitori contano per il circuit breaker
+        healthy = True
+        try:
+            return llm.call(messages, **call_kwargs)
+        except Exception as exc:
+            healthy = not is_transient_error(exc)
+            raise
+        finally:
+            if endpoint is not None:
+                self.endpoint_pool.release(endpoint, time.perf_counter() - started, ok=healthy)
+            elif healthy:
+                self._breaker.record_success()
+            else:
+                self._breaker.record_failure()
+
+    def _hedged_attempt(
+        self, messages: Any, stop: list[str] | None, output_schema: Mapping[str, Any] | None, call_kwargs: dict
+    ) -> Any:
+        """Invia la richiesta e, se non risponde entro il p95 dell'endpoint, un duplicato altrove."""
+
+        primary = self.endpoint_pool.acquire(self.model)
+        # Ogni tentativo gira in una copia del contesto (run, job e priorità restano visibili)
+        first = _HEDGE_EXECUTOR.submit(contextvars.copy_context().run, self._attempt, primary, messages, stop, output_schema, call_kwargs)
+        policy = self.hedge_policy
+        delay = (
+            max(policy.min_delay, primary.latency_quantile(policy.quantile))
+            if len(primary.latencies) >= policy.min_samples
+            else policy.min_delay
+        )
+        try:
+            return first.result(timeout=delay)
+        except FuturesTimeout:
+            pass
+        if not self.endpoint_pool.can_hedge(self.model, exclude=[primary.base_url]):
+            return first.result()
+
+        secondary = self.endpoint_pool.acquire(self.model, exclude=[primary.base_url])
+        self.stats.increment("hedged")
+        second = _HEDGE_EXECUTOR.submit(contextvars.copy_context().run, self._attempt, secondary, messages, stop, output_schema, call_kwargs)
+        done, _ = wait([first, second], return_when=FIRST_COMPLETED)
+        winner = next(iter(done))
+        if winner.exception() is None:
+            if winner is second:
+                self.stats.increment("hedge_wins")
+            return winner.result()
+        # La prima risposta è un errore: si attende l'altra richiesta
+        return (second if winner is first else first).result()
+
+    def batching_stats(self) -> Dict[str, Any] | None:
+        """Statistiche dei batch del backend ``huggingface`` (``None`` con Ollama)."""
+        return self._batcher.stats() if self._batcher is not None else None
+
+    def run(self, prompt: Any, output_schema: Mapping[str, Any] | None = None) -> Output:
         """Esegue il modello e restituisce sempre un :class:`Output`."""
 
-        raw_result = self.llm.call(prompt)
+        raw_result = self._call(prompt, output_schema=output_schema)
 
         if isinstance(raw_result, Output):
             return raw_result
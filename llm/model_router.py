@@ -0,0 +1,169 @@
+"""Scelta del modello per singola chiamata in base al task e alla lunghezza dell'input.
+
+Ogni agente ha in ``agents.yaml`` una sola chiave ``llm``. Un task può
+dichiarare in ``tasks.yaml`` delle regole ``routing``: ogni regola punta a una
+chiave del registry (il "tier" di qualità/costo) e vale per gli input entro
+``max_input_chars`` (ed eventualmente oltre ``min_input_chars``). La prima regola
+che corrisponde decide il modello; se nessuna corrisponde resta l'``llm``
+dell'agente::
+
+    structure_analysis_task:
+      routing:
+        - llm: small_llm          # phi4 per prompt brevi
+          max_input_chars: 6000   # oltre, il modello dell'agente
+
+Il task in esecuzione arriva dagli eventi ``TaskStarted``/``TaskCompleted`` di
+CrewAI e viene annotato sull'adattatore dell'agente: CrewAI esegue i task con
+``max_execution_time`` in un thread proprio, per cui il contesto del thread
+della crew non basta. Come nel resto dei flow, un agente esegue un task alla
+volta. Ogni decisione è registrata nei log e come evento ``llm_routed`` della run.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from crewai.llms.base_llm import BaseLLM
+
+from utils.run_events import emit_event
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class RoutingRule:
+    llm: str
+    max_input_chars: Optional[int] = None
+    min_input_chars: int = 0
+
+    def matches(self, input_chars: int) -> bool:
+        if input_chars < self.min_input_chars:
+            return False
+        return self.max_input_chars is None or input_chars <= self.max_input_chars
+
+
+def compile_routing(raw: Any, source: str, task_key: str) -> List[Dict[str, Any]]:
+    """Valida le regole ``routing`` di un task (le chiavi del registry si verificano alla build)."""
+    if not isinstance(raw, list) or not raw:
+        raise ValueError(f"{source}: 'routing' del task '{task_key}' deve essere una lista non vuota di regole.")
+    rules = []
+    for rule in raw:
+        if not isinstance(rule, dict) or not isinstance(rule.get("llm"), str):
+            raise ValueError(f"{source}: ogni regola 'routing' del task '{task_key}' deve indicare 'llm'.")
+        unknown = set(rule) - set(RoutingRule.__dataclass_fields__)
+        if unknown:
+            raise ValueError(f"{source}: campi sconosciuti {sorted(unknown)} in 'routing' del task '{task_key}'.")
+        for field_name in ("max_input_chars", "min_input_chars"):
+            value = rule.get(field_name)
+            if value is not None and (not isinstance(value, int) or value < 0):
+                raise ValueError(f"{source}: '{field_name}' in 'routing' del task '{task_key}' deve essere un intero >= 0.")
+        rules.append(dict(rule))
+    return rules
+
+
+def input_chars(messages: Any) -> int:
+    if isinstance(messages, str):
+        return len(messages)
+    return sum(len(str(message.get("content") or "")) if isinstance(message, Mapping) else len(str(message)) for message in messages)
+
+
+class RoutedLLMAdapter(BaseLLM):
+    """``BaseLLM`` dell'agente che inoltra ogni chiamata al tool scelto dalle regole del task.
+
+    ``default`` è l'adattatore dell'agente (già vincolato all'eventuale
+    ``output_schema``): lo schema si applica qualunque sia il modello scelto.
+    """
+
+    def __init__(
+        self,
+        default: Any,
+        routes: Mapping[str, List[Dict[str, Any]]],
+        agent_registry: Mapping[str, Any],
+    ) -> None:
+        super().__init__(model=default.model, temperature=default.temperature)
+        self._default = default
+        self.output_schema = getattr(default, "output_schema", None)
+        self.active_task: Optional[str] = None
+        self.routes: Dict[str, Tuple[Tuple[RoutingRule, Any], ...]] = {}
+        for task_name, rules in routes.items():
+            resolved = []
+            for rule in rules:
+                tool = agent_registry.get(rule["llm"])
+                if tool is None:
+                    raise ValueError(f"Routing del task '{task_name}': chiave llm sconosciuta '{rule['llm']}'.")
+                resolved.append((RoutingRule(**rule), tool))
+            self.routes[task_name] = tuple(resolved)
+        _register_task_handlers()
+
+    def route(self, messages: Any) -> Tuple[Any, str]:
+        """Tool da usare per ``messages`` e chiave del registry (``"agent"`` se resta quello dell'agente)."""
+        task_name = self.active_task
+        chars = input_chars(messages)
+        tool, key = self._default._tool, "agent"
+        for rule, candidate in self.routes.get(task_name, ()):
+            if rule.matches(chars):
+                tool, key = candidate, rule.llm
+                break
+        if task_name in self.routes:
+            logger.info("Routing %s (%d caratteri) -> %s [%s]", task_name, chars, key, tool.model)
+            emit_event("llm_routed", task=task_name, input_chars=chars, llm=key, model=tool.model)
+        return tool, key
+
+    def call(
+        self,
+        messages: Any,
+        tools: list[dict[str, Any]] | None = None,
+        callbacks: list[Any] | None = None,
+        available_functions: Mapping[str, Any] | None = None,
+    ) -> Any:
+        tool, _ = self.route(messages)
+        return tool._call(
+            messages,
+            tools=tools,
+            callbacks=callbacks,
+            available_functions=available_functions,
+            stop=self.stop,
+            output_schema=self.output_schema,
+        )
+
+    def supports_function_calling(self) -> bool:
+        return self._default.supports_function_calling()
+
+    def supports_stop_words(self) -> bool:
+        return self._default.supports_stop_words()
+
+    def get_context_window_size(self) -> int:
+        return self._default.get_context_window_size()
+
+
+_handlers_registered = False
+_handlers_lock = threading.Lock()
+
+
+def _register_task_handlers() -> None:
+    """Annota sull'adattatore dell'agente il task CrewAI in esecuzione."""
+    global _handlers_registered
+    with _handlers_lock:
+        if _handlers_registered:
+            return
+        from crewai.utilities.events import TaskCompletedEvent, TaskFailedEvent, TaskStartedEvent, crewai_event_bus
+
+        def _set_active(task: Any, name: Optional[str]) -> None:
+            llm = getattr(getattr(task, "agent", None), "llm", None)
+            if isinstance(llm, RoutedLLMAdapter):
+                llm.active_task = name
+
+        @crewai_event_bus.on(TaskStartedEvent)
+        def _on_started(source: Any, event: TaskStartedEvent) -> None:
+            _set_active(source, getattr(source, "name", None))
+
+        @crewai_event_bus.on(TaskCompletedEvent)
+        def _on_completed(source: Any, event: TaskCompletedEvent) -> None:
+            _set_active(source, None)
+
+        @crewai_event_bus.on(TaskFailedEvent)
+        def _on_failed(source: Any, event: TaskFailedEvent) -> None:
+            _set_active(source, None)
+
+        _handlers_registered = True
@@ -0,0 +1,194 @@
+"""Preload dei modelli Ollama e gestione delle politiche ``keep_alive``.
+
+La prima chiamata a ciascun modello paga il caricamento completo in memoria.
+Le funzioni di questo modulo individuano i modelli che i flow useranno
+(registry + chiavi ``llm`` degli ``agents.yaml``) e li caricano in anticipo,
+misurando il tempo di caricamento separatamente da quello di inferenza.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KEEP_ALIVE = "30m"
+DEFAULT_BASE_URL = "http://localhost:11434"
+
+
+@dataclass(frozen=True)
+class WarmupTarget:
+    """Modello da precaricare su un server Ollama con la relativa politica ``keep_alive``."""
+    model: str
+    base_url: str = DEFAULT_BASE_URL
+    keep_alive: str | int = DEFAULT_KEEP_ALIVE
+
+
+@dataclass
+class WarmupResult:
+    model: str
+    base_url: str
+    keep_alive: str | int
+    load_seconds: float = 0.0
+    wall_seconds: float = 0.0
+    error: Optional[str] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def ollama_model_name(model: str) -> str:
+    """Rimuove il prefisso di provider LiteLLM (``ollama/``, ``ollama_chat/``)."""
+    for prefix in ("ollama_chat/", "ollama/"):
+        if model.startswith(prefix):
+            return model[len(prefix):]
+    return model
+
+
+def required_llm_keys(agents_yaml_paths: Iterable[str | Path]) -> set[str]:
+    """Restituisce le chiavi ``llm`` referenziate dagli agenti istanziabili degli YAML.
+
+    Include le chiavi delle regole ``routing`` del ``tasks.yaml`` accanto a ogni ``agents.yaml``.
+    """
+    keys: set[str] = set()
+    for path in agents_yaml_paths:
+        with open(path, "r", encoding="utf-8") as file:
+            raw_agents = yaml.safe_load(file) or {}
+        for data in raw_agents.values():
+            # Stesso criterio di build_agents_from_yaml: i profili riusabili non sono agenti
+            if isinstance(data, dict) and {"role", "goal", "backstory"}.issubset(data):
+                keys.add(data.get("llm", "local_chatollama"))
+        tasks_path = Path(path).with_name("tasks.yaml")
+        if tasks_path.is_file():
+            with open(tasks_path, "r", encoding="utf-8") as file:
+                raw_tasks = yaml.safe_load(file) or {}
+            for data in raw_tasks.values():
+                if isinstance(data, dict):
+                    keys.update(rule["llm"] for rule in data.get("routing") or [] if isinstance(rule, dict) and "llm" in rule)
+    return keys
+
+
+def collect_warmup_targets(
+    agent_registry: Mapping[str, Any],
+    agents_yaml_paths: Iterable[str | Path],
+    extra_models: Iterable[str] = (),
+    keep_alive: Optional[Mapping[str, str | int]] = None,
+    extra_llm_keys: Iterable[str] = (),
+) -> List[WarmupTarget]:
+    """Determina i modelli da precaricare.
+
+    Parameters
+    ----------
+    agent_registry:
+        Registry ``chiave llm -> LocalLLMTool`` usato dalle crew.
+    agents_yaml_paths:
+        File ``agents.yaml`` dei flow che verranno eseguiti.
+    extra_models:
+        Modelli usati fuori dal registry, precaricati su :data:`DEFAULT_BASE_URL`.
+    keep_alive:
+        Override per chiave del registry o nome modello; in assenza vale il
+        ``keep_alive`` del tool o :data:`DEFAULT_KEEP_ALIVE`.
+    extra_llm_keys:
+        Chiavi del registry usate fuori dagli ``agents.yaml`` (es. il tool di
+        riassunto delle sezioni); seguono il pool di endpoint del tool.
+    """
+    keep_alive = dict(keep_alive or {})
+    targets: Dict[tuple[str, str], WarmupTarget] = {}
+
+    for key in sorted(required_llm_keys(agents_yaml_paths) | set(extra_llm_keys)):
+        tool = agent_registry.get(key)
+        if tool is None or getattr(tool, "backend", "ollama") != "ollama":
+            continue
+        model = tool.model
+        policy = keep_alive.get(key, keep_alive.get(model, getattr(tool, "keep_alive", None)))
+        pool = getattr(tool, "endpoint_pool", None)
+        # Con un pool si precaricano solo gli endpoint che espongono il modello
+        base_urls = (
+            [ep.base_url for ep in pool.endpoints_for(model)]
+            if pool is not None
+            else [getattr(tool, "base_url", DEFAULT_BASE_URL)]
+        )
+        for base_url in base_urls:
+            targets.setdefault(
+                (model, base_url),
+                WarmupTarget(model=model, base_url=base_url, keep_alive=policy if policy is not None else DEFAULT_KEEP_ALIVE),
+            )
+
+    for model in extra_models:
+        policy = keep_alive.get(model, DEFAULT_KEEP_ALIVE)
+        targets.setdefault((model, DEFAULT_BASE_URL), WarmupTarget(model=model, keep_alive=policy))
+
+    return list(targets.values())
+
+
+def warm_up(
+    agent_registry: Mapping[str, Any],
+    agents_yaml_paths: Iterable[str | Path],
+    extra_models: Iterable[str] = (),
+    keep_alive: Optional[Mapping[str, Any]] = None,
+    max_workers: int = 4,
+    timeout: float = 600.0,
+    extra_llm_keys: Iterable[str] = (),
+) -> List[WarmupResult]:
+    """Raccoglie i target (:func:`collect_warmup_targets`) e li precarica.
+
+    È bloccante anche nella raccolta (i pool di endpoint interrogano
+    ``/api/tags``): da codice asincrono va eseguita con ``asyncio.to_thread``.
+    """
+    targets = collect_warmup_targets(
+        agent_registry, agents_yaml_paths, extra_models=extra_models, keep_alive=keep_alive, extra_llm_keys=extra_llm_keys
+    )
+    logger.info("Warm-up di %d modelli in background...", len(targets))
+    return preload_models(targets, max_workers=max_workers, timeout=timeout)
+
+
+def preload_model(target: WarmupTarget, timeout: float = 600.0) -> WarmupResult:
+    """Carica un modello in memoria inviando a ``/api/generate`` una richiesta senza prompt."""
+    payload = json.dumps({"model": ollama_model_name(target.model), "keep_alive": target.keep_alive}).encode("utf-8")
+    request = urllib.request.Request(
+        f"{target.base_url.rstrip('/')}/api/generate",
+        data=payload,
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    result = WarmupResult(model=target.model, base_url=target.base_url, keep_alive=target.keep_alive)
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            body = json.loads(response.read().decode("utf-8") or "{}")
+    except (urllib.error.URLError, OSError, ValueError) as exc:
+        result.error = str(exc)
+        result.wall_seconds = time.perf_counter() - started
+        return result
+
+    result.wall_seconds = time.perf_counter() - started
+    # Una richiesta senza prompt esegue solo il caricamento: se Ollama non riporta
+    # load_duration (in nanosecondi) il tempo di parete è già tempo di caricamento.
+    load_ns = body.get("load_duration")
+    result.load_seconds = load_ns / 1e9 if load_ns else result.wall_seconds
+    return result
+
+
+def preload_models(targets: Iterable[WarmupTarget], max_workers: int = 4, timeout: float = 600.0) -> List[WarmupResult]:
+    """Precarica in parallelo i modelli indicati e restituisce un report per modello."""
+    targets = list(targets)
+    if not targets:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(targets)), thread_name_prefix="warmup") as pool:
+        results = list(pool.map(lambda t: preload_model(t, timeout=timeout), targets))
+
+    for res in results:
+        if res.error:
+            logger.warning("Warm-up di %s su %s fallito: %s", res.model, res.base_url, res.error)
+        else:
+            logger.info("Modello %s caricato in %.2fs (keep_alive=%s)", res.model, res.load_seconds, res.keep_alive)
+    return results
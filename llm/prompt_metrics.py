@@ -0,0 +1,135 @@
+"""Tempi di prefill (prompt eval) delle chiamate Ollama.
+
+Ollama riusa la KV-cache del prefisso comune tra due prompt consecutivi dello
+stesso modello, purché il modello resti caricato (``keep_alive``) con le stesse
+opzioni di caricamento (``num_ctx``). In quel caso ``prompt_eval_count`` e
+``prompt_eval_duration`` della risposta contano solo i token *nuovi*: sono la
+misura diretta di quanto prefill si sta risparmiando.
+
+Le risposte vengono lette con un hook httpx sul client passato a LiteLLM, quindi
+nello stesso thread della chiamata: l'evento ``prompt_eval`` finisce nel log
+della run corrente e i contatori anche nel suo :class:`~llm.run_metrics.RunMetrics`.
+"""
+from __future__ import annotations
+
+import json
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Mapping, Optional, Tuple
+
+import httpx
+from litellm.llms.custom_httpx.http_handler import HTTPHandler
+
+from llm.run_metrics import RunMetrics, current_run_metrics
+from utils.run_events import emit_event
+
+_NS = 1e9
+_OLLAMA_PATHS = ("/api/generate", "/api/chat")
+
+
+@dataclass
+class PromptEvalStats:
+    calls: int = 0
+    prompt_tokens: int = 0
+    prompt_eval_seconds: float = 0.0
+    eval_tokens: int = 0
+    eval_seconds: float = 0.0
+    load_seconds: float = 0.0
+    recent: Deque[Tuple[int, float]] = field(default_factory=lambda: deque(maxlen=256))
+
+    def as_dict(self) -> Dict[str, Any]:
+        recent = list(self.recent)
+        return {
+            "calls": self.calls,
+            "prompt_tokens_evaluated": self.prompt_tokens,
+            "prompt_eval_seconds": round(self.prompt_eval_seconds, 3),
+            "avg_prompt_eval_seconds": round(self.prompt_eval_seconds / self.calls, 3) if self.calls else 0.0,
+            "avg_prompt_tokens_evaluated": round(self.prompt_tokens / self.calls, 1) if self.calls else 0.0,
+            "eval_tokens": self.eval_tokens,
+            "eval_seconds": round(self.eval_seconds, 3),
+            "load_seconds": round(self.load_seconds, 3),
+            # Token valutati nelle ultime chiamate: con il prefisso riusato non crescono col numero di sezioni
+            "recent_prompt_tokens": [tokens for tokens, _ in recent[-20:]],
+        }
+
+
+_stats: Dict[str, PromptEvalStats] = {}
+_stats_lock = threading.Lock()
+_http_handlers: Dict[Optional[float], HTTPHandler] = {}
+_handler_lock = threading.Lock()
+
+
+def record_ollama_response(payload: Mapping[str, Any]) -> None:
+    """Registra i contatori di una risposta Ollama non in streaming."""
+    if "prompt_eval_count" not in payload and "prompt_eval_duration" not in payload:
+        return
+    model = f"ollama/{payload.get('model', '?')}"
+    prompt_tokens = int(payload.get("prompt_eval_count") or 0)
+    prompt_seconds = (payload.get("prompt_eval_duration") or 0) / _NS
+    eval_tokens = int(payload.get("eval_count") or 0)
+    load_seconds = (payload.get("load_duration") or 0) / _NS
+    run = current_run_metrics.get()
+    with _stats_lock:
+        targets = [_stats.setdefault(model, PromptEvalStats())]
+        if run is not None:
+            targets.append(run.entry("prompt_eval", model, PromptEvalStats))
+        for stats in targets:
+            stats.calls += 1
+            stats.prompt_tokens += prompt_tokens
+            stats.prompt_eval_seconds += prompt_seconds
+            stats.eval_tokens += eval_tokens
+            stats.eval_seconds += (payload.get("eval_duration") or 0) / _NS
+            stats.load_seconds += load_seconds
+            stats.recent.append((prompt_tokens, prompt_seconds))
+    emit_event(
+        "prompt_eval",
+        model=model,
+        prompt_tokens=prompt_tokens,
+        seconds=round(prompt_seconds, 3),
+        eval_tokens=eval_tokens,
+        load_seconds=round(load_seconds, 3),
+    )
+
+
+def _on_response(response: httpx.Response) -> None:
+    if response.status_code != 200 or not response.request.url.path.endswith(_OLLAMA_PATHS):
+        return
+    if "application/json" not in response.headers.get("content-type", ""):
+        return  # stream NDJSON: i contatori arrivano solo nell'ultimo chunk
+    response.read()
+    try:
+        payload = json.loads(response.content)
+    except ValueError:
+        return
+    if isinstance(payload, dict):
+        record_ollama_response(payload)
+
+
+def instrumented_http_handler(timeout: Optional[float] = None) -> HTTPHandler:
+    """Client HTTP da passare a LiteLLM (``client=``) per misurare il prefill.
+
+    Un client per valore di ``timeout``, condiviso da tutti i modelli che lo usano.
+    """
+    with _handler_lock:
+        if timeout not in _http_handlers:
+            _http_handlers[timeout] = HTTPHandler(
+                client=httpx.Client(
+                    timeout=timeout,
+                    limits=httpx.Limits(max_connections=100, max_keepalive_connections=100),
+                    event_hooks={"response": [_on_response]},
+                )
+            )
+        return _http_handlers[timeout]
+
+
+def prompt_eval_stats(run: Optional[RunMetrics] = None) -> Dict[str, Dict[str, Any]]:
+    """Statistiche per modello del processo o, con ``run``, della sola run."""
+    with _stats_lock:
+        stats = _stats if run is None else run.section("prompt_eval")
+        return {model: entry.as_dict() for model, entry in stats.items()}
+
+
+def reset_prompt_eval_stats() -> None:
+    with _stats_lock:
+        _stats.clear()
@@ -0,0 +1,184 @@
+"""Scheduler centrale delle richieste LLM con priorità, scadenze ed equità tra job.
+
+Sostituisce :class:`~llm.concurrency.ModelConcurrencyLimiter` (stessa interfaccia
+``slot(model)``/``stats()``, si installa con ``set_default_limiter``): ogni
+chiamata di :class:`LocalLLMTool` attende uno slot del proprio modello e, quando
+uno slot si libera, lo riceve la richiesta in attesa con la chiave minore:
+
+1. classe di priorità del job (``interactive`` < ``normal`` < ``batch``),
+   migliorata di una classe ogni ``aging_seconds`` di attesa perché i job
+   batch non restino fermi indefinitamente;
+2. scadenza del job (earliest deadline first; senza scadenza in coda);
+3. slot ottenuti di recente dal job (equità: a parità, passa il job servito
+   meno; il conteggio decade con emivita ``fair_share_half_life`` e i job
+   inattivi escono dalla tabella);
+4. ordine di arrivo.
+
+Job, priorità e scadenza arrivano dal contesto della richiesta
+(:func:`request_context`), propagato nei thread delle crew come il log eventi.
+"""
+from __future__ import annotations
+
+import itertools
+import math
+import statistics
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from llm.concurrency import ModelConcurrencyLimiter
+
+PRIORITY_CLASSES = {"interactive": 0, "normal": 1, "batch": 2}
+DEFAULT_PRIORITY = "normal"
+DEFAULT_AGING_SECONDS = 120.0
+DEFAULT_FAIR_SHARE_HALF_LIFE = 60.0
+# Sotto questa quota un job senza richieste in corso viene dimenticato
+FAIR_SHARE_EPSILON = 0.05
+WAIT_SAMPLES = 1000
+
+
+@dataclass(frozen=True)
+class RequestContext:
+    job_id: str = "-"
+    priority: str = DEFAULT_PRIORITY
+    # Istante assoluto (time.time()) entro cui il job dovrebbe terminare
+    deadline: Optional[float] = None
+
+
+current_request_context: ContextVar[Optional[RequestContext]] = ContextVar("current_request_context", default=None)
+
+
+def validate_priority(priority: str) -> str:
+    if priority not in PRIORITY_CLASSES:
+        raise ValueError(f"Priorità non supportata: {priority}. Opzioni valide: {sorted(PRIORITY_CLASSES)}.")
+    return priority
+
+
+@contextmanager
+def request_context(job_id: str, priority: str = DEFAULT_PRIORITY, deadline: Optional[float] = None) -> Iterator[RequestContext]:
+    """Associa job, priorità e scadenza alle chiamate LLM eseguite nel blocco."""
+    context = RequestContext(job_id=job_id, priority=validate_priority(priority), deadline=deadline)
+    token = current_request_context.set(context)
+    try:
+        yield context
+    finally:
+        current_request_context.reset(token)
+
+
+@dataclass
+class _Waiter:
+    context: RequestContext
+    seq: int
+    enqueued: float
+
+
+class RequestScheduler(ModelConcurrencyLimiter):
+    """Limite di concorrenza per modello con coda ordinata per priorità, scadenza ed equità."""
+
+    def __init__(
+        self,
+        default_limit: int = 1,
+        limits: Optional[Mapping[str, int]] = None,
+        aging_seconds: float = DEFAULT_AGING_SECONDS,
+        fair_share_half_life: float = DEFAULT_FAIR_SHARE_HALF_LIFE,
+    ) -> None:
+        super().__init__(default_limit=default_limit, limits=limits)
+        if fair_share_half_life <= 0:
+            raise ValueError("`fair_share_half_life` deve essere > 0.")
+        self.aging_seconds = aging_seconds
+        self.fair_share_half_life = fair_share_half_life
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._waiting: Dict[str, List[_Waiter]] = defaultdict(list)
+        self._running: Dict[str, int] = defaultdict(int)
+        # job -> (slot ottenuti con decadimento, istante dell'ultimo aggiornamento)
+        self._granted: Dict[str, Tuple[float, float]] = {}
+        self._job_in_flight: Dict[str, int] = defaultdict(int)
+        self._waits: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=WAIT_SAMPLES))
+        self._granted_by_priority: Dict[str, int] = defaultdict(int)
+
+    def _share(self, job_id: str, now: float) -> float:
+        count, stamp = self._granted.get(job_id, (0.0, now))
+        return count * 0.5 ** ((now - stamp) / self.fair_share_half_life)
+
+    def _prune_shares(self, now: float) -> None:
+        stale = [
+            job_id for job_id in self._granted
+            if job_id not in self._job_in_flight and self._share(job_id, now) < FAIR_SHARE_EPSILON
+        ]
+        for job_id in stale:
+            del self._granted[job_id]
+
+    def _key(self, waiter: _Waiter, now: float) -> tuple:
+        context = waiter.context
+        priority = PRIORITY_CLASSES[context.priority]
+        if self.aging_seconds > 0:
+            priority -= int((now - waiter.enqueued) // self.aging_seconds)
+        deadline = context.deadline if context.deadline is not None else math.inf
+        return (priority, deadline, self._share(context.job_id, now), waiter.seq)
+
+    def _next(self, model: str, now: float) -> _Waiter:
+        return min(self._waiting[model], key=lambda waiter: self._key(waiter, now))
+
+    @contextmanager
+    def slot(self, model: str) -> Iterator[None]:
+        context = current_request_context.get() or RequestContext()
+        waiter = _Waiter(context=context, seq=next(self._seq), enqueued=time.monotonic())
+        with self._cond:
+            self._waiting[model].append(waiter)
+            # Con l'aging l'ordine cambia col tempo: si rivaluta anche senza rilasci
+            timeout = self.aging_seconds if self.aging_seconds > 0 else None
+            while not (
+                self._running[model] < self._limit(model) and self._next(model, time.monotonic()) is waiter
+            ):
+                self._cond.wait(timeout)
+            self._waiting[model].remove(waiter)
+            self._running[model] += 1
+            now = time.monotonic()
+            self._granted[context.job_id] = (self._share(context.job_id, now) + 1, now)
+            self._job_in_flight[context.job_id] += 1
+            self._granted_by_priority[context.priority] += 1
+            self._waits[context.priority].append(time.monotonic() - waiter.enqueued)
+            if self._waiting[model] and self._running[model] < self._limit(model):
+                self._cond.notify_all()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._running[model] -= 1
+                self._job_in_flight[context.job_id] -= 1
+                if not self._job_in_flight[context.job_id]:
+                    del self._job_in_flight[context.job_id]
+                    self._prune_shares(time.monotonic())
+                self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """Profondità delle code per modello e priorità, attese per priorità, slot per job."""
+        with self._cond:
+            models = {
+                model: {
+                    "in_flight": self._running[model],
+                    "limit": self._limit(model),
+                    "queue_depth": len(self._waiting[model]),
+                    "queue_depth_by_priority": {
+                        priority: sum(1 for waiter in self._waiting[model] if waiter.context.priority == priority)
+                        for priority in PRIORITY_CLASSES
+                    },
+                }
+                for model in set(self._running) | set(self._waiting)
+            }
+            priorities = {}
+            for priority, waits in self._waits.items():
+                ordered = sorted(waits)
+                priorities[priority] = {
+                    "granted": self._granted_by_priority[priority],
+                    "wait_p50": round(statistics.median(ordered), 3),
+                    "wait_p95": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 3),
+                    "wait_max": round(ordered[-1], 3),
+                }
+            jobs = {job: {"in_flight": count} for job, count in self._job_in_flight.items()}
+        return {"models": models, "priorities": priorities, "active_jobs": jobs}
@@ -0,0 +1,123 @@
+"""Politiche di resilienza per le chiamate LLM: retry, circuit breaker, hedging.
+
+Le chiamate verso Ollama possono bloccarsi o fallire in modo transitorio
+(server riavviato, modello in caricamento, timeout). Le classi di questo modulo
+sono usate da :class:`llm.local_llm_tool.LocalLLMTool` e da
+:class:`llm.endpoint_pool.EndpointPool`.
+"""
+from __future__ import annotations
+
+import random
+import threading
+import time
+from dataclasses import dataclass
+
+
+class CircuitOpenError(RuntimeError):
+    """L'endpoint ha superato la soglia di errori ed è temporaneamente escluso."""
+
+
+# Nomi delle eccezioni LiteLLM/httpx considerate transitorie: il confronto per nome
+# evita di importare LiteLLM solo per classificare gli errori.
+_TRANSIENT_ERROR_NAMES = {
+    "APIConnectionError",
+    "Timeout",
+    "APITimeoutError",
+    "RateLimitError",
+    "ServiceUnavailableError",
+    "InternalServerError",
+    "ConnectError",
+    "ReadTimeout",
+    "RemoteProtocolError",
+    "NoEndpointAvailable",
+}
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """Indica se un errore merita un nuovo tentativo."""
+    if isinstance(exc, (TimeoutError, ConnectionError, CircuitOpenError)):
+        return True
+    return any(cls.__name__ in _TRANSIENT_ERROR_NAMES for cls in type(exc).__mro__)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Backoff esponenziale con full jitter."""
+    max_attempts: int = 3
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+    multiplier: float = 2.0
+
+    def delay(self, attempt: int) -> float:
+        """Attesa prima del tentativo ``attempt + 1`` (``attempt`` parte da 0)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * self.multiplier ** attempt))
+
+
+@dataclass(frozen=True)
+class HedgePolicy:
+    """Richieste hedged: dopo ``quantile`` della latenza osservata parte un duplicato.
+
+    Finché l'endpoint non ha almeno ``min_samples`` latenze si usa ``min_delay``.
+    """
+    enabled: bool = False
+    quantile: float = 0.95
+    min_delay: float = 5.0
+    min_samples: int = 20
+
+
+class CircuitBreaker:
+    """Circuit breaker a tre stati (closed → open → half-open).
+
+    Dopo ``failure_threshold`` errori consecutivi il circuito si apre e le
+    richieste vengono rifiutate per ``reset_timeout`` secondi; poi una sola
+    richiesta di prova decide se richiuderlo.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """``True`` se una richiesta può partire; in half-open riserva l'unica prova."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def is_available(self) -> bool:
+        """Come :meth:`allow` ma senza riservare la richiesta di prova."""
+        return self.state != self.OPEN and not (self.state == self.HALF_OPEN and self._probe_in_flight)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._probe_in_flight = False
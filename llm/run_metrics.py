@@ -0,0 +1,40 @@
+"""Contatori LLM limitati a una singola run.
+
+Statistiche di inferenza dei :class:`~llm.local_llm_tool.LocalLLMTool`, tempi di
+prefill (:mod:`llm.prompt_metrics`) e accorpamenti (:mod:`llm.single_flight`)
+sono cumulativi per processo: il servizio esegue più job con gli stessi tool e
+i contatori si mescolerebbero. Con un :class:`RunMetrics` attivo in
+:data:`current_run_metrics` ogni registrazione viene copiata anche nei contatori
+della run; la ``ContextVar`` si propaga come il log degli eventi (vedi
+:mod:`utils.run_events`).
+"""
+from __future__ import annotations
+
+import threading
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class RunMetrics:
+    """Contatori di una run, divisi in sezioni (``inference``, ``prompt_eval``, ``coalescing``)."""
+
+    def __init__(self) -> None:
+        self._entries: Dict[Tuple[str, Hashable], Any] = {}
+        self._lock = threading.Lock()
+
+    def entry(self, section: str, key: Hashable, factory: Callable[[], T]) -> T:
+        """Contatore ``key`` della sezione, creato con ``factory`` al primo uso."""
+        with self._lock:
+            if (section, key) not in self._entries:
+                self._entries[(section, key)] = factory()
+            return self._entries[(section, key)]
+
+    def section(self, section: str) -> Dict[Hashable, Any]:
+        with self._lock:
+            return {key: value for (name, key), value in self._entries.items() if name == section}
+
+
+current_run_metrics: ContextVar[Optional[RunMetrics]] = ContextVar("current_run_metrics", default=None)
+
@@ -0,0 +1,94 @@
+"""Accorpamento delle richieste identiche in volo (single-flight).
+
+Se più thread inviano la stessa richiesta deterministica (temperatura 0 o
+``seed`` fissato) mentre la prima è ancora in corso, solo quella raggiunge
+Ollama: le altre attendono e ne ricevono lo stesso risultato (o la stessa
+eccezione). Non è una cache: a richiesta completata la chiave viene rimossa e
+una chiamata successiva va di nuovo al modello.
+
+I conteggi sono registrati anche nel :class:`~llm.run_metrics.RunMetrics` della
+run del chiamante, se attivo.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+from llm.run_metrics import RunMetrics, current_run_metrics
+
+T = TypeVar("T")
+
+
+def request_key(**parts: Any) -> str:
+    """Chiave sha256 di una richiesta (modello, parametri, messaggi, schema...)."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _InFlight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Esegue una sola volta le chiamate concorrenti con la stessa chiave."""
+
+    def __init__(self) -> None:
+        self._calls: Dict[str, _InFlight] = {}
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def do(self, key: str, func: Callable[[], T], label: str = "") -> Tuple[T, bool]:
+        """Ritorna ``(risultato, condiviso)``; ``condiviso`` è vero se la chiamata è stata accorpata."""
+        run = current_run_metrics.get()
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _InFlight()
+            targets = [self._counts.setdefault(label, _new_counts())]
+            if run is not None:
+                targets.append(run.entry("coalescing", label, _new_counts))
+            for counts in targets:
+                counts["executed" if leader else "coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+            return call.result, False
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stats(self, run: Optional[RunMetrics] = None) -> Dict[str, Dict[str, int]]:
+        """Conteggi per etichetta del processo o, con ``run``, della sola run."""
+        with self._lock:
+            counts = self._counts if run is None else run.section("coalescing")
+            return {label: dict(entry) for label, entry in counts.items()}
+
+
+def _new_counts() -> Dict[str, int]:
+    return {"executed": 0, "coalesced": 0}
+
+
+_default_single_flight = SingleFlight()
+
+
+def get_default_single_flight() -> SingleFlight:
+    """Istanza di processo condivisa da tutti i :class:`LocalLLMTool`."""
+    return _default_single_flight
@@ -0,0 +1,393 @@
+"""Coda persistente dei job di generazione articoli (SQLite).
+
+La stessa coda può essere condivisa da più processi e più host (file SQLite su
+storage condiviso con lock POSIX funzionanti). Ogni job preso in carico ha un
+*lease* che il worker rinnova con heartbeat periodici: se il worker muore, il
+lease scade e il job torna ``queued`` al prossimo ``claim_next`` di un altro
+worker. Un job può richiedere dei tag (es. modelli); lo prende solo un worker
+che li dichiara tutti tra le proprie capability.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from llm.endpoint_pool import _canonical_model
+from llm.request_scheduler import DEFAULT_PRIORITY, PRIORITY_CLASSES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE_SECONDS = 120.0
+DEFAULT_MAX_ATTEMPTS = 3
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+def canonical_tag(tag: str) -> str:
+    """Forma canonica dei tag di modello (``ollama/phi4`` -> ``ollama/phi4:latest``); gli altri restano invariati."""
+    if tag.startswith(("ollama/", "ollama_chat/")):
+        return f"ollama/{_canonical_model(tag)}"
+    return tag
+
+
+def _canonical_tags(tags: Iterable[str]) -> set[str]:
+    return {canonical_tag(tag) for tag in tags}
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    run_dir TEXT,
+    markdown_path TEXT,
+    error TEXT,
+    required_tags TEXT NOT NULL DEFAULT '[]',
+    worker_id TEXT,
+    lease_expires_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, created_at);
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    hostname TEXT,
+    capabilities TEXT NOT NULL DEFAULT '[]',
+    started_at REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    current_job TEXT,
+    jobs_done INTEGER NOT NULL DEFAULT 0,
+    jobs_failed INTEGER NOT NULL DEFAULT 0,
+    busy_seconds REAL NOT NULL DEFAULT 0
+);
+"""
+
+# Colonne aggiunte dopo la prima versione della tabella ``jobs``
+_JOB_MIGRATIONS = {
+    "required_tags": "TEXT NOT NULL DEFAULT '[]'",
+    "worker_id": "TEXT",
+    "lease_expires_at": "REAL",
+    "attempts": "INTEGER NOT NULL DEFAULT 0",
+}
+
+
+def _claim_order(row: sqlite3.Row) -> tuple:
+    params = json.loads(row["params"])
+    deadline = params.get("deadline")
+    return (
+        PRIORITY_CLASSES.get(params.get("priority", DEFAULT_PRIORITY), PRIORITY_CLASSES[DEFAULT_PRIORITY]),
+        deadline if deadline is not None else float("inf"),
+        row["created_at"],
+    )
+
+
+@dataclass
+class Job:
+    id: str
+    status: str
+    params: Dict[str, Any] = field(default_factory=dict)
+    created_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    run_dir: Optional[str] = None
+    markdown_path: Optional[str] = None
+    error: Optional[str] = None
+    required_tags: List[str] = field(default_factory=list)
+    worker_id: Optional[str] = None
+    lease_expires_at: Optional[float] = None
+    attempts: int = 0
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "Job":
+        data = dict(row)
+        data["params"] = json.loads(data["params"])
+        data["required_tags"] = json.loads(data.get("required_tags") or "[]")
+        return cls(**{key: data[key] for key in cls.__dataclass_fields__ if key in data})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {key: getattr(self, key) for key in self.__dataclass_fields__}
+
+
+class JobLease:
+    """Heartbeat in background che mantiene il lease di un job.
+
+    Se il rinnovo fallisce (il lease è scaduto ed è stato preso da un altro
+    worker) ``lost`` viene impostato: il risultato del job va scartato.
+
+    Dentro un event loop si usa ``async with``: l'attesa del thread di
+    heartbeat (che può essere fermo su un rinnovo SQLite) avviene fuori dal loop.
+    """
+
+    def __init__(self, queue: "JobQueue", job: Job, worker_id: str, lease_seconds: float) -> None:
+        self.queue = queue
+        self.job = job
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-{job.id[:8]}", daemon=True)
+
+    def _run(self) -> None:
+        interval = max(1.0, self.lease_seconds / 3)
+        while not self._stop.wait(interval):
+            try:
+                renewed = self.queue.heartbeat(self.job.id, self.worker_id, self.lease_seconds)
+            except sqlite3.Error as exc:
+                # Errore transitorio sullo storage condiviso: si riprova al giro dopo
+                logger.warning("Heartbeat del job %s non riuscito: %s", self.job.id, exc)
+                continue
+            if not renewed:
+                logger.warning("Lease del job %s perso dal worker %s.", self.job.id, self.worker_id)
+                self.lost.set()
+                return
+
+    def __enter__(self) -> "JobLease":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    async def __aenter__(self) -> "JobLease":
+        return self.__enter__()
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self._stop.set()
+        await asyncio.to_thread(self._thread.join)
+
+
+class JobQueue:
+    """Coda FIFO di job su un file SQLite, condivisibile tra più worker.
+
+    Parameters
+    ----------
+    db_path:
+        File del database; la cartella viene creata se assente.
+    max_attempts:
+        Prese in carico massime di un job: oltre, un lease scaduto marca il
+        job ``failed`` invece di rimetterlo in coda.
+    """
+
+    def __init__(self, db_path: str | Path, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> None:
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_attempts = max(1, max_attempts)
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for name, ddl in _JOB_MIGRATIONS.items():
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {ddl}")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def submit(self, params: Dict[str, Any], required_tags: Iterable[str] = ()) -> Job:
+        job = Job(
+            id=uuid.uuid4().hex,
+            status=QUEUED,
+            params=dict(params),
+            created_at=time.time(),
+            required_tags=sorted(_canonical_tags(required_tags)),
+        )
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, params, created_at, required_tags) VALUES (?, ?, ?, ?, ?)",
+                (
+                    job.id,
+                    job.status,
+                    json.dumps(job.params, ensure_ascii=False),
+                    job.created_at,
+                    json.dumps(job.required_tags),
+                ),
+            )
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row else None
+
+    def list(self, status: Optional[str] = None, limit: int = 100) -> List[Job]:
+        query, args = "SELECT * FROM jobs", ()
+        if status:
+            query, args = query + " WHERE status = ?", (status,)
+        with self._connect() as conn:
+            rows = conn.execute(query + " ORDER BY created_at DESC LIMIT ?", (*args, limit)).fetchall()
+        return [Job.from_row(row) for row in rows]
+
+    def _expire_leases(self, conn: sqlite3.Connection, now: float) -> None:
+        """Rimette in coda (o fa fallire) i job ``running`` con lease scaduto."""
+        expired = "status = ? AND (lease_expires_at IS NULL OR lease_expires_at < ?)"
+        conn.execute(
+            f"UPDATE jobs SET status = ?, finished_at = ?, worker_id = NULL, lease_expires_at = NULL, "
+            f"error = 'lease scaduto dopo ' || attempts || ' tentativi' WHERE {expired} AND attempts >= ?",
+            (FAILED, now, RUNNING, now, self.max_attempts),
+        )
+        cursor = conn.execute(
+            f"UPDATE jobs SET status = ?, started_at = NULL, worker_id = NULL, lease_expires_at = NULL "
+            f"WHERE {expired}",
+            (QUEUED, RUNNING, now),
+        )
+        if cursor.rowcount:
+            logger.info("Rimessi in coda %d job con lease scaduto.", cursor.rowcount)
+
+    def claim_next(
+        self,
+        worker_id: Optional[str] = None,
+        capabilities: Optional[Iterable[str]] = None,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    ) -> Optional[Job]:
+        """Prende il prossimo job in coda eseguibile dal worker e lo marca ``running``.
+
+        L'ordine è per priorità (``params["priority"]``, vedi
+        :mod:`llm.request_scheduler`), poi scadenza (``params["deadline"]``), poi
+        anzianità.
+
+        ``capabilities`` ``None`` accetta qualunque job; altrimenti i
+        ``required_tags`` del job devono esserne un sottoinsieme (i tag di
+        modello si confrontano in forma canonica, vedi :func:`canonical_tag`). Il job resta
+        del worker fino a ``lease_expires_at``: va rinnovato con :meth:`heartbeat`.
+        """
+        offered = None if capabilities is None else _canonical_tags(capabilities)
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            self._expire_leases(conn, now)
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at", (QUEUED,)
+            ).fetchall()
+            rows.sort(key=_claim_order)
+            row = next(
+                (r for r in rows if offered is None or _canonical_tags(json.loads(r["required_tags"] or "[]")) <= offered),
+                None,
+            )
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            lease_expires_at = now + lease_seconds
+            conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, worker_id = ?, lease_expires_at = ?, "
+                "attempts = attempts + 1 WHERE id = ?",
+                (RUNNING, now, worker_id, lease_expires_at, row["id"]),
+            )
+            if worker_id is not None:
+                conn.execute(
+                    "UPDATE workers SET current_job = ?, last_seen = ? WHERE worker_id = ?",
+                    (row["id"], now, worker_id),
+                )
+            conn.execute("COMMIT")
+        job = Job.from_row(row)
+        job.status, job.started_at = RUNNING, now
+        job.worker_id, job.lease_expires_at, job.attempts = worker_id, lease_expires_at, job.attempts + 1
+        return job
+
+    def heartbeat(self, job_id: str, worker_id: Optional[str], lease_seconds: float = DEFAULT_LEASE_SECONDS) -> bool:
+        """Rinnova il lease; ``False`` se il job non appartiene più al worker."""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND status = ? AND worker_id IS ?",
+                (now + lease_seconds, job_id, RUNNING, worker_id),
+            )
+            if worker_id is not None:
+                conn.execute("UPDATE workers SET last_seen = ? WHERE worker_id = ?", (now, worker_id))
+            return cursor.rowcount == 1
+
+    def lease(self, job: Job, worker_id: Optional[str], lease_seconds: float = DEFAULT_LEASE_SECONDS) -> JobLease:
+        """Context manager che rinnova il lease di ``job`` finché è aperto."""
+        return JobLease(self, job, worker_id, lease_seconds)
+
+    def set_run_dir(self, job_id: str, run_dir: str) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE jobs SET run_dir = ? WHERE id = ?", (run_dir, job_id))
+
+    def complete(self, job_id: str, markdown_path: Optional[str], worker_id: Optional[str] = None) -> bool:
+        """Chiude il job; con ``worker_id`` solo se il worker ne detiene ancora il lease."""
+        return self._finish(job_id, worker_id, "status = ?, finished_at = ?, markdown_path = ?", (DONE, time.time(), markdown_path))
+
+    def fail(self, job_id: str, error: str, worker_id: Optional[str] = None) -> bool:
+        return self._finish(job_id, worker_id, "status = ?, finished_at = ?, error = ?", (FAILED, time.time(), error))
+
+    def _finish(self, job_id: str, worker_id: Optional[str], assignments: str, values: tuple) -> bool:
+        query = f"UPDATE jobs SET {assignments}, lease_expires_at = NULL WHERE id = ?"
+        args = (*values, job_id)
+        if worker_id is not None:
+            query, args = query + " AND status = ? AND worker_id = ?", (*args, RUNNING, worker_id)
+        with self._lock, self._connect() as conn:
+            return conn.execute(query, args).rowcount == 1
+
+    def requeue_running(self) -> int:
+        """Rimette in coda tutti i job ``running``.
+
+        Da usare solo con un unico processo sulla coda: con più worker i job
+        interrotti tornano in coda da soli alla scadenza del lease.
+        """
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, started_at = NULL, worker_id = NULL, lease_expires_at = NULL "
+                "WHERE status = ?",
+                (QUEUED, RUNNING),
+            )
+            return cursor.rowcount
+
+    # ---------- Worker ----------
+
+    def register_worker(self, worker_id: str, hostname: str, capabilities: Iterable[str]) -> None:
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO workers (worker_id, hostname, capabilities, started_at, last_seen) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(worker_id) DO UPDATE SET hostname = excluded.hostname, "
+                "capabilities = excluded.capabilities, started_at = excluded.started_at, "
+                "last_seen = excluded.last_seen, current_job = NULL",
+                (worker_id, hostname, json.dumps(sorted(set(capabilities))), now, now),
+            )
+
+    def touch_worker(self, worker_id: str) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE workers SET last_seen = ? WHERE worker_id = ?", (time.time(), worker_id))
+
+    def record_worker_job(self, worker_id: str, ok: bool, busy_seconds: float) -> None:
+        counter = "jobs_done" if ok else "jobs_failed"
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                f"UPDATE workers SET {counter} = {counter} + 1, busy_seconds = busy_seconds + ?, "
+                "current_job = NULL, last_seen = ? WHERE worker_id = ?",
+                (busy_seconds, time.time(), worker_id),
+            )
+
+    def worker_stats(self, stale_after: float = 3 * DEFAULT_LEASE_SECONDS) -> List[Dict[str, Any]]:
+        """Throughput per worker: job/ora e quota di tempo passata a eseguire job."""
+        now = time.time()
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM workers ORDER BY worker_id").fetchall()
+        stats = []
+        for row in rows:
+            data = dict(row)
+            data["capabilities"] = json.loads(data["capabilities"])
+            uptime = max(data["last_seen"] - data["started_at"], 1e-9)
+            data["alive"] = now - data["last_seen"] <= stale_after
+            data["jobs_per_hour"] = round(data["jobs_done"] * 3600.0 / uptime, 3)
+            data["utilization"] = round(min(1.0, data["busy_seconds"] / uptime), 3)
+            stats.append(data)
+        return stats
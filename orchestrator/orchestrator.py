@@ -1,15 +1,37 @@
 import asyncio
 import argparse
+import json
 import logging
+import os
 import re
+from contextlib import nullcontext
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from crews.input_validator.crew import InputValidatorCrew
 from crews.writing.crew import WritingCrew
 from crews.editing.crew import EditingCrew
+from schema.state import ArticleState
+from llm.affinity_scheduler import ModelAffinityScheduler, current_scheduler
+from llm.endpoint_pool import EndpointPool
 from llm.local_llm_tool import LocalLLMTool
+from llm.prompt_metrics import prompt_eval_stats
+from llm.resilience import HedgePolicy
+from llm.run_metrics import RunMetrics, current_run_metrics
+from llm.single_flight import get_default_single_flight
+from llm.model_warmup import DEFAULT_KEEP_ALIVE, warm_up
+from utils.code_validation import CodeValidator
+from utils.config_loader import build_agents_from_yaml, build_tasks_from_yaml, load_config_bundle
+from utils.context_summarizer_crew import SUMMARIZER_BACKENDS, SUMMARIZER_LLM, SUMMARIZER_MODEL, SUMMARIZER_TEMPERATURE
+from utils.flow_plot import schedule_flow_plot
+from utils.incremental import BuildCache, fingerprint, record_build
+from utils.profiling import PipelineProfiler
+from utils.run_events import RunEventLog, current_run_events
+from utils.section_artifacts import ABSTRACT, SectionArtifactWriter
+from utils.section_supervision import SectionSupervisionBuffer
+
+CREWS_DIR = Path(__file__).resolve().parent.parent / "crews"
 
 
 # ---------- Config & Helpers ----------
@@ -24,6 +46,21 @@ class OrchestratorConfig:
     write_output: bool = False
     markdown_outpath: Optional[Path] = None
     plot_flows: bool = True
+    warmup_models: bool = True
+    max_resident_models: Optional[int] = None
+    ollama_urls: Optional[List[str]] = None
+    llm_timeout: Optional[float] = 600.0
+    hedge_requests: bool = False
+    run_dir: Optional[Path] = None
+    validate_code: bool = True
+    code_linter: Optional[str] = None
+    execute_code: bool = False
+    summarizer_backend: str = "llm"
+    incremental: bool = False
+    previous_run_dir: Optional[Path] = None
+    profile: bool = False
+    profile_steps: bool = False
+    overlap_supervision: bool = False
     flow_dir: Path = Path(__file__).resolve().parent / "flow_chart"
 
 
@@ -33,10 +70,25 @@ def _slugify(text: str, max_len: int = 80) -> str:
     return slug[:max_len] if max_len else slug
 
 
-def build_default_agent_registry() -> Dict[str, LocalLLMTool]:
+def build_default_agent_registry(
+    ollama_urls: Optional[List[str]] = None,
+    request_timeout: Optional[float] = 600.0,
+    hedge_requests: bool = False,
+) -> Dict[str, LocalLLMTool]:
     """
     Registry minimale con modelli locali. Personalizza a piacere.
+
+    Con più ``ollama_urls`` tutti i modelli condividono un unico
+    :class:`EndpointPool`, così il bilanciamento least-outstanding tiene conto
+    del carico complessivo di ogni server; ``hedge_requests`` abilita i
+    duplicati verso un secondo endpoint oltre il p95 di latenza.
     """
+    pool = EndpointPool(ollama_urls) if ollama_urls and len(ollama_urls) > 1 else None
+    base_url = ollama_urls[0] if ollama_urls else "http://localhost:11434"
+    resilience = {
+        "request_timeout": request_timeout,
+        "hedge_policy": HedgePolicy(enabled=hedge_requests),
+    }
     return {
         "local_chatollama": LocalLLMTool(
             model="ollama/gpt-oss:20b",
@@ -45,6 +97,10 @@ def build_default_agent_registry() -> Dict[str, LocalLLMTool]:
             top_k=60,
             repeat_penalty=1.1,
             num_ctx=4096,
+            keep_alive=DEFAULT_KEEP_ALIVE,
+            base_url=base_url,
+            endpoint_pool=pool,
+            **resilience,
         ),
         "code_llm": LocalLLMTool(
             model="ollama/deepseek-coder:33b",
@@ -53,6 +109,10 @@ def build_default_agent_registry() -> Dict[str, LocalLLMTool]:
             top_k=50,
             repeat_penalty=1.1,
             num_ctx=4096,
+            keep_alive=DEFAULT_KEEP_ALIVE,
+            base_url=base_url,
+            endpoint_pool=pool,
+            **resilience,
         ),
         "code_comment_llm": LocalLLMTool(
             model="ollama/deepseek-coder:33b",
@@ -61,10 +121,76 @@ def build_default_agent_registry() -> Dict[str, LocalLLMTool]:
             top_k=50,
             repeat_penalty=1.1,
             num_ctx=4096,
+            keep_alive=DEFAULT_KEEP_ALIVE,
+            base_url=base_url,
+            endpoint_pool=pool,
+            **resilience,
+        ),
+        # Tier economico per i task con input brevi (vedi ``routing`` in tasks.yaml)
+        "small_llm": LocalLLMTool(
+            model="ollama/phi4",
+            temperature=0.5,
+            top_p=0.9,
+            top_k=40,
+            repeat_penalty=1.1,
+            num_ctx=4096,
+            keep_alive=DEFAULT_KEEP_ALIVE,
+            base_url=base_url,
+            endpoint_pool=pool,
+            **resilience,
+        ),
+        # Riassunto delle sezioni per il contesto del writer (summarizer_backend="llm")
+        SUMMARIZER_LLM: LocalLLMTool(
+            model=SUMMARIZER_MODEL,
+            temperature=SUMMARIZER_TEMPERATURE,
+            keep_alive=DEFAULT_KEEP_ALIVE,
+            base_url=base_url,
+            endpoint_pool=pool,
+            **resilience,
         ),
     }
 
 
+def _inference_stats(agent_registry: Dict, run_metrics: RunMetrics) -> Dict[str, dict]:
+    return {
+        key: tool.stats.for_run(run_metrics).as_dict()
+        for key, tool in agent_registry.items()
+        if hasattr(tool, "stats")
+    }
+
+
+def _endpoint_stats(agent_registry: Dict) -> Dict[str, dict]:
+    pools = {id(tool.endpoint_pool): tool.endpoint_pool for tool in agent_registry.values() if getattr(tool, "endpoint_pool", None)}
+    stats: Dict[str, dict] = {}
+    for pool in pools.values():
+        stats.update(pool.stats())
+    return stats
+
+
+def _crew_components(crew_components: Optional[Dict[str, Tuple[dict, dict]]], name: str) -> dict:
+    if not crew_components or name not in crew_components:
+        return {}
+    agents, tasks = crew_components[name]
+    return {"agents": agents, "tasks": tasks}
+
+
+def write_state_snapshot(run_dir: Path, stage: str, state) -> None:
+    """Salva lo stato corrente in ``run_dir/state.json`` con sostituzione atomica."""
+    payload = {"stage": stage, "state": state.model_dump(mode="json")}
+    tmp_path = run_dir / "state.json.tmp"
+    tmp_path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp_path, run_dir / "state.json")
+
+
+def _profile_dir(title: str, md_path: Optional[Path], run_path: Optional[Path]) -> Path:
+    """Cartella dei profili: accanto al Markdown, nella run o in ``outputs/``."""
+    if md_path is not None:
+        return md_path.with_name(f"{md_path.stem}.profile")
+    if run_path is not None:
+        return run_path / "profile"
+    return (Path.cwd() / "outputs" / f"{_slugify(title)}.profile").resolve()
+
+
 # ---------- Core Orchestrator ----------
 
 async def blogwriter_orchestrator(
@@ -76,23 +202,106 @@ async def blogwriter_orchestrator(
     write_output: bool = False,
     markdown_outpath: Optional[str] = None,
     plot_flows: bool = True,
+    warmup_models: bool = True,
+    max_resident_models: Optional[int] = None,
+    ollama_urls: Optional[List[str]] = None,
+    llm_timeout: Optional[float] = 600.0,
+    hedge_requests: bool = False,
+    run_dir: Optional[str] = None,
+    event_log: Optional[RunEventLog] = None,
+    crew_components: Optional[Dict[str, Tuple[dict, dict]]] = None,
+    validate_code: bool = True,
+    code_linter: Optional[str] = None,
+    execute_code: bool = False,
+    summarizer_backend: str = "llm",
+    incremental: bool = False,
+    previous_run_dir: Optional[str] = None,
+    profile: bool = False,
+    profile_steps: bool = False,
+    overlap_supervision: bool = False,
 ) -> dict:
     """
     Esegue: Validazione -> Scrittura -> Editing/Review.
     Ritorna lo stato finale (editing_state).
+
+    Con ``warmup_models`` i modelli richiesti dai flow vengono precaricati su
+    Ollama in parallelo alla validazione degli input; i tempi di caricamento
+    finiscono in ``llm_metrics["warmup"]``, separati da quelli di inferenza.
+
+    Con ``max_resident_models`` (host che non tiene tutti i modelli in memoria)
+    le chiamate LLM passano da uno scheduler con affinità di modello e la
+    generazione del codice viene raggruppata a fine scrittura.
+
+    ``ollama_urls``, ``llm_timeout`` e ``hedge_requests`` (usati solo se
+    ``agent_registry`` non è fornito) configurano il registry di default:
+    bilanciamento su più server Ollama, timeout per singola richiesta e
+    richieste hedged. Le statistiche per endpoint finiscono in
+    ``llm_metrics["endpoints"]``. Inferenza, prefill e accorpamenti in
+    ``llm_metrics`` contano solo le chiamate di questa run
+    (:mod:`llm.run_metrics`), anche se i tool sono condivisi con altri job.
+
+    Con ``run_dir`` gli eventi di avanzamento vengono scritti in
+    ``events.jsonl`` e lo stato dopo ogni stage in ``state.json``;
+    ``event_log`` permette di passare un registro già sottoscritto (servizio).
+    Le sezioni vengono inoltre pubblicate man mano in ``<run_dir>/sections/``
+    (bozza a fine scrittura, versione finale dopo l'editing) con un
+    ``manifest.json`` aggiornato atomicamente (vedi :mod:`utils.section_artifacts`).
+    ``crew_components`` riusa agenti e task già costruiti, indicizzati per
+    ``"input_validator"``, ``"writing"`` ed ``"editing"``.
+
+    Con ``plot_flows`` i diagrammi dei flow vengono disegnati in background e
+    solo se la definizione del flow è cambiata rispetto al file esistente in
+    ``flow_chart/`` (al più una volta per processo).
+
+    Con ``validate_code`` il codice generato viene validato in locale (sintassi,
+    ``code_linter`` se installato, di default ``ruff`` o ``pyflakes`` se presenti,
+    esecuzione vincolata con ``execute_code``) e la revisione LLM viene saltata
+    per gli snippet confermati dal linter o dall'esecuzione; la sola sintassi
+    corretta non basta.
+
+    ``summarizer_backend`` sceglie il riassunto delle sezioni usato come contesto
+    dal writer: ``"llm"`` (voce ``SUMMARIZER_LLM`` del registry) o ``"extractive"``
+    (TextRank locale, senza chiamate al modello).
+
+    Con ``incremental`` la run riusa gli output della run precedente
+    (``previous_run_dir``, default ``run_dir``) per ogni passo i cui input non
+    sono cambiati: sezioni, codice, review ed editing (vedi
+    :mod:`utils.incremental`). Se gli input grezzi sono identici si riusano
+    anche abstract e struttura validati; se abstract e struttura sono forniti
+    e diversi, vengono presi così come sono, senza passare dalla validazione
+    (che li riscriverebbe e invaliderebbe tutte le sezioni).
+
+    Con ``profile`` ogni stage viene profilato (cProfile, stack campionati di
+    tutti i thread, ``tracemalloc``) e i risultati finiscono in
+    ``<markdown>.profile/`` (o ``<run_dir>/profile``); ``profile_steps``
+    aggiunge tempi e memoria di ogni metodo dei flow (vedi :mod:`utils.profiling`).
+
+    Con ``overlap_supervision`` ogni sezione viene revisionata appena testo e
+    codice sono definitivi, mentre la scrittura prosegue; le review finiscono
+    nel report passato al consolidatore e solo le review sull'intero articolo
+    attendono la fine della scrittura (vedi :mod:`utils.section_supervision`).
     """
     if not title or not title.strip():
         raise ValueError("`title` non può essere vuoto.")
     if num_reviews < 1:
         raise ValueError("`num_reviews` deve essere >= 1.")
+    if summarizer_backend not in SUMMARIZER_BACKENDS:
+        raise ValueError(f"`summarizer_backend` deve essere uno tra {sorted(SUMMARIZER_BACKENDS)}.")
+    if incremental and not (previous_run_dir or run_dir):
+        raise ValueError("`incremental` richiede `previous_run_dir` o `run_dir` con lo stato della run precedente.")
 
     structure = structure or []
-    agent_registry = agent_registry or build_default_agent_registry()
+    agent_registry = agent_registry or build_default_agent_registry(
+        ollama_urls, request_timeout=llm_timeout, hedge_requests=hedge_requests
+    )
 
     # Cartella per i diagrammi
     flow_dir = Path(__file__).resolve().parent / "flow_chart"
     flow_dir.mkdir(parents=True, exist_ok=True)
 
+    # Valida subito gli YAML di tutte le crew (bundle in cache finché i file non cambiano)
+    load_config_bundle(CREWS_DIR)
+
     # Path markdown (fallback dal titolo)
     md_path: Optional[Path] = None
     if write_output:
@@ -104,31 +313,178 @@ async def blogwriter_orchestrator(
             md_path = (Path.cwd() / "outputs" / default_name).resolve()
             md_path.parent.mkdir(parents=True, exist_ok=True)
 
-    logging.info("Avvio InputValidatorCrew...")
-    validator = InputValidatorCrew(agent_registry=agent_registry)
-    validated_state = await validator.kickoff(
-        title=title.strip(),
-        abstract=abstract.strip(),
-        structure=structure,
-    )
-    if plot_flows:
-        validator.flow.plot(filename=str(flow_dir / "InputValidatorFlow"))
+    # Letto prima che gli snapshot di questa run sovrascrivano state.json
+    build_cache = BuildCache.from_run_dir(previous_run_dir or run_dir) if incremental else None
 
-    logging.info("Avvio WritingCrew...")
-    writer = WritingCrew(state=validated_state, agent_registry=agent_registry)
-    written_state = await writer.kickoff()
-    if plot_flows:
-        writer.flow.plot(filename=str(flow_dir / "WritingFlow"))
+    run_path: Optional[Path] = None
+    if run_dir:
+        run_path = Path(run_dir)
+        run_path.mkdir(parents=True, exist_ok=True)
+        if event_log is None:
+            event_log = RunEventLog(run_path / "events.jsonl", run_id=run_path.name)
+    events_token = current_run_events.set(event_log) if event_log is not None else None
+    # Contatori LLM di questa run: i tool del registry possono essere condivisi con altri job
+    run_metrics = RunMetrics()
+    metrics_token = current_run_metrics.set(run_metrics)
+    artifacts = SectionArtifactWriter(run_path / "sections") if run_path is not None else None
 
-    logging.info("Avvio EditingCrew...")
-    editor = EditingCrew(state=written_state, agent_registry=agent_registry)
-    editing_state = await editor.kickoff(
-        num_reviews=num_reviews,
-        write_output=write_output,
-        markdown_outpath=str(md_path) if md_path else None,
-    )
-    if plot_flows:
-        editor.flow.plot(filename=str(flow_dir / "EditingFlow"))
+    # Scheduler legato al contesto della run: i job concorrenti del servizio non lo condividono
+    affinity_scheduler = None
+    scheduler_token = None
+    if max_resident_models is not None:
+        affinity_scheduler = ModelAffinityScheduler(max_resident_models=max_resident_models)
+        scheduler_token = current_scheduler.set(affinity_scheduler)
+
+    warmup_task = None
+    if warmup_models:
+        # Anche la raccolta dei target è bloccante (sonde /api/tags del pool): tutto in un thread
+        warmup_task = asyncio.create_task(asyncio.to_thread(
+            warm_up,
+            agent_registry,
+            sorted(CREWS_DIR.glob("*/agents.yaml")),
+            extra_llm_keys=[SUMMARIZER_LLM] if summarizer_backend == "llm" else [],
+        ))
+
+    code_validator = CodeValidator(linter=code_linter, execute=execute_code) if validate_code else None
+    section_supervision: Optional[SectionSupervisionBuffer] = None
+
+    profiler = None
+    if profile:
+        profiler = PipelineProfiler(_profile_dir(title, md_path, run_path), steps=profile_steps)
+        profiler.start()
+
+    def _profile_stage(stage: str):
+        return profiler.stage(stage) if profiler is not None else nullcontext()
+
+    def _stage_done(stage: str, state) -> None:
+        if event_log is not None:
+            event_log.emit("stage_completed", stage=stage)
+        if run_path is not None:
+            write_state_snapshot(run_path, stage, state)
+
+    try:
+        if event_log is not None:
+            event_log.emit("run_started", title=title.strip(), sections=len(structure))
+
+        with _profile_stage("input_validator"):
+            inputs_digest = fingerprint(title=title.strip(), abstract=abstract.strip(), structure=structure)
+            cached_inputs = build_cache.lookup("inputs", inputs_digest) if build_cache is not None else None
+            if cached_inputs is not None:
+                logging.info("Input invariati: riuso abstract e struttura validati della run precedente.")
+                validated_state = ArticleState(
+                    title=title.strip(), abstract=cached_inputs["abstract"], structure=cached_inputs["structure"]
+                )
+            elif build_cache is not None and abstract.strip() and structure:
+                logging.info("Run incrementale: abstract e struttura forniti usati senza validazione.")
+                validated_state = ArticleState(title=title.strip(), abstract=abstract.strip(), structure=structure)
+            else:
+                logging.info("Avvio InputValidatorCrew...")
+                validator = InputValidatorCrew(
+                    agent_registry=agent_registry, **_crew_components(crew_components, "input_validator")
+                )
+                validated_state = await validator.kickoff(
+                    title=title.strip(),
+                    abstract=abstract.strip(),
+                    structure=structure,
+                )
+                if plot_flows:
+                    schedule_flow_plot(validator.flow, flow_dir / "InputValidatorFlow")
+            record_build(
+                validated_state, "inputs", inputs_digest,
+                abstract=validated_state.abstract, structure=list(validated_state.structure),
+            )
+        warmup_report = [res.as_dict() for res in await warmup_task] if warmup_task else []
+        _stage_done("input_validator", validated_state)
+        if artifacts is not None:
+            artifacts.start(validated_state.title, validated_state.structure)
+            artifacts.emit("draft", ABSTRACT, validated_state.abstract)
+
+        # Con la supervisione sovrapposta agenti e task di editing servono già durante la scrittura
+        editing_components = _crew_components(crew_components, "editing")
+        if overlap_supervision:
+            if not editing_components:
+                agents = build_agents_from_yaml(str(CREWS_DIR / "editing" / "agents.yaml"), agent_registry=agent_registry)
+                tasks = build_tasks_from_yaml(str(CREWS_DIR / "editing" / "tasks.yaml"), agents, agent_registry)
+                editing_components = {"agents": agents, "tasks": tasks}
+            section_supervision = SectionSupervisionBuffer(
+                editing_components["agents"], editing_components["tasks"], validated_state.title, build_cache=build_cache
+            )
+
+        with _profile_stage("writing"):
+            logging.info("Avvio WritingCrew...")
+            writer = WritingCrew(
+                state=validated_state, agent_registry=agent_registry, **_crew_components(crew_components, "writing")
+            )
+            written_state = await writer.kickoff(
+                defer_code_generation=affinity_scheduler is not None,
+                code_validator=code_validator,
+                summarizer_backend=summarizer_backend,
+                build_cache=build_cache,
+                artifacts=artifacts,
+                section_supervision=section_supervision,
+            )
+        _stage_done("writing", written_state)
+        if plot_flows:
+            schedule_flow_plot(writer.flow, flow_dir / "WritingFlow")
+
+        with _profile_stage("editing"):
+            logging.info("Avvio EditingCrew...")
+            editor = EditingCrew(state=written_state, agent_registry=agent_registry, **editing_components)
+            editing_state = await editor.kickoff(
+                num_reviews=num_reviews,
+                write_output=write_output,
+                markdown_outpath=str(md_path) if md_path else None,
+                build_cache=build_cache,
+                artifacts=artifacts,
+                section_supervision=section_supervision,
+            )
+        if plot_flows:
+            schedule_flow_plot(editor.flow, flow_dir / "EditingFlow")
+
+        editing_state.llm_metrics = {
+            "warmup": warmup_report,
+            "inference": _inference_stats(agent_registry, run_metrics),
+            "endpoints": _endpoint_stats(agent_registry),
+            "prompt_eval": prompt_eval_stats(run_metrics),
+            "coalescing": get_default_single_flight().stats(run_metrics),
+            "skipped_code_reviews": writer.flow.skipped_code_reviews,
+        }
+        batching = {
+            key: tool.batching_stats()
+            for key, tool in agent_registry.items()
+            if getattr(tool, "_batcher", None) is not None
+        }
+        if batching:
+            editing_state.llm_metrics["batching"] = batching
+        if build_cache is not None:
+            editing_state.llm_metrics["incremental"] = build_cache.stats()
+            logging.info("Run incrementale: %s", editing_state.llm_metrics["incremental"])
+        if affinity_scheduler is not None:
+            editing_state.llm_metrics["affinity"] = affinity_scheduler.stats()
+            logging.info("Scheduler affinità modelli: %s", editing_state.llm_metrics["affinity"])
+        _stage_done("editing", editing_state)
+        if artifacts is not None:
+            artifacts.complete(str(md_path) if md_path else None)
+        if event_log is not None:
+            event_log.emit("run_completed", markdown_path=str(md_path) if md_path else None)
+    except Exception as exc:
+        if artifacts is not None:
+            artifacts.fail(str(exc))
+        if event_log is not None:
+            event_log.emit("run_failed", error=str(exc))
+        raise
+    finally:
+        if code_validator is not None:
+            code_validator.shutdown()
+        if section_supervision is not None:
+            section_supervision.cancel()
+        if scheduler_token is not None:
+            current_scheduler.reset(scheduler_token)
+        if profiler is not None:
+            profiler.stop()
+        current_run_metrics.reset(metrics_token)
+        if events_token is not None:
+            current_run_events.reset(events_token)
 
     logging.info("Flusso completato.")
     return editing_state
@@ -167,6 +523,86 @@ def main() -> None:
         action="store_true",
         help="Disabilita la generazione dei diagrammi di flow.",
     )
+    parser.add_argument(
+        "--no_warmup",
+        action="store_true",
+        help="Disabilita il precaricamento dei modelli Ollama all'avvio.",
+    )
+    parser.add_argument(
+        "--max_resident_models",
+        type=int,
+        default=None,
+        help="Modelli che l'host tiene in memoria insieme: abilita lo scheduling per affinità di modello.",
+    )
+    parser.add_argument(
+        "--ollama_urls",
+        nargs="*",
+        default=None,
+        help="Server Ollama su cui bilanciare le richieste (es. --ollama_urls http://gpu1:11434 http://gpu2:11434)",
+    )
+    parser.add_argument(
+        "--llm_timeout",
+        type=float,
+        default=600.0,
+        help="Timeout in secondi di ogni richiesta LLM (ritentata con backoff se transitoria). Default: 600",
+    )
+    parser.add_argument(
+        "--hedge_requests",
+        action="store_true",
+        help="Con più --ollama_urls, duplica su un secondo endpoint le richieste che superano il p95 di latenza.",
+    )
+    parser.add_argument(
+        "--run_dir",
+        default=None,
+        help="Cartella della run: eventi di avanzamento (events.jsonl) e snapshot dello stato (state.json).",
+    )
+    parser.add_argument(
+        "--no_code_validation",
+        action="store_true",
+        help="Disabilita la validazione locale del codice: ogni snippet passa dalla revisione LLM.",
+    )
+    parser.add_argument(
+        "--code_linter",
+        default=None,
+        help='Linter per la validazione locale del codice (es. "ruff check --quiet"); ignorato se non installato. '
+        'Default: ruff o pyflakes se installati; "" lo disattiva.',
+    )
+    parser.add_argument(
+        "--execute_code",
+        action="store_true",
+        help="Esegue gli snippet di puro calcolo in un sottoprocesso con limiti di risorse; non è un container, solo su host usa-e-getta.",
+    )
+    parser.add_argument(
+        "--summarizer",
+        default="llm",
+        choices=sorted(SUMMARIZER_BACKENDS),
+        help="Riassunto delle sezioni passato al writer: llm (phi4) o extractive (TextRank locale). Default: llm",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Rigenera solo i passi con input cambiati, riusando il resto dallo state.json della run precedente.",
+    )
+    parser.add_argument(
+        "--previous_run_dir",
+        default=None,
+        help="Run da cui riusare gli output con --incremental. Default: --run_dir",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profila CPU e memoria di ogni stage (.pstats, stack .folded, allocazioni) accanto al Markdown.",
+    )
+    parser.add_argument(
+        "--profile_steps",
+        action="store_true",
+        help="Con --profile, misura anche tempo e memoria di ogni metodo dei flow.",
+    )
+    parser.add_argument(
+        "--overlap_supervision",
+        action="store_true",
+        help="Avvia la review di ogni sezione appena scritta, in parallelo alla scrittura delle successive.",
+    )
     parser.add_argument(
         "--log_level",
         default="INFO",
@@ -191,6 +627,21 @@ def main() -> None:
             write_output=args.write_output,
             markdown_outpath=args.markdown_outpath,
             plot_flows=not args.no_plot_flows,
+            warmup_models=not args.no_warmup,
+            max_resident_models=args.max_resident_models,
+            ollama_urls=args.ollama_urls,
+            llm_timeout=args.llm_timeout,
+            hedge_requests=args.hedge_requests,
+            run_dir=args.run_dir,
+            validate_code=not args.no_code_validation,
+            code_linter=args.code_linter,
+            execute_code=args.execute_code,
+            summarizer_backend=args.summarizer,
+            incremental=args.incremental,
+            previous_run_dir=args.previous_run_dir,
+            profile=args.profile,
+            profile_steps=args.profile_steps,
+            overlap_supervision=args.overlap_supervision,
         )
     )
 
@@ -0,0 +1,527 @@
+"""Servizio HTTP asincrono e long-running attorno a ``blogwriter_orchestrator``.
+
+Un unico processo mantiene in memoria registry LLM già scaldato e agenti già
+costruiti, ed esegue più job in parallelo con un limite globale di concorrenza
+per modello. La coda dei job è persistita su SQLite (:mod:`orchestrator.job_queue`),
+quindi un riavvio non perde il lavoro accodato.
+
+Endpoint:
+
+- ``POST /jobs`` — accoda un articolo (``title``, ``abstract``, ``structure``, ``num_reviews``, ``summarizer``,
+  ``overlap_supervision``, ``priority``, ``deadline_seconds``)
+- ``GET /jobs`` / ``GET /jobs/{id}`` — elenco e stato dei job
+- ``GET /jobs/{id}/events`` — stream Server-Sent Events dell'avanzamento
+- ``GET /jobs/{id}/markdown`` — Markdown finale del job completato
+- ``GET /health`` — stato del servizio e code dello scheduler LLM
+
+Le chiamate LLM di tutti i job passano da :class:`llm.request_scheduler.RequestScheduler`:
+``priority`` (``interactive``/``normal``/``batch``) e ``deadline_seconds`` decidono
+sia quale job in coda parte per primo sia chi ottiene il prossimo slot di un modello.
+
+Esecuzione::
+
+    poetry run python -m orchestrator.service --port 8080 --data_dir ./service_data
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import socket
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from llm.concurrency import set_default_limiter
+from llm.endpoint_pool import _canonical_model, detect_model_capabilities
+from llm.model_warmup import DEFAULT_BASE_URL
+from llm.model_warmup import warm_up
+from llm.request_scheduler import DEFAULT_PRIORITY, PRIORITY_CLASSES, RequestScheduler, request_context
+from orchestrator.job_queue import DONE, FAILED, Job, JobQueue
+from orchestrator.orchestrator import CREWS_DIR, blogwriter_orchestrator, build_default_agent_registry
+from utils.config_loader import build_agents_from_yaml, build_tasks_from_yaml, load_config_bundle
+from utils.context_summarizer_crew import SUMMARIZER_BACKENDS, SUMMARIZER_LLM
+from utils.run_events import RunEventLog
+from utils.section_artifacts import MANIFEST_FILE
+
+logger = logging.getLogger(__name__)
+
+CREW_NAMES = ("input_validator", "writing", "editing")
+_TERMINAL_EVENTS = {"run_completed", "run_failed"}
+_STATUS_TEXT = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 409: "Conflict", 500: "Internal Server Error"}
+
+
+class CrewComponentPool:
+    """Agenti e task già costruiti per ciascuna crew.
+
+    Gli agenti CrewAI hanno stato interno: un set di componenti viene dato a un
+    solo job per volta e restituito al pool a fine job, così i job successivi
+    non ricostruiscono nulla.
+    """
+
+    def __init__(self, agent_registry: Dict[str, Any]) -> None:
+        self.agent_registry = agent_registry
+        self._free: Dict[str, List[Tuple[dict, dict]]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def _build(self, name: str) -> Tuple[dict, dict]:
+        agents = build_agents_from_yaml(str(CREWS_DIR / name / "agents.yaml"), agent_registry=self.agent_registry)
+        tasks = build_tasks_from_yaml(str(CREWS_DIR / name / "tasks.yaml"), agents, self.agent_registry)
+        return agents, tasks
+
+    def prewarm(self, copies: int) -> None:
+        for name in CREW_NAMES:
+            built = [self._build(name) for _ in range(copies)]
+            with self._lock:
+                self._free[name].extend(built)
+
+    @contextmanager
+    def checkout(self) -> Iterator[Dict[str, Tuple[dict, dict]]]:
+        components: Dict[str, Tuple[dict, dict]] = {}
+        for name in CREW_NAMES:
+            with self._lock:
+                free = self._free[name].pop() if self._free[name] else None
+            components[name] = free if free is not None else self._build(name)
+        try:
+            yield components
+        finally:
+            with self._lock:
+                for name, value in components.items():
+                    self._free[name].append(value)
+
+
+class BlogWriterService:
+    """Coda persistente + esecutore di job + server HTTP.
+
+    Parameters
+    ----------
+    data_dir:
+        Cartella con il database dei job e le cartelle ``runs/<job_id>``.
+    max_concurrent_jobs:
+        Job eseguiti contemporaneamente.
+    model_concurrency:
+        Richieste contemporanee ammesse per ciascun modello, su tutti i job.
+    model_limits:
+        Limiti per i singoli modelli, al posto di ``model_concurrency``; il nome
+        può omettere il prefisso ``ollama/`` e il tag ``:latest``, ma il modello
+        deve essere nel registry (``ValueError`` altrimenti).
+    agent_registry:
+        Registry LLM condiviso; di default :func:`build_default_agent_registry`.
+    tags:
+        Capability aggiuntive del servizio come worker della coda; all'avvio vi
+        si aggiungono i modelli presenti sugli endpoint del registry
+        (``ollama/<nome>``), come per ``orchestrator.worker``.
+    """
+
+    def __init__(
+        self,
+        data_dir: str | Path,
+        max_concurrent_jobs: int = 2,
+        model_concurrency: int = 1,
+        model_limits: Optional[Dict[str, int]] = None,
+        agent_registry: Optional[Dict[str, Any]] = None,
+        warmup_models: bool = True,
+        num_reviews: int = 10,
+        tags: Iterable[str] = (),
+    ) -> None:
+        self.data_dir = Path(data_dir)
+        self.runs_dir = self.data_dir / "runs"
+        self.runs_dir.mkdir(parents=True, exist_ok=True)
+        self.queue = JobQueue(self.data_dir / "jobs.sqlite3")
+        self.agent_registry = agent_registry or build_default_agent_registry()
+        # Errori negli YAML emergono all'avvio del servizio, non al primo job
+        load_config_bundle(CREWS_DIR)
+        self.components = CrewComponentPool(self.agent_registry)
+        _check_model_limits(model_limits or {}, self.agent_registry)
+        self.limiter = RequestScheduler(default_limit=model_concurrency, limits=model_limits)
+        self.max_concurrent_jobs = max(1, max_concurrent_jobs)
+        self.warmup_models = warmup_models
+        self.default_num_reviews = num_reviews
+        self._event_logs: Dict[str, RunEventLog] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        # Il servizio è un worker come gli altri della coda: può condividerla con
+        # ``orchestrator.worker`` in esecuzione su altri host.
+        self.worker_id = f"service-{socket.gethostname()}-{os.getpid()}"
+        # Completate in serve() con i modelli presenti sugli endpoint del registry
+        self.tags = sorted(set(tags))
+        self.capabilities: List[str] = list(self.tags)
+        self._job_slots: Optional[asyncio.Semaphore] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    # ---------- Lifecycle ----------
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8080) -> None:
+        set_default_limiter(self.limiter)
+        self._job_slots = asyncio.Semaphore(self.max_concurrent_jobs)
+        self._wakeup = asyncio.Event()
+
+        # Come un worker: si prendono solo i job i cui tag richiesti il servizio può soddisfare
+        models = await asyncio.to_thread(detect_model_capabilities, _registry_base_urls(self.agent_registry))
+        self.capabilities = sorted(set(self.tags) | set(models))
+        await asyncio.to_thread(self.queue.register_worker, self.worker_id, socket.gethostname(), self.capabilities)
+
+        if self.warmup_models:
+            asyncio.create_task(asyncio.to_thread(
+                warm_up, self.agent_registry, sorted(CREWS_DIR.glob("*/agents.yaml")), extra_llm_keys=[SUMMARIZER_LLM]
+            ))
+        await asyncio.to_thread(self.components.prewarm, self.max_concurrent_jobs)
+
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        dispatcher = asyncio.create_task(self._dispatch_jobs())
+        logger.info("BlogWriter service in ascolto su http://%s:%d", host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            dispatcher.cancel()
+
+    async def _dispatch_jobs(self) -> None:
+        while True:
+            await self._job_slots.acquire()
+            job = await asyncio.to_thread(self.queue.claim_next, self.worker_id, self.capabilities)
+            if job is None:
+                self._job_slots.release()
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=2.0)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self._running[job.id] = asyncio.create_task(self._run_job(job))
+
+    async def _run_job(self, job: Job) -> None:
+        run_dir = self.runs_dir / job.id
+        event_log = RunEventLog(run_dir / "events.jsonl", run_id=job.id)
+        self._event_logs[job.id] = event_log
+        await asyncio.to_thread(self.queue.set_run_dir, job.id, str(run_dir))
+        md_path = run_dir / "article.md"
+        params = job.params
+        started = time.perf_counter()
+        ok = False
+        lease = self.queue.lease(job, self.worker_id)
+        try:
+            async with lease:
+                with self.components.checkout() as components, request_context(
+                    job.id, params.get("priority", DEFAULT_PRIORITY), params.get("deadline")
+                ):
+                    # I flow attendono le crew nel pool di utils.async_crew: i job
+                    # condividono l'event loop del server senza bloccarlo.
+                    await blogwriter_orchestrator(
+                        title=params["title"],
+                        abstract=params.get("abstract", ""),
+                        structure=params.get("structure") or [],
+                        agent_registry=self.agent_registry,
+                        num_reviews=int(params.get("num_reviews", self.default_num_reviews)),
+                        write_output=True,
+                        markdown_outpath=str(md_path),
+                        plot_flows=False,
+                        warmup_models=False,
+                        run_dir=str(run_dir),
+                        event_log=event_log,
+                        crew_components=components,
+                        summarizer_backend=params.get("summarizer", "llm"),
+                        overlap_supervision=bool(params.get("overlap_supervision", False)),
+                    )
+        except Exception as exc:
+            logger.exception("Job %s fallito", job.id)
+            await asyncio.to_thread(self.queue.fail, job.id, str(exc), self.worker_id)
+        else:
+            if not lease.lost.is_set():
+                ok = await asyncio.to_thread(self.queue.complete, job.id, str(md_path), self.worker_id)
+        finally:
+            await asyncio.to_thread(self.queue.record_worker_job, self.worker_id, ok, time.perf_counter() - started)
+            self._event_logs.pop(job.id, None)
+            self._running.pop(job.id, None)
+            self._job_slots.release()
+
+    # ---------- HTTP ----------
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = (await reader.readline()).decode("latin-1").strip()
+            if not request_line:
+                return
+            method, target, _ = request_line.split(" ", 2)
+            headers: Dict[str, str] = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1")
+                if line in ("\r\n", "\n", ""):
+                    break
+                key, _, value = line.partition(":")
+                headers[key.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0) or 0))
+            await self._route(method.upper(), target.split("?", 1)[0].rstrip("/") or "/", body, writer)
+        except (ValueError, asyncio.IncompleteReadError) as exc:
+            await self._send_json(writer, 400, {"error": f"Richiesta non valida: {exc}"})
+        except ConnectionError:
+            pass
+        except Exception as exc:  # pragma: no cover - difesa del server
+            logger.exception("Errore nella gestione della richiesta")
+            await self._send_json(writer, 500, {"error": str(exc)})
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _route(self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter) -> None:
+        parts = [p for p in path.split("/") if p]
+        if parts == ["health"] and method == "GET":
+            return await self._send_json(writer, 200, {
+                "status": "ok",
+                "worker_id": self.worker_id,
+                "running_jobs": sorted(self._running),
+                "scheduler": self.limiter.stats(),
+            })
+        if parts == ["jobs"]:
+            if method == "POST":
+                return await self._submit(body, writer)
+            if method == "GET":
+                jobs = await asyncio.to_thread(self.queue.list)
+                return await self._send_json(writer, 200, {"jobs": [job.as_dict() for job in jobs]})
+            return await self._send_json(writer, 405, {"error": "Metodo non supportato"})
+        if len(parts) >= 2 and parts[0] == "jobs" and method == "GET":
+            job = await asyncio.to_thread(self.queue.get, parts[1])
+            if job is None:
+                return await self._send_json(writer, 404, {"error": "Job inesistente"})
+            if len(parts) == 2:
+                return await self._send_json(writer, 200, job.as_dict())
+            if parts[2:] == ["events"]:
+                return await self._stream_events(job, writer)
+            if parts[2:] == ["markdown"]:
+                return await self._send_markdown(job, writer)
+            if parts[2] == "sections" and len(parts) <= 4:
+                return await self._send_section(job, parts[3] if len(parts) == 4 else MANIFEST_FILE, writer)
+        return await self._send_json(writer, 404, {"error": "Risorsa inesistente"})
+
+    async def _submit(self, body: bytes, writer: asyncio.StreamWriter) -> None:
+        try:
+            payload = json.loads(body or b"{}")
+        except json.JSONDecodeError as exc:
+            return await self._send_json(writer, 400, {"error": f"JSON non valido: {exc}"})
+        try:
+            params = _job_params(payload, self.default_num_reviews)
+        except ValueError as exc:
+            return await self._send_json(writer, 400, {"error": str(exc)})
+        job = await asyncio.to_thread(self.queue.submit, params)
+        self._wakeup.set()
+        await self._send_json(writer, 202, {"job_id": job.id, "status": job.status})
+
+    async def _send_markdown(self, job: Job, writer: asyncio.StreamWriter) -> None:
+        if job.status != DONE or not job.markdown_path or not Path(job.markdown_path).exists():
+            return await self._send_json(writer, 409, {"error": f"Markdown non disponibile (stato: {job.status})."})
+        content = Path(job.markdown_path).read_bytes()
+        await self._send(writer, 200, content, "text/markdown; charset=utf-8")
+
+    async def _send_section(self, job: Job, name: str, writer: asyncio.StreamWriter) -> None:
+        """Manifest delle sezioni pubblicate o uno dei file che elenca."""
+        sections_dir = (Path(job.run_dir) if job.run_dir else self.runs_dir / job.id) / "sections"
+        manifest_path = sections_dir / MANIFEST_FILE
+        if not manifest_path.exists():
+            return await self._send_json(writer, 409, {"error": f"Nessuna sezione pubblicata (stato: {job.status})."})
+        if name == MANIFEST_FILE:
+            return await self._send(writer, 200, manifest_path.read_bytes(), "application/json; charset=utf-8")
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        # Si servono solo i file elencati nel manifest
+        published = {
+            entry[stage]["path"] for entry in manifest.get("sections", []) for stage in ("draft", "final") if entry.get(stage)
+        }
+        if name not in published:
+            return await self._send_json(writer, 404, {"error": "Sezione non pubblicata"})
+        await self._send(writer, 200, (sections_dir / name).read_bytes(), "text/markdown; charset=utf-8")
+
+    async def _stream_events(self, job: Job, writer: asyncio.StreamWriter) -> None:
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\nConnection: close\r\n\r\n"
+        )
+        loop = asyncio.get_running_loop()
+        live: asyncio.Queue = asyncio.Queue()
+        event_log = self._event_logs.get(job.id)
+        # Job ancora in coda: si attende che parta (o che termini altrove)
+        while event_log is None and job.status not in (DONE, FAILED):
+            await asyncio.sleep(0.5)
+            job = await asyncio.to_thread(self.queue.get, job.id) or job
+            event_log = self._event_logs.get(job.id)
+
+        def _forward(event: Dict[str, Any]) -> None:
+            # Gli eventi arrivano dal loop o dai thread del pool delle crew
+            loop.call_soon_threadsafe(live.put_nowait, event)
+
+        # Prima ci si sottoscrive, poi si rilegge lo storico: nessun evento va perso
+        if event_log is not None:
+            event_log.subscribe(_forward)
+        try:
+            run_dir = Path(job.run_dir) if job.run_dir else self.runs_dir / job.id
+            history = RunEventLog(run_dir / "events.jsonl").read_all()
+            seen = {(e.get("ts"), e.get("kind")) for e in history}
+            for event in history:
+                await self._write_event(writer, event)
+            if event_log is None or job.status in (DONE, FAILED) or any(e.get("kind") in _TERMINAL_EVENTS for e in history):
+                return
+            while True:
+                try:
+                    event = await asyncio.wait_for(live.get(), timeout=15.0)
+                except asyncio.TimeoutError:
+                    writer.write(b": keepalive\n\n")
+                    await writer.drain()
+                    if job.id not in self._event_logs:
+                        return
+                    continue
+                if (event.get("ts"), event.get("kind")) in seen:
+                    continue
+                await self._write_event(writer, event)
+                if event.get("kind") in _TERMINAL_EVENTS:
+                    return
+        finally:
+            if event_log is not None:
+                event_log.unsubscribe(_forward)
+
+    @staticmethod
+    async def _write_event(writer: asyncio.StreamWriter, event: Dict[str, Any]) -> None:
+        writer.write(f"event: {event.get('kind', 'message')}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+        await writer.drain()
+
+    @staticmethod
+    async def _send(writer: asyncio.StreamWriter, status: int, body: bytes, content_type: str) -> None:
+        head = (
+            f"HTTP/1.1 {status} {_STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any]) -> None:
+        await self._send(writer, status, json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json")
+
+
+# ---------- CLI ----------
+
+def _job_params(payload: Any, default_num_reviews: int) -> Dict[str, Any]:
+    """Valida il corpo di ``POST /jobs`` e ne ricava i parametri del job (``ValueError`` se non valido)."""
+    if not isinstance(payload, dict):
+        raise ValueError("Il corpo della richiesta deve essere un oggetto JSON.")
+    title = payload.get("title")
+    if not isinstance(title, str) or not title.strip():
+        raise ValueError("`title` deve essere una stringa non vuota.")
+    # Campi opzionali: ``null`` vale come assente
+    abstract = payload.get("abstract") or ""
+    if not isinstance(abstract, str):
+        raise ValueError("`abstract` deve essere una stringa.")
+    structure = payload.get("structure") or []
+    if not isinstance(structure, list) or not all(isinstance(section, str) for section in structure):
+        raise ValueError("`structure` deve essere una lista di stringhe.")
+    num_reviews = payload.get("num_reviews", default_num_reviews)
+    if isinstance(num_reviews, bool) or not isinstance(num_reviews, int) or num_reviews < 1:
+        raise ValueError("`num_reviews` deve essere un intero >= 1.")
+    summarizer = payload.get("summarizer", "llm")
+    if not isinstance(summarizer, str) or summarizer not in SUMMARIZER_BACKENDS:
+        raise ValueError(f"`summarizer` deve essere uno tra {sorted(SUMMARIZER_BACKENDS)}.")
+    priority = payload.get("priority", DEFAULT_PRIORITY)
+    if not isinstance(priority, str) or priority not in PRIORITY_CLASSES:
+        raise ValueError(f"`priority` deve essere uno tra {sorted(PRIORITY_CLASSES)}.")
+    overlap_supervision = payload.get("overlap_supervision", False)
+    if not isinstance(overlap_supervision, bool):
+        raise ValueError("`overlap_supervision` deve essere un booleano.")
+    deadline_seconds = payload.get("deadline_seconds")
+    if deadline_seconds is not None and (
+        isinstance(deadline_seconds, bool)
+        or not isinstance(deadline_seconds, (int, float))
+        or not math.isfinite(deadline_seconds)
+        or deadline_seconds <= 0
+    ):
+        raise ValueError("`deadline_seconds` deve essere un numero > 0.")
+    return {
+        "title": title.strip(),
+        "abstract": abstract,
+        "structure": list(structure),
+        "num_reviews": num_reviews,
+        "summarizer": summarizer,
+        "overlap_supervision": overlap_supervision,
+        "priority": priority,
+        # Scadenza assoluta: ordina la coda dei job e le richieste ai modelli
+        "deadline": time.time() + deadline_seconds if deadline_seconds is not None else None,
+    }
+
+
+def _registry_base_urls(agent_registry: Dict[str, Any]) -> List[str]:
+    """Endpoint Ollama usati dai tool del registry (quelli del pool, o il ``base_url`` del tool)."""
+    urls = set()
+    for tool in agent_registry.values():
+        if getattr(tool, "backend", "ollama") != "ollama":
+            continue
+        pool = getattr(tool, "endpoint_pool", None)
+        if pool is not None:
+            urls.update(endpoint.base_url for endpoint in pool.endpoints)
+        else:
+            urls.add(getattr(tool, "base_url", DEFAULT_BASE_URL))
+    return sorted(urls)
+
+
+def _check_model_limits(limits: Dict[str, int], agent_registry: Dict[str, Any]) -> None:
+    """Rifiuta i limiti per modelli che nessun tool del registry usa (non verrebbero mai applicati)."""
+    models = {_canonical_model(tool.model) for tool in agent_registry.values() if hasattr(tool, "model")}
+    unknown = sorted(model for model in limits if _canonical_model(model) not in models)
+    if unknown:
+        raise ValueError(f"Limiti per modelli non presenti nel registry: {unknown}. Modelli disponibili: {sorted(models)}.")
+
+
+def _parse_model_limits(values: List[str]) -> Dict[str, int]:
+    limits = {}
+    for value in values:
+        model, sep, limit = value.rpartition("=")
+        if not sep or not model or not limit.isdigit() or int(limit) < 1:
+            raise ValueError(f"Limite per modello non valido: {value!r} (atteso MODELLO=N con N >= 1).")
+        limits[model] = int(limit)
+    return limits
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Servizio HTTP BlogWriter")
+    parser.add_argument("--host", default="127.0.0.1", help="Indirizzo di ascolto. Default: 127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080, help="Porta di ascolto. Default: 8080")
+    parser.add_argument("--data_dir", default="./service_data", help="Cartella per coda job e run. Default: ./service_data")
+    parser.add_argument("--max_jobs", type=int, default=2, help="Job eseguiti in parallelo. Default: 2")
+    parser.add_argument("--model_concurrency", type=int, default=1, help="Richieste contemporanee per modello. Default: 1")
+    parser.add_argument(
+        "--model_limit",
+        action="append",
+        default=[],
+        metavar="MODELLO=N",
+        help="Richieste contemporanee per un singolo modello (ripetibile).",
+    )
+    parser.add_argument("--num_reviews", type=int, default=10, help="Review di default per job. Default: 10")
+    parser.add_argument("--no_warmup", action="store_true", help="Disabilita il precaricamento dei modelli all'avvio.")
+    parser.add_argument("--tags", nargs="*", default=[], help="Capability aggiuntive del servizio nella coda (es. gpu-a100).")
+    parser.add_argument(
+        "--log_level",
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="Livello di logging. Default: INFO",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(
+        level=getattr(logging, args.log_level),
+        format="%(asctime)s | %(levelname)s | %(message)s",
+    )
+
+    service = BlogWriterService(
+        data_dir=args.data_dir,
+        max_concurrent_jobs=args.max_jobs,
+        model_concurrency=args.model_concurrency,
+        model_limits=_parse_model_limits(args.model_limit),
+        warmup_models=not args.no_warmup,
+        tags=args.tags,
+        num_reviews=args.num_reviews,
+    )
+    asyncio.run(service.serve(host=args.host, port=args.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""Worker che preleva job da una coda SQLite condivisa tra più host.
+
+Ogni host GPU avvia un worker puntato allo stesso file ``jobs.sqlite3`` su
+storage condiviso: non serve alcun servizio centrale, e aggiungere host aumenta
+i job eseguiti in parallelo. I job hanno un lease rinnovato da heartbeat: se un
+worker muore, i suoi job tornano in coda allo scadere del lease e li riprende un
+altro worker.
+
+Le capability di un worker sono i tag passati con ``--tags`` più i modelli
+disponibili sui suoi endpoint Ollama (``ollama/<nome>``). Un job accodato con
+``--require`` viene preso solo da worker che hanno tutti i tag richiesti; i tag di
+modello sono confrontati in forma canonica (``ollama/phi4`` = ``ollama/phi4:latest``).
+
+Esecuzione::
+
+    poetry run python -m orchestrator.worker --db /shared/blogwriter/jobs.sqlite3 run --tags gpu-a100
+    poetry run python -m orchestrator.worker --db /shared/blogwriter/jobs.sqlite3 submit --title "..." --require ollama/qwen3:14b
+    poetry run python -m orchestrator.worker --db /shared/blogwriter/jobs.sqlite3 stats
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from llm.endpoint_pool import detect_model_capabilities
+from llm.model_warmup import DEFAULT_BASE_URL, warm_up
+from orchestrator.job_queue import DEFAULT_LEASE_SECONDS, Job, JobQueue
+from orchestrator.orchestrator import CREWS_DIR, blogwriter_orchestrator, build_default_agent_registry
+from orchestrator.service import CrewComponentPool
+from utils.context_summarizer_crew import SUMMARIZER_BACKENDS, SUMMARIZER_LLM
+from utils.run_events import RunEventLog
+
+logger = logging.getLogger(__name__)
+
+
+class BlogWriterWorker:
+    """Esegue job della coda condivisa finché non viene fermato.
+
+    Parameters
+    ----------
+    queue:
+        Coda condivisa.
+    runs_dir:
+        Cartella (condivisa) in cui creare ``<job_id>/`` con eventi, stato e Markdown.
+    worker_id:
+        Identificativo univoco; di default ``<hostname>-<pid>``.
+    capabilities:
+        Tag offerti dal worker per il matching con i ``required_tags`` dei job.
+    max_concurrent_jobs:
+        Job eseguiti in parallelo da questo worker.
+    lease_seconds:
+        Durata del lease; l'heartbeat lo rinnova ogni ``lease_seconds / 3``.
+    poll_interval:
+        Attesa tra due tentativi quando la coda è vuota.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        runs_dir: str | Path,
+        agent_registry: Dict[str, Any],
+        worker_id: Optional[str] = None,
+        capabilities: Iterable[str] = (),
+        max_concurrent_jobs: int = 1,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        poll_interval: float = 5.0,
+        num_reviews: int = 10,
+        warmup_models: bool = True,
+    ) -> None:
+        self.queue = queue
+        self.runs_dir = Path(runs_dir)
+        self.agent_registry = agent_registry
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.capabilities = sorted(set(capabilities))
+        self.max_concurrent_jobs = max(1, max_concurrent_jobs)
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.default_num_reviews = num_reviews
+        self.warmup_models = warmup_models
+        self.components = CrewComponentPool(agent_registry)
+        self._stop = threading.Event()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run(self, max_jobs: Optional[int] = None) -> None:
+        """Avvia ``max_concurrent_jobs`` loop di esecuzione e attende che terminino.
+
+        Con ``max_jobs`` ogni loop si ferma dopo aver eseguito quel numero di job.
+        """
+        self.queue.register_worker(self.worker_id, socket.gethostname(), self.capabilities)
+        logger.info("👷 Worker %s avviato (capability: %s)", self.worker_id, ", ".join(self.capabilities) or "-")
+        if self.warmup_models:
+            threading.Thread(
+                target=warm_up,
+                args=(self.agent_registry, sorted(CREWS_DIR.glob("*/agents.yaml"))),
+                kwargs={"extra_llm_keys": [SUMMARIZER_LLM]},
+                daemon=True,
+            ).start()
+        self.components.prewarm(self.max_concurrent_jobs)
+
+        loops = [
+            threading.Thread(target=self._loop, args=(max_jobs,), name=f"{self.worker_id}-{i}")
+            for i in range(self.max_concurrent_jobs)
+        ]
+        for loop in loops:
+            loop.start()
+        try:
+            for loop in loops:
+                while loop.is_alive():
+                    loop.join(timeout=1.0)
+        except KeyboardInterrupt:
+            logger.info("Arresto richiesto: si attende la fine dei job in corso.")
+            self.stop()
+            for loop in loops:
+                loop.join()
+
+    def _loop(self, max_jobs: Optional[int]) -> None:
+        executed = 0
+        while not self._stop.is_set() and (max_jobs is None or executed < max_jobs):
+            job = self.queue.claim_next(self.worker_id, self.capabilities, self.lease_seconds)
+            if job is None:
+                self.queue.touch_worker(self.worker_id)
+                self._stop.wait(self.poll_interval)
+                continue
+            self.run_job(job)
+            executed += 1
+
+    def run_job(self, job: Job) -> bool:
+        run_dir = self.runs_dir / job.id
+        md_path = run_dir / "article.md"
+        params = job.params
+        self.queue.set_run_dir(job.id, str(run_dir))
+        logger.info("▶️ Job %s (tentativo %d): %s", job.id, job.attempts, params.get("title"))
+        started = time.perf_counter()
+        error: Optional[str] = None
+        with self.queue.lease(job, self.worker_id, self.lease_seconds) as lease:
+            try:
+                with self.components.checkout() as components:
+                    asyncio.run(
+                        blogwriter_orchestrator(
+                            title=params["title"],
+                            abstract=params.get("abstract", ""),
+                            structure=params.get("structure") or [],
+                            agent_registry=self.agent_registry,
+                            num_reviews=int(params.get("num_reviews", self.default_num_reviews)),
+                            write_output=True,
+                            markdown_outpath=str(md_path),
+                            plot_flows=False,
+                            warmup_models=False,
+                            run_dir=str(run_dir),
+                            event_log=RunEventLog(run_dir / "events.jsonl", run_id=job.id),
+                            crew_components=components,
+                            summarizer_backend=params.get("summarizer", "llm"),
+                            overlap_supervision=bool(params.get("overlap_supervision", False)),
+                        )
+                    )
+            except Exception as exc:
+                logger.exception("Job %s fallito", job.id)
+                error = str(exc)
+        elapsed = time.perf_counter() - started
+
+        if lease.lost.is_set():
+            # Il job è già stato ripreso da un altro worker: il risultato si scarta
+            logger.warning("Risultato del job %s scartato: lease perso.", job.id)
+            self.queue.record_worker_job(self.worker_id, ok=False, busy_seconds=elapsed)
+            return False
+        if error is None:
+            ok = self.queue.complete(job.id, str(md_path), worker_id=self.worker_id)
+        else:
+            self.queue.fail(job.id, error, worker_id=self.worker_id)
+            ok = False
+        self.queue.record_worker_job(self.worker_id, ok=ok, busy_seconds=elapsed)
+        logger.info("%s Job %s in %.1fs", "✅" if ok else "❌", job.id, elapsed)
+        return ok
+
+
+# ---------- CLI ----------
+
+def _split(values: Optional[str]) -> List[str]:
+    return [value.strip() for value in (values or "").split(",") if value.strip()]
+
+
+def _run(args: argparse.Namespace) -> None:
+    ollama_urls = _split(args.ollama_urls) or [DEFAULT_BASE_URL]
+    capabilities = _split(args.tags)
+    if not args.no_detect_models:
+        capabilities += detect_model_capabilities(ollama_urls)
+    queue = JobQueue(args.db, max_attempts=args.max_attempts)
+    worker = BlogWriterWorker(
+        queue=queue,
+        runs_dir=args.runs_dir or Path(args.db).parent / "runs",
+        agent_registry=build_default_agent_registry(ollama_urls=ollama_urls, request_timeout=args.llm_timeout),
+        worker_id=args.worker_id,
+        capabilities=capabilities,
+        max_concurrent_jobs=args.max_jobs,
+        lease_seconds=args.lease_seconds,
+        poll_interval=args.poll_interval,
+        num_reviews=args.num_reviews,
+        warmup_models=not args.no_warmup,
+    )
+    worker.run()
+
+
+def _submit(args: argparse.Namespace) -> None:
+    queue = JobQueue(args.db)
+    job = queue.submit(
+        {
+            "title": args.title,
+            "abstract": args.abstract,
+            "structure": args.structure or [],
+            "num_reviews": args.num_reviews,
+            "summarizer": args.summarizer,
+            "overlap_supervision": args.overlap_supervision,
+        },
+        required_tags=_split(args.require),
+    )
+    print(job.id)
+
+
+def _stats(args: argparse.Namespace) -> None:
+    queue = JobQueue(args.db)
+    counts: Dict[str, int] = {}
+    for job in queue.list(limit=1_000_000):
+        counts[job.status] = counts.get(job.status, 0) + 1
+    print(json.dumps({"jobs": counts, "workers": queue.worker_stats()}, indent=2, ensure_ascii=False))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Worker BlogWriter su coda condivisa")
+    parser.add_argument("--db", required=True, help="File SQLite della coda (su storage condiviso).")
+    parser.add_argument(
+        "--log_level",
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="Livello di logging. Default: INFO",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Esegue job dalla coda.")
+    run.add_argument("--runs_dir", default=None, help="Cartella delle run. Default: <cartella del db>/runs")
+    run.add_argument("--worker_id", default=None, help="Identificativo del worker. Default: <hostname>-<pid>")
+    run.add_argument("--tags", default=None, help="Capability aggiuntive separate da virgola (es. gpu-a100).")
+    run.add_argument("--no_detect_models", action="store_true", help="Non aggiunge i modelli Ollama disponibili alle capability.")
+    run.add_argument("--ollama_urls", default=None, help="Endpoint Ollama separati da virgola.")
+    run.add_argument("--max_jobs", type=int, default=1, help="Job eseguiti in parallelo dal worker. Default: 1")
+    run.add_argument("--lease_seconds", type=float, default=DEFAULT_LEASE_SECONDS, help="Durata del lease. Default: 120")
+    run.add_argument("--max_attempts", type=int, default=3, help="Tentativi massimi per job. Default: 3")
+    run.add_argument("--poll_interval", type=float, default=5.0, help="Attesa a coda vuota, in secondi. Default: 5")
+    run.add_argument("--llm_timeout", type=float, default=600.0, help="Timeout per chiamata LLM. Default: 600")
+    run.add_argument("--num_reviews", type=int, default=10, help="Review di default per job. Default: 10")
+    run.add_argument("--no_warmup", action="store_true", help="Disabilita il precaricamento dei modelli.")
+    run.set_defaults(handler=_run)
+
+    submit = commands.add_parser("submit", help="Accoda un articolo.")
+    submit.add_argument("--title", required=True, help="Titolo dell'articolo.")
+    submit.add_argument("--abstract", default="", help="Abstract dell'articolo.")
+    submit.add_argument("--structure", nargs="*", default=None, help="Titoli delle sezioni.")
+    submit.add_argument("--num_reviews", type=int, default=10, help="Numero di review. Default: 10")
+    submit.add_argument("--summarizer", default="llm", choices=sorted(SUMMARIZER_BACKENDS), help="Backend di riassunto. Default: llm")
+    submit.add_argument(
+        "--overlap_supervision", action="store_true", help="Review delle sezioni in parallelo alla scrittura."
+    )
+    submit.add_argument("--require", default=None, help="Tag richiesti al worker, separati da virgola.")
+    submit.set_defaults(handler=_submit)
+
+    stats = commands.add_parser("stats", help="Stato della coda e throughput dei worker.")
+    stats.set_defaults(handler=_stats)
+
+    args = parser.parse_args()
+    logging.basicConfig(
+        level=getattr(logging, args.log_level),
+        format="%(asctime)s | %(levelname)s | %(message)s",
+    )
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
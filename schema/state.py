@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, Field, field_validator
+from typing import Any, Dict, List, Optional, Union
 
 class ArticleState(BaseModel):
     # INPUT PRIMARI
@@ -15,14 +15,24 @@ class ArticleState(BaseModel):
     section_summaries: Dict[str, str] = Field(default_factory=dict, description="Riassunti per ogni sezione")
     
     ## CODICE
-    code_instructions: Dict[str, str] = Field(default_factory=dict, description="Istruzioni generate dal writer per generare codice")
-    code_snippets: Dict[str, str] = Field(default_factory=dict, description="Codice prodotto per ciascuna sezione")
+    code_instructions: Dict[str, List[str]] = Field(default_factory=dict, description="Istruzioni generate dal writer per generare codice, una per marker nell'ordine del testo")
+    code_snippets: Dict[str, List[str]] = Field(default_factory=dict, description="Codice prodotto per ciascun marker della sezione, nello stesso ordine delle istruzioni")
     
     ## OUTPUT EDITING
     original_article: str = Field(default="", description="Versione originale del documento markdown")
     edited_article: str = Field(default="", description="Versione finale del documento markdown editato")
-    supervision_report: Dict[str, str] = Field(default_factory=dict, description="Osservazioni degli agenti supervisori sull’intero articolo")
-    final_revision_report: dict = Field(default_factory=dict, description="Revisione definitiva ottenuta dall'analisi svolta dai diversi supervisori")
+    supervision_report: Dict[str, str] = Field(default_factory=dict, description="Osservazioni degli agenti supervisori sull’intero articolo e, in modalità sovrapposta, sulle singole sezioni")
+    final_revision_report: Union[Dict[str, List[str]], str] = Field(default_factory=dict, description="Revisione definitiva ottenuta dall'analisi svolta dai diversi supervisori (sezione → modifiche; testo grezzo se non interpretabile)")
 
     # METADATA AGGIUNTIVI
     log_summary: Dict[str, Any] = Field(default_factory=dict, description="Metriche sintetiche dei log")
+    llm_metrics: Dict[str, Any] = Field(default_factory=dict, description="Tempi di caricamento (warm-up) e di inferenza dei modelli")
+    build_records: Dict[str, Dict[str, Any]] = Field(default_factory=dict, description="Hash degli input e output di ogni passo, per la rigenerazione incrementale")
+
+    @field_validator("code_instructions", "code_snippets", mode="before")
+    @classmethod
+    def _wrap_single_code_entry(cls, value: Any) -> Any:
+        """Gli state.json precedenti salvano una sola stringa per sezione: diventa una lista di un elemento."""
+        if isinstance(value, dict):
+            return {section: [entry] if isinstance(entry, str) else entry for section, entry in value.items()}
+        return value
@@ -0,0 +1,11 @@
+"""Configurazione comune dei test: radice del repository nel path e telemetria disattivata."""
+import os
+import sys
+from pathlib import Path
+
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
@@ -0,0 +1,35 @@
+"""Riferimento FIFO dello scheduler con affinità di modello."""
+from llm.affinity_scheduler import ModelAffinityScheduler, deferred_section
+
+
+def _call(scheduler: ModelAffinityScheduler, model: str) -> None:
+    with scheduler.slot(model):
+        pass
+
+
+def test_switches_avoided_by_deferral_are_counted():
+    scheduler = ModelAffinityScheduler(max_resident_models=1)
+    sections = ["Intro", "Analisi", "Conclusioni"]
+    for section in sections:
+        _call(scheduler, "writer")
+        scheduler.mark_deferral(section)
+    for section in sections:
+        with deferred_section(section):
+            _call(scheduler, "coder")
+
+    stats = scheduler.stats()
+    # Senza rinvio: writer, coder, writer, coder, writer, coder
+    assert stats["fifo_model_switches"] == 5
+    assert stats["model_switches"] == 1
+    assert stats["switches_avoided"] == 4
+
+
+def test_without_deferral_reference_is_arrival_order():
+    scheduler = ModelAffinityScheduler(max_resident_models=1)
+    for model in ["writer", "coder", "writer"]:
+        _call(scheduler, model)
+    with deferred_section("non rimandata"):
+        _call(scheduler, "coder")
+    stats = scheduler.stats()
+    assert stats["fifo_model_switches"] == stats["model_switches"] == 3
+    assert stats["switches_avoided"] == 0
@@ -0,0 +1,31 @@
+"""Compatibilità di ContextAgent con il metodo privato di CrewAI che sostituisce."""
+import pytest
+from crewai import Agent
+
+from utils.async_crew import ContextAgent, check_crewai_timeout_hook
+
+
+def test_installed_crewai_is_compatible():
+    check_crewai_timeout_hook(Agent)
+
+
+def test_changed_upstream_signature_fails_loudly():
+    class ChangedAgent(Agent):
+        def _execute_with_timeout(self, task_prompt, task, timeout, extra):
+            return ""
+
+    with pytest.raises(RuntimeError, match="_execute_with_timeout"):
+        check_crewai_timeout_hook(ChangedAgent)
+
+
+def test_failure_keeps_original_exception():
+    agent = ContextAgent(role="r", goal="g", backstory="b")
+
+    def fail(task_prompt, task):
+        raise KeyError("chiave")
+
+    object.__setattr__(agent, "_execute_without_timeout", fail)
+    task = type("T", (), {"description": "d"})()
+    with pytest.raises(RuntimeError) as excinfo:
+        agent._execute_with_timeout("prompt", task, timeout=5)
+    assert isinstance(excinfo.value.__cause__, KeyError)
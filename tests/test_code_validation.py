@@ -0,0 +1,33 @@
+"""Validazione locale del codice generato."""
+import shutil
+
+from utils import code_validation
+from utils.code_validation import CodeValidator, detect_linter
+
+
+def test_detect_linter_prefers_ruff(monkeypatch):
+    installed = {"ruff", "pyflakes"}
+    monkeypatch.setattr(shutil, "which", lambda name: f"/usr/bin/{name}" if name in installed else None)
+    assert detect_linter() == "ruff check --quiet"
+    installed.discard("ruff")
+    assert detect_linter() == "pyflakes"
+    installed.clear()
+    assert detect_linter() is None
+
+
+def test_validator_uses_detected_linter_unless_disabled(monkeypatch):
+    monkeypatch.setattr(code_validation, "detect_linter", lambda: "pyflakes")
+    assert CodeValidator().linter == "pyflakes"
+    assert CodeValidator(linter="").linter == ""
+    assert CodeValidator(linter="ruff check").linter == "ruff check"
+
+
+def test_validator_pool_reports_syntax_errors():
+    with CodeValidator(linter="") as validator:
+        results = validator.validate_many({
+            "ok": "```python\nx = 1\n```",
+            "ko": "```python\nx = (\n```",
+        })
+    assert results["ok"].ok and not results["ok"].conclusive
+    assert not results["ko"].ok
+    assert "errore di sintassi" in results["ko"].diagnostics[0]
@@ -0,0 +1,15 @@
+"""Job, priorità ed eventi della run raggiungono le chiamate LLM nel thread del timeout di CrewAI."""
+import asyncio
+
+from benchmarks.context_propagation import run_case
+from benchmarks.fake_ollama import FakeOllama
+from llm.local_llm_tool import LocalLLMTool
+from utils.async_crew import ContextAgent
+
+
+def test_context_agent_propagates_request_context():
+    with FakeOllama(models=["phi4"], reply="ok") as server:
+        tool = LocalLLMTool(model="ollama/phi4", base_url=server.url, temperature=0, coalesce=False)
+        result = asyncio.run(run_case(ContextAgent, tool))
+    assert set(result["priorities"]) == {"interactive"}
+    assert result["llm_call"] >= 1
@@ -0,0 +1,75 @@
+"""EndpointPool contro più server Ollama finti (stessi controlli di ``benchmarks.endpoint_pool``)."""
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.endpoint_pool import MODEL, served
+from benchmarks.fake_ollama import FakeOllama
+from llm.endpoint_pool import EndpointPool, NoEndpointAvailable, detect_model_capabilities
+from llm.local_llm_tool import LocalLLMTool
+from llm.model_warmup import collect_warmup_targets
+
+
+@pytest.fixture
+def servers():
+    with FakeOllama(models=["phi4"], delay=0.2) as slow, \
+            FakeOllama(models=["phi4"], delay=0.02) as fast, \
+            FakeOllama(models=["gemma3"]) as other:
+        yield {"lento": slow, "veloce": fast, "altro": other}
+
+
+@pytest.fixture
+def pool(servers):
+    return EndpointPool([server.url for server in servers.values()], refresh_interval=3600)
+
+
+def _tool(pool: EndpointPool) -> LocalLLMTool:
+    return LocalLLMTool(model=MODEL, endpoint_pool=pool, temperature=0, coalesce=False)
+
+
+def test_filters_endpoints_by_model(servers, pool):
+    available = sorted(ep.base_url for ep in pool.endpoints_for(MODEL))
+    assert available == sorted([servers["lento"].url, servers["veloce"].url])
+    assert [ep.base_url for ep in pool.endpoints_for("ollama/gemma3")] == [servers["altro"].url]
+
+
+def test_warmup_only_where_model_is_available(servers, pool, tmp_path):
+    agents_yaml = tmp_path / "agents.yaml"
+    agents_yaml.write_text("verificatore:\n  role: r\n  goal: g\n  backstory: b\n  llm: small_llm\n", encoding="utf-8")
+    targets = collect_warmup_targets({"small_llm": _tool(pool)}, [agents_yaml])
+    assert sorted(t.base_url for t in targets) == sorted([servers["lento"].url, servers["veloce"].url])
+
+
+def test_least_outstanding_favours_fast_endpoint(servers, pool):
+    tool = _tool(pool)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda i: tool.run(f"richiesta {i}"), range(40)))
+    counts = {name: served(server) for name, server in servers.items()}
+    assert counts["altro"] == 0
+    assert counts["veloce"] > counts["lento"]
+
+
+def test_unhealthy_endpoint_leaves_and_rejoins_pool(servers, pool):
+    slow = servers["lento"]
+    tool = _tool(pool)
+    slow.healthy = False
+    pool.refresh(force=True)
+    assert slow.url not in [ep.base_url for ep in pool.endpoints_for(MODEL)]
+    before = served(slow)
+    for i in range(5):
+        tool.run(f"dopo il guasto {i}")
+    assert served(slow) == before
+
+    slow.healthy = True
+    pool.refresh(force=True)
+    assert slow.url in [ep.base_url for ep in pool.endpoints_for(MODEL)]
+
+
+def test_no_endpoint_for_unknown_model(pool):
+    with pytest.raises(NoEndpointAvailable):
+        pool.acquire("ollama/mistral")
+
+
+def test_detect_model_capabilities(servers):
+    capabilities = detect_model_capabilities([servers["veloce"].url, servers["altro"].url])
+    assert set(capabilities) == {"ollama/phi4:latest", "ollama/gemma3:latest"}
@@ -0,0 +1,40 @@
+"""Backend ``huggingface`` con batching dinamico su un GPT-2 minuscolo creato offline."""
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("tokenizers")
+
+from benchmarks.hf_batching import CORPUS, build_tiny_model, run_batch  # noqa: E402
+from llm.local_llm_tool import LocalLLMTool  # noqa: E402
+
+REQUESTS = 12
+
+
+@pytest.fixture(scope="module")
+def tiny_model(tmp_path_factory):
+    return build_tiny_model(tmp_path_factory.mktemp("hf") / "tiny", layers=1, hidden=64)
+
+
+def _tool(model_dir, batch_size: int) -> LocalLLMTool:
+    return LocalLLMTool(
+        model=str(model_dir),
+        backend="huggingface",
+        temperature=0,
+        coalesce=False,
+        max_new_tokens=8,
+        hf_max_batch_size=batch_size,
+        hf_batch_wait_ms=50,
+    )
+
+
+def test_batching_groups_requests_without_changing_outputs(tiny_model):
+    prompts = [f"{CORPUS[i % len(CORPUS)]} Richiesta {i}." for i in range(REQUESTS)]
+    sequential = run_batch(_tool(tiny_model, 1), prompts, concurrency=REQUESTS)
+    batched_tool = _tool(tiny_model, 4)
+    batched = run_batch(batched_tool, prompts, concurrency=REQUESTS)
+
+    assert batched["outputs"] == sequential["outputs"]
+    stats = batched_tool.batching_stats()
+    assert stats["requests"] == REQUESTS
+    assert stats["batches"] < REQUESTS
@@ -0,0 +1,69 @@
+"""Lease, scadenza e ripresa dei job nella coda SQLite."""
+import time
+
+import pytest
+
+from orchestrator.job_queue import DONE, FAILED, QUEUED, RUNNING, JobQueue
+
+LEASE = 0.05
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(tmp_path / "jobs.db")
+
+
+def test_expired_lease_is_reclaimed_by_another_worker(queue):
+    job = queue.submit({"title": "Articolo"})
+    first = queue.claim_next("w1", lease_seconds=LEASE)
+    assert first.id == job.id and first.attempts == 1
+    assert queue.claim_next("w2", lease_seconds=LEASE) is None
+
+    time.sleep(LEASE * 2)
+    second = queue.claim_next("w2", lease_seconds=60)
+    assert second.id == job.id
+    assert second.worker_id == "w2" and second.attempts == 2
+
+    # Il worker che ha perso il lease non può più rinnovarlo né chiudere il job
+    assert not queue.heartbeat(job.id, "w1")
+    assert not queue.complete(job.id, "articolo.md", worker_id="w1")
+    assert queue.get(job.id).status == RUNNING
+    assert queue.complete(job.id, "articolo.md", worker_id="w2")
+    assert queue.get(job.id).status == DONE
+
+
+def test_heartbeat_keeps_lease_alive(queue):
+    job = queue.submit({"title": "Articolo"})
+    queue.claim_next("w1", lease_seconds=LEASE)
+    for _ in range(3):
+        time.sleep(LEASE / 2)
+        assert queue.heartbeat(job.id, "w1", lease_seconds=LEASE)
+    assert queue.claim_next("w2", lease_seconds=LEASE) is None
+
+
+def test_job_fails_after_max_attempts(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.db", max_attempts=1)
+    job = queue.submit({"title": "Articolo"})
+    queue.claim_next("w1", lease_seconds=LEASE)
+    time.sleep(LEASE * 2)
+    assert queue.claim_next("w2") is None
+    failed = queue.get(job.id)
+    assert failed.status == FAILED
+    assert "lease scaduto" in failed.error
+
+
+def test_required_tags_match_capabilities_in_canonical_form(queue):
+    job = queue.submit({"title": "Articolo"}, required_tags=["ollama/phi4", "gpu"])
+    assert queue.claim_next("w1", capabilities=["ollama/phi4:latest"]) is None
+    assert queue.claim_next("w1", capabilities=["gpu", "ollama/phi4:latest"]).id == job.id
+
+
+def test_claim_order_priority_then_deadline(queue):
+    late = queue.submit({"title": "batch", "priority": "batch"})
+    normal = queue.submit({"title": "normale"})
+    urgent = queue.submit({"title": "scadenza", "deadline": time.time() + 60})
+    interactive = queue.submit({"title": "interattivo", "priority": "interactive"})
+    claimed = [queue.claim_next("w").id for _ in range(4)]
+    assert claimed == [interactive.id, urgent.id, normal.id, late.id]
+    assert queue.get(late.id).status == RUNNING
+    assert queue.list(status=QUEUED) == []
@@ -0,0 +1,37 @@
+"""Inserimento del codice generato al posto dei marker del writer."""
+from utils.markdown_utils import MarkdownUtils, _match_markers
+
+
+def _marker(instruction: str) -> str:
+    return f"[CODICE_RICHIESTO][START] {instruction} [END]"
+
+
+def test_match_markers_exact_then_similar_then_position():
+    instructions = ["Leggere un file CSV", "Calcolare la media", "Disegnare un grafico"]
+    markers = ["calcolare  la MEDIA", "Leggere il file CSV", "Qualcosa di diverso"]
+    assert _match_markers("S", markers, instructions) == [1, 0, 2]
+
+
+def test_match_markers_drops_unmatched_when_count_changed():
+    instructions = ["Leggere un file CSV", "Calcolare la media"]
+    assert _match_markers("S", ["Testo riscritto del tutto"], instructions) == [None]
+
+
+def test_inject_code_follows_instructions_after_reordering():
+    paragraph = f"Prima {_marker('Calcolare la media')} poi {_marker('Leggere un file CSV')}."
+    snippets = {"S": ["```python\nleggi()\n```", "```python\nmedia()\n```"]}
+    instructions = {"S": ["Leggere un file CSV", "Calcolare la media"]}
+    result = MarkdownUtils.inject_code(paragraph, "S", snippets, instructions)
+    assert result.index("media()") < result.index("leggi()")
+    assert "[CODICE_RICHIESTO]" not in result
+
+
+def test_inject_code_positional_without_instructions():
+    paragraph = f"A {_marker('uno')} B {_marker('due')}"
+    result = MarkdownUtils.inject_code(paragraph, "S", {"S": ["x = 1", "y = 2"]})
+    assert result == "A \nx = 1\n B \ny = 2"
+
+
+def test_inject_code_removes_markers_without_snippet():
+    paragraph = f"Testo {_marker('uno')} fine."
+    assert MarkdownUtils.inject_code(paragraph, "S", {}) == "Testo  fine."
@@ -0,0 +1,67 @@
+"""Ordine con cui il RequestScheduler assegna gli slot di un modello."""
+import threading
+import time
+from typing import List, Optional
+
+import pytest
+
+from llm.request_scheduler import RequestScheduler, request_context
+
+MODEL = "ollama/phi4"
+
+
+def _grant_order(scheduler: RequestScheduler, requests: List[tuple]) -> List[str]:
+    """Accoda ``requests`` (nome, job, priorità, scadenza) con lo slot occupato e ritorna l'ordine di assegnazione."""
+    order: List[str] = []
+
+    def _request(name: str, job_id: str, priority: str, deadline: Optional[float]) -> None:
+        with request_context(job_id, priority=priority, deadline=deadline):
+            with scheduler.slot(MODEL):
+                order.append(name)
+
+    threads = []
+    with scheduler.slot(MODEL):
+        for request in requests:
+            thread = threading.Thread(target=_request, args=request)
+            thread.start()
+            threads.append(thread)
+            # Arrivi distinti: a parità di chiave decide l'ordine di arrivo
+            while scheduler.stats()["models"][MODEL]["queue_depth"] < len(threads):
+                time.sleep(0.005)
+    for thread in threads:
+        thread.join(5)
+    return order
+
+
+def test_priority_then_deadline_then_arrival():
+    scheduler = RequestScheduler(default_limit=1, aging_seconds=0)
+    order = _grant_order(scheduler, [
+        ("batch", "j1", "batch", None),
+        ("normale", "j2", "normal", None),
+        ("normale-scadenza-lontana", "j3", "normal", time.time() + 600),
+        ("normale-scadenza-vicina", "j4", "normal", time.time() + 60),
+        ("interattivo", "j5", "interactive", None),
+    ])
+    assert order == ["interattivo", "normale-scadenza-vicina", "normale-scadenza-lontana", "normale", "batch"]
+
+
+def test_fair_share_prefers_less_served_job():
+    scheduler = RequestScheduler(default_limit=1, aging_seconds=0)
+    with request_context("servito"):
+        for _ in range(3):
+            with scheduler.slot(MODEL):
+                pass
+    order = _grant_order(scheduler, [("servito", "servito", "normal", None), ("nuovo", "nuovo", "normal", None)])
+    assert order == ["nuovo", "servito"]
+
+
+def test_per_model_limit_uses_canonical_names():
+    scheduler = RequestScheduler(default_limit=1, limits={"phi4": 3})
+    with scheduler.slot("ollama/phi4:latest"):
+        assert scheduler.stats()["models"]["ollama/phi4:latest"]["limit"] == 3
+
+
+def test_invalid_priority_is_rejected():
+    with pytest.raises(ValueError):
+        with request_context("job", priority="urgente"):
+            pass
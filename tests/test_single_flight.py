@@ -0,0 +1,80 @@
+"""Accorpamento delle richieste identiche in volo."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from llm.run_metrics import RunMetrics, current_run_metrics
+from llm.single_flight import SingleFlight, request_key
+
+
+def _wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condizione non raggiunta")
+        time.sleep(0.005)
+
+
+def _run_concurrently(flight: SingleFlight, func, callers: int):
+    """Avvia ``callers`` chiamate con la stessa chiave e sblocca ``func`` quando sono tutte in volo."""
+    release = threading.Event()
+
+    def leader():
+        release.wait(5)
+        return func()
+
+    executor = ThreadPoolExecutor(max_workers=callers)
+    futures = [executor.submit(flight.do, "k", leader, "m") for _ in range(callers)]
+    _wait_for(lambda: flight.stats().get("m", {}).get("coalesced") == callers - 1)
+    release.set()
+    executor.shutdown(wait=True)
+    return futures
+
+
+def test_concurrent_identical_calls_run_once():
+    flight = SingleFlight()
+    calls = []
+    futures = _run_concurrently(flight, lambda: calls.append(1) or "risposta", callers=5)
+    results = [future.result() for future in futures]
+    assert len(calls) == 1
+    assert [value for value, _ in results] == ["risposta"] * 5
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert flight.stats() == {"m": {"executed": 1, "coalesced": 4}}
+
+
+def test_error_is_shared_with_waiters():
+    flight = SingleFlight()
+
+    def fail():
+        raise RuntimeError("guasto")
+
+    futures = _run_concurrently(flight, fail, callers=3)
+    for future in futures:
+        with pytest.raises(RuntimeError, match="guasto"):
+            future.result()
+
+
+def test_completed_key_is_not_cached():
+    flight = SingleFlight()
+    assert flight.do("k", lambda: 1) == (1, False)
+    assert flight.do("k", lambda: 2) == (2, False)
+
+
+def test_counts_are_copied_to_active_run():
+    flight = SingleFlight()
+    run = RunMetrics()
+    token = current_run_metrics.set(run)
+    try:
+        flight.do("k", lambda: 1, label="m")
+    finally:
+        current_run_metrics.reset(token)
+    flight.do("k", lambda: 1, label="m")
+    assert flight.stats(run) == {"m": {"executed": 1, "coalesced": 0}}
+    assert flight.stats() == {"m": {"executed": 2, "coalesced": 0}}
+
+
+def test_request_key_ignores_argument_order():
+    assert request_key(model="a", prompt="p") == request_key(prompt="p", model="a")
+    assert request_key(model="a", prompt="p") != request_key(model="a", prompt="q")
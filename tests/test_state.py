@@ -0,0 +1,15 @@
+"""Compatibilità dello stato con gli state.json delle versioni precedenti."""
+from schema.state import ArticleState
+from utils.markdown_utils import MarkdownUtils
+
+
+def test_legacy_single_code_entries_become_lists():
+    state = ArticleState.model_validate({
+        "code_instructions": {"Intro": "Leggere un file CSV", "Analisi": ["Calcolare la media"]},
+        "code_snippets": {"Intro": "import csv"},
+    })
+    assert state.code_instructions == {"Intro": ["Leggere un file CSV"], "Analisi": ["Calcolare la media"]}
+    assert state.code_snippets == {"Intro": ["import csv"]}
+
+    paragraph = "Testo [CODICE_RICHIESTO][START] Leggere un file CSV [END]"
+    assert MarkdownUtils.inject_code(paragraph, "Intro", state.code_snippets, state.code_instructions) == "Testo \nimport csv"
@@ -0,0 +1,54 @@
+"""Parser tollerante degli output strutturati."""
+import pytest
+
+from utils.structured_output import (
+    REVIEW_REPORT_SCHEMA,
+    SECTION_LIST_SCHEMA,
+    StructuredOutputError,
+    parse_structured_output,
+    resolve_output_schema,
+)
+
+
+@pytest.mark.parametrize("text", [
+    '["Introduzione", "Conclusioni"]',
+    'Ecco le sezioni:\n```json\n["Introduzione", "Conclusioni"]\n```',
+    "Sezioni: ['Introduzione', 'Conclusioni'] come richiesto.",
+    '["Introduzione", "Conclusioni",]',
+    '{"sections": ["Introduzione", "Conclusioni"]}',
+    "1. Introduzione\n2. Conclusioni",
+    "- Introduzione\n- Conclusioni",
+])
+def test_section_list_variants(text):
+    assert parse_structured_output(text, SECTION_LIST_SCHEMA) == ["Introduzione", "Conclusioni"]
+
+
+def test_truncated_output_is_repaired():
+    text = '{"Introduzione": ["Troppo breve"], "Conclusioni": ["Manca un esem'
+    assert parse_structured_output(text, REVIEW_REPORT_SCHEMA) == {
+        "Introduzione": ["Troppo breve"],
+        "Conclusioni": ["Manca un esem"],
+    }
+
+
+def test_already_parsed_value_is_accepted():
+    assert parse_structured_output({"Fase 2": ["ok"]}, REVIEW_REPORT_SCHEMA) == {"Fase 2": ["ok"]}
+
+
+@pytest.mark.parametrize("text", ["", "nessuna sezione", "[]"])
+def test_non_conforming_output_raises(text):
+    with pytest.raises(StructuredOutputError):
+        parse_structured_output(text, SECTION_LIST_SCHEMA)
+
+
+def test_required_keys_are_enforced():
+    schema = {"type": "object", "properties": {"title": {"type": "string"}}, "required": ["title"]}
+    with pytest.raises(StructuredOutputError):
+        parse_structured_output('{"abstract": "x"}', schema)
+
+
+def test_resolve_output_schema():
+    assert resolve_output_schema("section_list") is SECTION_LIST_SCHEMA
+    assert resolve_output_schema(None) is None
+    with pytest.raises(ValueError):
+        resolve_output_schema("sconosciuto")
@@ -0,0 +1,131 @@
+"""Esecuzione delle crew fuori dall'event loop dei flow.
+
+CrewAI esegue i metodi sincroni dei flow direttamente sull'event loop, per cui
+un ``crew.kickoff`` bloccante ferma tutti gli altri flow sullo stesso loop.
+I metodi dei flow sono quindi coroutine che attendono :func:`kickoff_crew` /
+:func:`run_blocking`: le chiamate bloccanti (crew, LLM) girano in un pool di
+thread limitato e condiviso, con il contesto corrente copiato (il log eventi
+della run in :data:`utils.run_events.current_run_events` resta visibile).
+
+La dimensione del pool si imposta con ``BLOGWRITER_CREW_THREADS`` (default 16):
+limita le crew in esecuzione contemporanea in tutto il processo, mentre la
+concorrenza verso i modelli resta governata dal limiter di ``llm.concurrency``
+(nel servizio, lo scheduler di ``llm.request_scheduler``).
+
+Gli agenti con ``max_execution_time`` (tutti quelli dei ``tasks.yaml`` con
+``timeout``) vengono eseguiti da CrewAI in un thread proprio, creato senza
+copiare il contesto: :class:`ContextAgent` lo propaga, così job, priorità e
+scadenza (``llm.request_scheduler``) e il log eventi della run raggiungono
+anche le chiamate LLM fatte in quel thread. :class:`ContextAgent` sostituisce un
+metodo privato di CrewAI: all'import :func:`check_crewai_timeout_hook` verifica
+che la sua firma e il suo uso non siano cambiati e solleva un errore se lo sono.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import os
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Mapping, Optional, TypeVar
+
+from crewai import Agent
+
+from utils.profiling import current_profiler
+
+T = TypeVar("T")
+
+CREW_THREADS = int(os.environ.get("BLOGWRITER_CREW_THREADS", "16"))
+
+_CREW_EXECUTOR = ThreadPoolExecutor(max_workers=max(1, CREW_THREADS), thread_name_prefix="crew")
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Esegue ``func`` nel pool delle crew e ne attende il risultato senza bloccare il loop."""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    profiler = current_profiler.get()
+    if profiler is not None:
+        func = functools.partial(profiler.run_in_thread, func)
+    return await loop.run_in_executor(_CREW_EXECUTOR, functools.partial(context.run, func, *args, **kwargs))
+
+
+async def kickoff_crew(crew: Any, inputs: Optional[Mapping[str, Any]] = None) -> Any:
+    """Equivalente asincrono di ``crew.kickoff(inputs=...)`` sul pool limitato.
+
+    A differenza di ``Crew.kickoff_async`` (``asyncio.to_thread`` sul pool di
+    default del loop) il numero di crew in volo è limitato da ``CREW_THREADS``.
+    """
+    return await run_blocking(crew.kickoff, inputs=dict(inputs) if inputs is not None else None)
+
+
+# Firme dei metodi privati di CrewAI su cui si basa ContextAgent (verificate con crewai 0.120)
+_UPSTREAM_SIGNATURES = {
+    "_execute_with_timeout": ["self", "task_prompt", "task", "timeout"],
+    "_execute_without_timeout": ["self", "task_prompt", "task"],
+}
+
+
+def check_crewai_timeout_hook(agent_cls: type = Agent) -> None:
+    """Verifica che ``agent_cls`` esponga ancora i metodi privati sostituiti da :class:`ContextAgent`.
+
+    Solleva ``RuntimeError`` se un metodo manca o ha parametri diversi, o se
+    ``execute_task`` non chiama più ``_execute_with_timeout``: in quel caso
+    l'override verrebbe ignorato senza errori e il contesto non si propagherebbe.
+    """
+    for name, expected in _UPSTREAM_SIGNATURES.items():
+        method = getattr(agent_cls, name, None)
+        params = list(inspect.signature(method).parameters) if callable(method) else None
+        if params != expected:
+            raise RuntimeError(
+                f"CrewAI {name} non è più compatibile con ContextAgent: parametri {params}, attesi {expected}. "
+                "Aggiornare utils.async_crew.ContextAgent."
+            )
+    try:
+        source = inspect.getsource(agent_cls.execute_task)
+    except (OSError, TypeError):
+        # Sorgente non disponibile (es. bytecode soltanto): si verifica solo la firma
+        return
+    if "_execute_with_timeout" not in source:
+        raise RuntimeError(
+            "CrewAI Agent.execute_task non chiama più _execute_with_timeout: aggiornare utils.async_crew.ContextAgent."
+        )
+
+
+check_crewai_timeout_hook()
+
+
+class ContextAgent(Agent):
+    """``Agent`` che esegue i task con timeout nel contesto del chiamante.
+
+    Replica ``Agent._execute_with_timeout`` di CrewAI sottomettendo
+    l'esecuzione tramite ``contextvars.copy_context().run``. Allo scadere del
+    timeout il thread non viene atteso (``shutdown(wait=False)``): la crew
+    riceve subito il ``TimeoutError``.
+
+    Il thread scaduto non si può interrompere: prosegue l'esecuzione
+    dell'agente in background, comprese eventuali altre chiamate LLM, e durante
+    ogni chiamata (al più ``request_timeout`` del tool) tiene occupati lo slot
+    del modello (``llm.concurrency`` / ``llm.request_scheduler``) e quello dello
+    scheduler di affinità. Con timeout frequenti conviene quindi alzare
+    ``timeout`` nei ``tasks.yaml`` o abbassare ``--llm_timeout``.
+    """
+
+    def _execute_with_timeout(self, task_prompt: str, task: Any, timeout: int) -> str:
+        context = contextvars.copy_context()
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="agent")
+        future = executor.submit(context.run, self._execute_without_timeout, task_prompt=task_prompt, task=task)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutError(
+                f"Task '{task.description}' execution timed out after {timeout} seconds. "
+                "Consider increasing max_execution_time or optimizing the task."
+            )
+        except Exception as e:
+            raise RuntimeError(f"Task execution failed: {str(e)}") from e
+        finally:
+            executor.shutdown(wait=False)
@@ -0,0 +1,316 @@
+"""Validazione locale del codice generato, prima della revisione LLM.
+
+Per ogni blocco Python racchiuso tra fence Markdown:
+
+1. ``ast.parse`` per gli errori di sintassi;
+2. un linter configurabile; di default il primo installato tra ``ruff`` e
+   ``pyflakes`` (vedi :func:`detect_linter`);
+3. opzionalmente l'esecuzione in un sottoprocesso con timeout e limiti di
+   risorse, solo per snippet di puro calcolo (vedi :func:`is_safe_to_execute`).
+
+L'esecuzione (``execute=True``, ``--execute_code``) è disattivata di default e
+va attivata solo su host usa-e-getta. Lo snippet deve passare un'allowlist
+statica: importa solo moduli di calcolo della libreria standard (nessun
+``io``/``os``/rete) e non usa accesso dinamico ad attributi o builtin
+(``getattr``, ``__builtins__``, dunder...). Nel figlio, poi, un audit hook
+(PEP 578) blocca scritture, letture fuori dall'installazione di Python,
+sottoprocessi, socket e ``ctypes``, e i limiti del kernel (``RLIMIT_FSIZE=0``,
+``RLIMIT_NPROC=0``) impediscono di scrivere file e creare processi. Non è
+l'isolamento di un container (stesso utente, rete non separata dal kernel).
+
+La revisione LLM può essere saltata solo se il risultato è conclusivo (vedi
+:attr:`CodeValidationResult.conclusive`): la sola ``ast.parse`` non basta.
+Altrimenti le diagnostiche vengono passate al reviewer. Le validazioni girano in un pool di processi, così
+più sezioni si controllano in parallelo senza bloccare il GIL del flow. I processi
+partono con ``forkserver`` (``spawn`` dove non è disponibile): il flow è
+multithread e un ``fork`` copierebbe lock tenuti da altri thread.
+"""
+from __future__ import annotations
+
+import ast
+import multiprocessing
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Mapping, Optional, Tuple
+
+PYTHON_LANGUAGES = {"", "python", "py", "python3"}
+# Linter provati in ordine da :func:`detect_linter`
+DEFAULT_LINTERS = ("ruff check --quiet", "pyflakes")
+MAX_DIAGNOSTICS = 20
+
+_FENCE_RE = re.compile(r"```([\w+-]*)[^\n]*\n(.*?)```", re.DOTALL)
+
+# Solo snippet che importano questi moduli (puro calcolo, niente I/O) vengono eseguiti
+ALLOWED_MODULES = {
+    "abc", "array", "bisect", "cmath", "collections", "contextlib", "copy", "dataclasses", "datetime",
+    "decimal", "enum", "fractions", "functools", "heapq", "itertools", "json", "math", "numbers",
+    "operator", "pprint", "random", "re", "statistics", "string", "textwrap", "time", "typing",
+}
+# Builtin che aprono file, leggono input o aggirano l'analisi statica (accesso dinamico)
+FORBIDDEN_NAMES = {
+    "open", "input", "exec", "eval", "compile", "__import__", "breakpoint", "help", "exit", "quit",
+    "getattr", "setattr", "delattr", "globals", "locals", "vars", "memoryview", "__builtins__",
+}
+# Dunder ammessi: ``if __name__ == "__main__"`` e ``super().__init__()``
+ALLOWED_DUNDERS = {"__name__", "__init__"}
+
+# Eseguito nel figlio prima dello snippet: l'audit hook non si può più rimuovere
+_SANDBOX_BOOTSTRAP = """
+import sys
+code = open("snippet.py", encoding="utf-8").read()
+roots = tuple({sys.prefix, sys.base_prefix, sys.exec_prefix, sys.base_exec_prefix})
+blocked = ("subprocess.", "os.system", "os.exec", "os.posix_spawn", "os.spawn", "os.fork", "os.forkpty",
+           "os.kill", "os.remove", "os.rename", "os.rmdir", "os.mkdir", "os.chmod", "os.chown",
+           "os.link", "os.symlink", "os.truncate", "os.putenv", "os.unsetenv", "shutil.", "socket.",
+           "ctypes.", "webbrowser.", "urllib.", "sqlite3.", "pty.", "os.chdir")
+
+def guard(event, args):
+    if event.startswith(blocked):
+        raise PermissionError(f"operazione non consentita nello snippet: {event}")
+    if event in ("os.listdir", "os.scandir") and not str(args[0]).startswith(roots):
+        # Il sistema di import elenca solo le directory di sys.path
+        raise PermissionError(f"accesso alla directory non consentito nello snippet: {args[0]}")
+    if event == "open":
+        path, mode = args[0], args[1] or "r"
+        writing = isinstance(mode, str) and any(flag in mode for flag in "wax+")
+        if writing or (isinstance(mode, int) and mode & 3) or not str(path).startswith(roots):
+            raise PermissionError(f"accesso al file non consentito nello snippet: {path}")
+
+sys.addaudithook(guard)
+del guard
+exec(compile(code, "snippet.py", "exec"), {"__name__": "__main__"})
+"""
+
+
+@dataclass
+class CodeValidationResult:
+    ok: bool
+    diagnostics: List[str] = field(default_factory=list)
+    blocks: int = 0
+    executed: bool = False
+    seconds: float = 0.0
+    linted: bool = False
+
+    @property
+    def conclusive(self) -> bool:
+        """``ok`` confermato dal linter (eseguito su ogni blocco) o dall'esecuzione, non dalla sola sintassi."""
+        return self.ok and (self.linted or self.executed)
+
+    def report(self) -> str:
+        """Diagnostiche in forma di elenco, da inserire nel prompt del reviewer."""
+        if not self.diagnostics:
+            if not self.conclusive:
+                return "Sintassi corretta; il codice non è stato verificato da un linter né eseguito."
+            return "Nessun problema rilevato dalla validazione automatica."
+        return "\n".join(f"- {line}" for line in self.diagnostics[:MAX_DIAGNOSTICS])
+
+
+def extract_code_blocks(text: str) -> List[Tuple[str, str]]:
+    """Coppie ``(linguaggio, codice)`` dei blocchi fenced; senza fence il testo è un unico blocco Python."""
+    blocks = [(lang.lower(), code) for lang, code in _FENCE_RE.findall(text or "")]
+    if not blocks and (text or "").strip():
+        blocks = [("python", text)]
+    return blocks
+
+
+def is_safe_to_execute(tree: ast.AST) -> bool:
+    """Allowlist statica: solo moduli di :data:`ALLOWED_MODULES` e nessun accesso dinamico.
+
+    Rifiuta i nomi di :data:`FORBIDDEN_NAMES`, i dunder diversi da
+    :data:`ALLOWED_DUNDERS` e gli attributi privati (``_x``) di oggetti diversi
+    da ``self``/``cls``, con cui si raggiungono moduli e builtin non ammessi.
+    """
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            if any(alias.name.split(".")[0] not in ALLOWED_MODULES for alias in node.names):
+                return False
+        elif isinstance(node, ast.ImportFrom):
+            if node.level != 0 or (node.module or "").split(".")[0] not in ALLOWED_MODULES:
+                return False
+        elif isinstance(node, ast.Name):
+            if node.id in FORBIDDEN_NAMES or (node.id.startswith("__") and node.id not in ALLOWED_DUNDERS):
+                return False
+        elif isinstance(node, ast.Attribute):
+            attr = node.attr
+            if attr.startswith("__") and attr.endswith("__") and attr not in ALLOWED_DUNDERS:
+                return False
+            if attr.startswith("_") and not (isinstance(node.value, ast.Name) and node.value.id in {"self", "cls"}):
+                return False
+    return True
+
+
+def _limit_resources(timeout: float, memory_mb: int) -> None:  # pragma: no cover - gira nel figlio
+    import resource
+
+    resource.setrlimit(resource.RLIMIT_CPU, (int(timeout) + 1, int(timeout) + 1))
+    limit = memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    # Nessun file scritto e nessun nuovo processo, qualunque sia la via usata
+    resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+
+def detect_linter() -> Optional[str]:
+    """Primo comando di :data:`DEFAULT_LINTERS` il cui eseguibile è installato; ``None`` se nessuno."""
+    return next((linter for linter in DEFAULT_LINTERS if shutil.which(shlex.split(linter)[0])), None)
+
+
+def _pool_context() -> multiprocessing.context.BaseContext:
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def _run_linter(linter: str, code: str) -> Optional[List[str]]:
+    """Diagnostiche del linter; ``None`` se non è stato eseguito (non installato o in timeout)."""
+    command = shlex.split(linter)
+    if not command or shutil.which(command[0]) is None:
+        return None
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "snippet.py")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(code)
+        try:
+            completed = subprocess.run(command + [path], capture_output=True, text=True, timeout=30)
+        except subprocess.TimeoutExpired:
+            return None
+    if completed.returncode == 0:
+        return []
+    output = (completed.stdout or completed.stderr).replace(path, "snippet.py")
+    lines = [f"lint: {line.strip()}" for line in output.splitlines() if line.strip()][:MAX_DIAGNOSTICS]
+    return lines or [f"lint: uscita con codice {completed.returncode}"]
+
+
+def _execute(code: str, timeout: float, memory_mb: int) -> Tuple[bool, List[str]]:
+    """Esegue ``code`` in un interprete con audit hook e limiti di risorse; ritorna ``(eseguito, diagnostiche)``."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with open(os.path.join(tmp_dir, "snippet.py"), "w", encoding="utf-8") as file:
+            file.write(code)
+        env = {"PATH": os.environ.get("PATH", ""), "MPLBACKEND": "Agg", "PYTHONHASHSEED": "0"}
+        preexec = (lambda: _limit_resources(timeout, memory_mb)) if os.name == "posix" else None
+        try:
+            completed = subprocess.run(
+                [sys.executable, "-I", "-c", _SANDBOX_BOOTSTRAP],
+                cwd=tmp_dir,
+                env=env,
+                capture_output=True,
+                text=True,
+                timeout=timeout,
+                preexec_fn=preexec,
+            )
+        except subprocess.TimeoutExpired:
+            # Codice lento o interattivo: non è un errore, semplicemente non verificabile
+            return False, []
+    if completed.returncode == 0:
+        return True, []
+    stderr = completed.stderr.strip().splitlines()
+    if stderr and stderr[-1].startswith("ModuleNotFoundError"):
+        # Dipendenza assente in questo ambiente: non dice nulla sulla correttezza dello snippet
+        return False, []
+    return True, [f"esecuzione: {line}" for line in stderr[-8:]]
+
+
+def validate_snippet(
+    snippet: str,
+    linter: Optional[str] = None,
+    execute: bool = False,
+    timeout: float = 10.0,
+    memory_mb: int = 512,
+) -> CodeValidationResult:
+    """Valida tutti i blocchi Python di ``snippet``; funzione top-level per il pool di processi."""
+    started = time.perf_counter()
+    blocks = [code for lang, code in extract_code_blocks(snippet) if lang in PYTHON_LANGUAGES]
+    if not blocks:
+        return CodeValidationResult(ok=False, diagnostics=["Nessun blocco di codice Python trovato."])
+
+    diagnostics: List[str] = []
+    executed = False
+    linted = bool(linter)
+    for index, code in enumerate(blocks, start=1):
+        prefix = f"blocco {index}: " if len(blocks) > 1 else ""
+        try:
+            tree = ast.parse(code)
+        except SyntaxError as exc:
+            diagnostics.append(f"{prefix}errore di sintassi alla riga {exc.lineno}: {exc.msg}")
+            continue
+        lint = _run_linter(linter, code) if linter else None
+        linted = linted and lint is not None
+        diagnostics.extend(prefix + line for line in lint or [])
+        if execute and is_safe_to_execute(tree):
+            ran, errors = _execute(code, timeout, memory_mb)
+            executed = executed or ran
+            diagnostics.extend(prefix + line for line in errors)
+
+    return CodeValidationResult(
+        ok=not diagnostics,
+        diagnostics=diagnostics,
+        blocks=len(blocks),
+        executed=executed,
+        seconds=round(time.perf_counter() - started, 3),
+        linted=linted,
+    )
+
+
+class CodeValidator:
+    """Pool di processi che esegue :func:`validate_snippet`.
+
+    Parameters
+    ----------
+    linter:
+        Comando del linter (il path del file viene aggiunto in coda), es.
+        ``"ruff check --quiet"``; ignorato se l'eseguibile non è installato.
+        ``None`` usa :func:`detect_linter`, la stringa vuota disattiva il linter.
+    execute:
+        Esegue gli snippet che lo consentono in un sottoprocesso isolato.
+    timeout:
+        Secondi massimi di esecuzione per blocco.
+    max_workers:
+        Processi del pool; di default quelli di :class:`ProcessPoolExecutor`.
+    """
+
+    def __init__(
+        self,
+        linter: Optional[str] = None,
+        execute: bool = False,
+        timeout: float = 10.0,
+        memory_mb: int = 512,
+        max_workers: Optional[int] = None,
+    ) -> None:
+        self.linter = detect_linter() if linter is None else linter
+        self.execute = execute
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def submit(self, snippet: str) -> Future:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=_pool_context())
+        return self._executor.submit(validate_snippet, snippet, self.linter, self.execute, self.timeout, self.memory_mb)
+
+    def validate(self, snippet: str) -> CodeValidationResult:
+        return self.submit(snippet).result()
+
+    def validate_many(self, snippets: Mapping[str, str]) -> Dict[str, CodeValidationResult]:
+        """Valida più snippet in parallelo; le chiavi sono conservate."""
+        futures = {key: self.submit(snippet) for key, snippet in snippets.items()}
+        return {key: future.result() for key, future in futures.items()}
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def __enter__(self) -> "CodeValidator":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
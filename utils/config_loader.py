@@ -1,9 +1,13 @@
 import os
+import re
 import sys
+import json
 import yaml
 import importlib
 import inspect
-from typing import Dict
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
 from crewai import Agent, Task, Crew, Process
 from pathlib import Path
 
@@ -12,6 +16,10 @@ if str(ROOT_DIR) not in sys.path:
     sys.path.append(str(ROOT_DIR))
 
 from llm.local_llm_tool import LocalLLMTool
+from llm.model_router import RoutedLLMAdapter, compile_routing
+from llm.model_warmup import DEFAULT_KEEP_ALIVE
+from utils.async_crew import ContextAgent
+from utils.structured_output import resolve_output_schema
 
 DEFAULT_AGENT_REGISTRY = {
     "local_chatollama": LocalLLMTool(model='ollama/gpt-oss:20b',
@@ -19,44 +27,229 @@ DEFAULT_AGENT_REGISTRY = {
                                       top_p=0.9,
                                       top_k=60,
                                       repeat_penalty=1.1,
-                                      num_ctx=4096),
+                                      num_ctx=4096,
+                                      keep_alive=DEFAULT_KEEP_ALIVE),
     "code_llm": LocalLLMTool(model='ollama/deepseek-coder:33b',
                               temperature=0.2,
                               top_p=0.8,
                               top_k=50,
                               repeat_penalty=1.1,
-                              num_ctx=4096),
+                              num_ctx=4096,
+                              keep_alive=DEFAULT_KEEP_ALIVE),
     "code_comment_llm": LocalLLMTool(model='ollama/deepseek-coder:33b',
                                       temperature=0.4,
                                       top_p=0.9,
                                       top_k=50,
                                       repeat_penalty=1.1,
-                                      num_ctx=4096)
+                                      num_ctx=4096,
+                                      keep_alive=DEFAULT_KEEP_ALIVE),
+    # Tier economico per i task con input brevi (vedi ``routing`` in tasks.yaml)
+    "small_llm": LocalLLMTool(model='ollama/phi4',
+                               temperature=0.5,
+                               top_p=0.9,
+                               top_k=40,
+                               repeat_penalty=1.1,
+                               num_ctx=4096,
+                               keep_alive=DEFAULT_KEEP_ALIVE),
+    # Riassunto delle sezioni (utils.context_summarizer_crew.SUMMARIZER_LLM)
+    "summarizer_llm": LocalLLMTool(model='ollama/phi4',
+                                    temperature=0.5,
+                                    keep_alive=DEFAULT_KEEP_ALIVE)
 }
 
+CREWS_DIR = ROOT_DIR / "crews"
+# Bundle compilato su disco: evita di rileggere e rivalidare gli YAML a ogni avvio di processo
+CONFIG_CACHE_PATH = Path(os.environ.get("BLOGWRITER_CONFIG_CACHE", ROOT_DIR / ".cache" / "crew_config.json"))
+CONFIG_CACHE_VERSION = 2
+
+AGENT_REQUIRED_FIELDS = {"role", "goal", "backstory"}
+TASK_REQUIRED_FIELDS = {"description", "expected_output", "agent"}
+_PLACEHOLDER_RE = re.compile(r"(?<!\{)\{(\w+)\}(?!\})")
+
+
 def load_yaml(path: str) -> Dict:
     with open(path, 'r', encoding='utf-8') as file:
         return yaml.safe_load(file)
 
 def camel_to_snake(name):
-    import re
     s1 = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', name)
     return re.sub('([a-z0-9])([A-Z])', r'\1_\2', s1).lower()
 
-def load_tools(agents_yaml_path: str):
-    agents = load_yaml(agents_yaml_path)
-    tool_names = {tool for ag in agents.values() for tool in ag.get("tools", [])}
+
+# ---------- Configurazione compilata ----------
+
+@dataclass(frozen=True)
+class CrewConfig:
+    """Configurazione validata di una crew, con le ancore YAML già risolte.
+
+    ``agents`` contiene solo gli agenti istanziabili (i profili riusabili sono
+    scartati), ``tasks`` ha ``output_schema`` già risolto in JSON Schema.
+    """
+    agents_path: str
+    tasks_path: str
+    agents: Dict[str, Dict[str, Any]]
+    tasks: Dict[str, Dict[str, Any]]
+    tools: Tuple[str, ...]
+
+
+_compiled_files: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+_compiled_lock = threading.Lock()
+_tool_classes: Dict[str, type] = {}
+
+
+def _file_signature(path: str | Path) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def compile_agents(raw_agents: Dict[str, Any], source: str = "") -> Dict[str, Dict[str, Any]]:
+    """Valida gli agenti di un ``agents.yaml`` già letto; scarta i profili riusabili."""
+    if not isinstance(raw_agents, dict):
+        raise ValueError(f"{source}: atteso un dizionario di agenti.")
+    agents = {}
+    for key, data in raw_agents.items():
+        # I blocchi senza role/goal/backstory sono profili riusabili (ancore YAML), non agenti
+        if not isinstance(data, dict) or not AGENT_REQUIRED_FIELDS.issubset(data):
+            continue
+        if not isinstance(data.get("llm", "local_chatollama"), str):
+            raise ValueError(f"{source}: 'llm' dell'agente '{key}' deve essere una chiave del registry.")
+        tools = data.get("tools", [])
+        if not isinstance(tools, list) or not all(isinstance(tool, str) for tool in tools):
+            raise ValueError(f"{source}: 'tools' dell'agente '{key}' deve essere una lista di nomi.")
+        agents[key] = dict(data)
+    if not agents:
+        raise ValueError(f"{source}: nessun agente con {sorted(AGENT_REQUIRED_FIELDS)}.")
+    return agents
+
+
+def compile_tasks(raw_tasks: Dict[str, Any], source: str = "") -> Dict[str, Dict[str, Any]]:
+    """Valida i task di un ``tasks.yaml`` già letto e risolve ``output_schema``."""
+    if not isinstance(raw_tasks, dict):
+        raise ValueError(f"{source}: atteso un dizionario di task.")
+    tasks = {}
+    schemas: Dict[str, tuple] = {}
+    for key, data in raw_tasks.items():
+        if not isinstance(data, dict):
+            raise ValueError(f"{source}: il task '{key}' non è un dizionario.")
+        missing = TASK_REQUIRED_FIELDS - set(data)
+        if missing:
+            raise ValueError(f"{source}: al task '{key}' mancano i campi {sorted(missing)}.")
+        if data.get("timeout") is not None and (not isinstance(data["timeout"], (int, float)) or data["timeout"] <= 0):
+            raise ValueError(f"{source}: 'timeout' del task '{key}' deve essere un numero di secondi positivo.")
+        if data.get("inputs") is not None:
+            placeholders = set(_PLACEHOLDER_RE.findall(data["description"] + data["expected_output"]))
+            undeclared = placeholders - set(data["inputs"])
+            if undeclared:
+                raise ValueError(f"{source}: il task '{key}' usa {sorted(undeclared)} senza dichiararli in 'inputs'.")
+        task = dict(data)
+        task["output_schema"] = resolve_output_schema(data.get("output_schema"))
+        if data.get("routing") is not None:
+            task["routing"] = compile_routing(data["routing"], source, key)
+        # Il vincolo di output è dell'agente: tutti i suoi task devono dichiarare lo stesso schema
+        previous = schemas.setdefault(data["agent"], (key, task["output_schema"]))
+        if previous[1] != task["output_schema"]:
+            raise ValueError(
+                f"{source}: l'agente '{data['agent']}' serve i task '{previous[0]}' e '{key}' con output_schema diversi."
+            )
+        tasks[key] = task
+    return tasks
+
+
+def _compiled(path: str | Path, compiler: Callable[[Dict[str, Any], str], Dict[str, Any]]) -> Dict[str, Any]:
+    """YAML letto e validato una sola volta finché il file non cambia (mtime e dimensione)."""
+    key = str(Path(path).resolve())
+    signature = _file_signature(key)
+    with _compiled_lock:
+        cached = _compiled_files.get(key)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    compiled = compiler(load_yaml(key), key)
+    with _compiled_lock:
+        _compiled_files[key] = (signature, compiled)
+    return compiled
+
+
+def compile_crew_config(agents_path: str | Path, tasks_path: str | Path) -> CrewConfig:
+    """Agenti e task di una crew, validati anche nei riferimenti incrociati."""
+    agents = _compiled(agents_path, compile_agents)
+    tasks = _compiled(tasks_path, compile_tasks)
+    for key, data in tasks.items():
+        if data["agent"] not in agents:
+            raise ValueError(f"{tasks_path}: il task '{key}' usa l'agente sconosciuto '{data['agent']}'.")
+    tools = tuple(sorted({tool for agent in agents.values() for tool in agent.get("tools", [])}))
+    return CrewConfig(str(agents_path), str(tasks_path), agents, tasks, tools)
+
+
+def load_config_bundle(crews_dir: str | Path = CREWS_DIR, cache_path: Optional[str | Path] = CONFIG_CACHE_PATH) -> Dict[str, CrewConfig]:
+    """Compila e valida in un colpo solo le configurazioni di tutte le crew.
+
+    Il risultato resta in memoria (chiave: mtime e dimensione dei file) e,
+    con ``cache_path``, viene salvato su disco: un nuovo processo con gli
+    stessi YAML lo ricarica senza rileggerli. Qualsiasi errore di
+    configurazione emerge qui, all'avvio, invece che a metà run.
+    """
+    crews_dir = Path(crews_dir)
+    pairs = {
+        entry.name: (entry / "agents.yaml", entry / "tasks.yaml")
+        for entry in sorted(crews_dir.iterdir())
+        if (entry / "agents.yaml").is_file() and (entry / "tasks.yaml").is_file()
+    }
+    files = {str(path.resolve()): _file_signature(path) for pair in pairs.values() for path in pair}
+
+    cached = None
+    if cache_path is not None and Path(cache_path).is_file():
+        try:
+            cached = json.loads(Path(cache_path).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            cached = None
+    if cached and cached.get("version") == CONFIG_CACHE_VERSION:
+        with _compiled_lock:
+            for key, entry in cached.get("files", {}).items():
+                if key in files and tuple(entry["signature"]) == files[key] and key not in _compiled_files:
+                    _compiled_files[key] = (files[key], entry["compiled"])
+
+    bundle = {name: compile_crew_config(agents_path, tasks_path) for name, (agents_path, tasks_path) in pairs.items()}
+
+    fresh = cached and cached.get("version") == CONFIG_CACHE_VERSION and {
+        key: tuple(entry["signature"]) for key, entry in cached.get("files", {}).items()
+    } == files
+    if cache_path is not None and not fresh:
+        with _compiled_lock:
+            payload = {
+                "version": CONFIG_CACHE_VERSION,
+                "files": {key: {"signature": list(files[key]), "compiled": _compiled_files[key][1]} for key in files},
+            }
+        try:
+            Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = Path(f"{cache_path}.{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass  # cache su disco facoltativa (es. filesystem in sola lettura)
+    return bundle
+
+
+def load_tools(agents_yaml_path: str, tool_names: Optional[Tuple[str, ...]] = None):
+    """Istanze dei tool dichiarati dagli agenti; le classi sono importate una volta per processo.
+
+    Un tool dichiarato ma non importabile è un errore di configurazione e solleva ``ValueError``.
+    """
+    if tool_names is None:
+        agents = _compiled(agents_yaml_path, compile_agents)
+        tool_names = sorted({tool for ag in agents.values() for tool in ag.get("tools", [])})
     tools_registry = {}
 
     for tool in tool_names:
-        try:
+        if tool not in _tool_classes:
             module_path = f"blogwriter.tools.{camel_to_snake(tool)}"
-            module = importlib.import_module(module_path)
-            cls = getattr(module, tool)
-            if inspect.isclass(cls):
-                tools_registry[tool] = cls()
-        except Exception as e:
-            print(f"Errore caricando il tool {tool}: {e}")
+            try:
+                cls = getattr(importlib.import_module(module_path), tool)
+            except (ImportError, AttributeError) as e:
+                raise ValueError(f"Errore caricando il tool {tool} da {module_path}: {e}") from e
+            if not inspect.isclass(cls):
+                raise ValueError(f"Il tool {tool} in {module_path} non è una classe.")
+            _tool_classes[tool] = cls
+        tools_registry[tool] = _tool_classes[tool]()
     return tools_registry
 
 def build_agents_from_yaml(agents_path: str, tools_registry: dict = None, agent_registry: dict = None) -> Dict[str, Agent]:
@@ -77,27 +270,19 @@ def build_agents_from_yaml(agents_path: str, tools_registry: dict = None, agent_
     Dict[str, Agent]
         Dictionary of instantiated agents keyed by their identifiers.
     """
-    raw_agents = load_yaml(agents_path)
+    # Parsing e validazione avvengono una volta sola finché il file non cambia
+    compiled_agents = _compiled(agents_path, compile_agents)
     agents = {}
-    tools_registry = tools_registry or {}
+    if tools_registry is None:
+        tools_registry = load_tools(agents_path)
     agent_registry = agent_registry or DEFAULT_AGENT_REGISTRY
 
-    for key, data in raw_agents.items():
-
-        if not isinstance(data, dict):
-            continue
-
-        required_fields = {"role", "goal", "backstory"}
-        if not required_fields.issubset(data):
-            # Skip configuration blocks that are only used as reusable profiles
-            # and therefore do not contain the fields needed to instantiate an agent.
-            continue
-
+    for key, data in compiled_agents.items():
         tools = [tools_registry[t] for t in data.get("tools", []) if t in tools_registry]
         llm = agent_registry.get(data.get("llm", "local_chatollama"))
         llm_obj = getattr(llm, "llm", llm)
 
-        agents[key] = Agent(
+        agents[key] = ContextAgent(
             role=data["role"],
             goal=data["goal"],
             backstory=data["backstory"],
@@ -109,16 +294,48 @@ def build_agents_from_yaml(agents_path: str, tools_registry: dict = None, agent_
             knowledge_sources=data.get("knowledge_sources", []),
             allow_delegation=data.get("allow_delegation", False),
             allow_code_execution=data.get("allow_code_execution", False),
+            max_execution_time=data.get("max_execution_time"),
             llm=llm_obj
         )
     return agents
 
-def build_tasks_from_yaml(tasks_path: str, agents: Dict[str, Agent]) -> Dict[str, Task]:
-    raw_tasks = load_yaml(tasks_path)
+def build_tasks_from_yaml(tasks_path: str, agents: Dict[str, Agent], agent_registry: dict = None) -> Dict[str, Task]:
+    """Build tasks from a YAML configuration.
+
+    A task may declare ``timeout`` (seconds): it becomes the deadline of its
+    agent (``max_execution_time``), so a hung LLM call cannot stall the flow.
+    When an agent serves several tasks the most permissive deadline wins.
+
+    A task may also declare ``output_schema`` (a name from
+    :data:`utils.structured_output.OUTPUT_SCHEMAS` or an inline JSON Schema):
+    the agent's Ollama model is then constrained to emit JSON matching it.
+    The constraint applies to the agent, so all tasks of an agent must agree on it.
+
+    A task may declare ``routing`` rules (see :mod:`llm.model_router`): its
+    calls then go to the registry key of the first rule matching the input
+    length, falling back to the agent's own LLM. Rule keys are resolved in
+    ``agent_registry`` (default :data:`DEFAULT_AGENT_REGISTRY`).
+
+    The YAML is parsed and validated once per file version (see
+    :func:`compile_crew_config`).
+    """
+    compiled_tasks = _compiled(tasks_path, compile_tasks)
     tasks = {}
-    for key, data in raw_tasks.items():
+    routes: Dict[str, Dict[str, list]] = {}
+    for key, data in compiled_tasks.items():
+        if data["agent"] not in agents:
+            raise ValueError(f"{tasks_path}: il task '{key}' usa l'agente sconosciuto '{data['agent']}'.")
         agent = agents[data["agent"]]
+        if data.get("timeout") is not None:
+            agent.max_execution_time = max(int(data["timeout"]), agent.max_execution_time or 0)
+        schema = data["output_schema"]
+        tool = getattr(agent.llm, "_tool", None)
+        if schema is not None and tool is not None:
+            agent.llm = tool.structured(schema)
+        if data.get("routing"):
+            routes.setdefault(data["agent"], {})[key] = data["routing"]
         tasks[key] = Task(
+            name=key,
             description=data["description"],
             expected_output=data["expected_output"],
             agent=agent,
@@ -126,6 +343,12 @@ def build_tasks_from_yaml(tasks_path: str, agents: Dict[str, Agent]) -> Dict[str
             human_input=data.get("human_input", False),
             markdown=data.get("markdown", False)
         )
+    # Il routing si applica dopo gli schemi: l'adattatore li eredita dall'llm dell'agente
+    for agent_key, agent_routes in routes.items():
+        agent = agents[agent_key]
+        if isinstance(agent.llm, RoutedLLMAdapter):
+            agent.llm = agent.llm._default
+        agent.llm = RoutedLLMAdapter(agent.llm, agent_routes, agent_registry or DEFAULT_AGENT_REGISTRY)
     return tasks
 
 def build_crew(agents: dict, tasks: dict, agent_keys: list[str], task_keys: list[str], *, verbose=False, process="sequential") -> Crew:
@@ -181,5 +404,5 @@ def load_agent_and_task_from_yaml(agent_id: str, task_id: str, agents_path: str,
     """
     tools = load_tools(agents_path)
     agents = build_agents_from_yaml(agents_path, tools, agent_registry)
-    tasks = build_tasks_from_yaml(tasks_path, agents)
+    tasks = build_tasks_from_yaml(tasks_path, agents, agent_registry)
     return agents[agent_id], tasks[task_id]
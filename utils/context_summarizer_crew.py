@@ -1,15 +1,57 @@
-from crewai import Agent, Task, Crew, Process
+from typing import Optional
+
+from crewai import Task, Crew, Process
 from llm.local_llm_tool import LocalLLMTool
+from utils.async_crew import ContextAgent, run_blocking
+from utils.extractive_summarizer import extractive_summary
+
+SUMMARIZER_MODEL = 'ollama/phi4'
+# Chiave del registry del tool di riassunto: stesso pool, metriche e warm-up degli altri modelli
+SUMMARIZER_LLM = "summarizer_llm"
+SUMMARIZER_BACKENDS = {"llm", "extractive"}
+SUMMARY_MAX_SENTENCES = 5
+# Temperatura storica del riassunto: non è deterministica, per cui le sue chiamate non vengono accorpate (llm.single_flight)
+SUMMARIZER_TEMPERATURE = 0.5
+
+
+def summarize_section(section: str, content: str, backend: str = "llm", llm_tool: Optional[LocalLLMTool] = None) -> str:
+    """Riassunto (max 5 frasi) di una sezione.
+
+    ``backend="llm"`` usa ``llm_tool`` (la voce :data:`SUMMARIZER_LLM` del
+    registry; di default quella di ``DEFAULT_AGENT_REGISTRY``) tramite una crew
+    dedicata; ``backend="extractive"`` seleziona le frasi più centrali in
+    locale (TextRank), senza chiamate al modello.
+    """
+    if backend not in SUMMARIZER_BACKENDS:
+        raise ValueError(f"Backend di riassunto non supportato: {backend}. Opzioni valide: {SUMMARIZER_BACKENDS}.")
+    if backend == "extractive":
+        return extractive_summary(content, max_sentences=SUMMARY_MAX_SENTENCES)
+    return _summarize_with_llm(section, content, llm_tool)
+
+
+async def asummarize_section(section: str, content: str, backend: str = "llm", llm_tool: Optional[LocalLLMTool] = None) -> str:
+    """Versione asincrona di :func:`summarize_section` per i flow.
+
+    Il riassunto estrattivo è puro calcolo locale e gira sul loop; la crew del
+    backend ``"llm"`` viene eseguita nel pool delle crew (vedi :mod:`utils.async_crew`).
+    """
+    if backend == "llm":
+        return await run_blocking(_summarize_with_llm, section, content, llm_tool)
+    return summarize_section(section, content, backend=backend, llm_tool=llm_tool)
 
 
-def summarize_section(section: str, content: str, model_name: str = 'ollama/phi4') -> str:
-    llm = LocalLLMTool(model=model_name)
+def _summarize_with_llm(section: str, content: str, llm: Optional[LocalLLMTool]) -> str:
+    if llm is None:
+        # Import locale: config_loader non deve dipendere dal riassunto (e da scikit-learn)
+        from utils.config_loader import DEFAULT_AGENT_REGISTRY
+        llm = DEFAULT_AGENT_REGISTRY[SUMMARIZER_LLM]
 
-    summarizer = Agent(
+    # Come in build_agents_from_yaml: l'agente riceve l'adattatore CrewAI del tool
+    summarizer = ContextAgent(
         role="Article Summarizer",
         goal="Sintetizzare efficacemente i contenuti di ogni sezione dell’articolo",
         backstory="Esperto in scrittura tecnico-scientifica sintetica. Genera riassunti compatti e informativi per sezioni articolate di un contenuto.",
-        llm=llm,
+        llm=llm.llm,
         allow_delegation=False,
         verbose=False
     )
@@ -0,0 +1,65 @@
+"""Riassunto estrattivo locale (TF-IDF + TextRank) per le sezioni dell'articolo.
+
+Alternativa al riassunto via LLM di :func:`utils.context_summarizer_crew.summarize_section`:
+seleziona le frasi più centrali della sezione con un PageRank sul grafo di
+similarità coseno tra le frasi. Gira su CPU in pochi millisecondi e non occupa
+il server Ollama.
+"""
+from __future__ import annotations
+
+import re
+from typing import List
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from utils.markdown_utils import CODE_MARKER_RE
+
+_CODE_FENCE_RE = re.compile(r"```.*?```", re.DOTALL)
+_MARKDOWN_RE = re.compile(r"^\s{0,3}(#{1,6}\s+|[-*+]\s+|\d+[.)]\s+|>\s?)", re.MULTILINE)
+_SENTENCE_RE = re.compile(r"(?<=[.!?…])\s+(?=[\"'«(]?[A-ZÀ-Ý0-9])")
+
+
+def split_sentences(text: str, min_words: int = 4) -> List[str]:
+    """Frasi del testo, senza blocchi di codice, marcatori e sintassi Markdown di riga."""
+    text = CODE_MARKER_RE.sub(" ", _CODE_FENCE_RE.sub(" ", text or ""))
+    text = _MARKDOWN_RE.sub("", text).replace("**", "").replace("__", "")
+    sentences: List[str] = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = " ".join(paragraph.split())
+        sentences.extend(s.strip() for s in _SENTENCE_RE.split(paragraph) if len(s.split()) >= min_words)
+    return sentences
+
+
+def textrank_scores(sentences: List[str], damping: float = 0.85, iterations: int = 50, tol: float = 1e-6) -> np.ndarray:
+    """Centralità TextRank di ciascuna frase (somma 1)."""
+    n = len(sentences)
+    if n == 0:
+        return np.zeros(0)
+    try:
+        tfidf = TfidfVectorizer(sublinear_tf=True, strip_accents="unicode").fit_transform(sentences)
+    except ValueError:  # vocabolario vuoto (solo stop word/punteggiatura)
+        return np.full(n, 1.0 / n)
+    # Righe già normalizzate L2: il prodotto è la similarità coseno
+    similarity = (tfidf @ tfidf.T).toarray()
+    np.fill_diagonal(similarity, 0.0)
+    row_sums = similarity.sum(axis=1, keepdims=True)
+    transition = np.divide(similarity, row_sums, out=np.full_like(similarity, 1.0 / n), where=row_sums > 0)
+    scores = np.full(n, 1.0 / n)
+    for _ in range(iterations):
+        updated = (1.0 - damping) / n + damping * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < tol:
+            return updated
+        scores = updated
+    return scores
+
+
+def extractive_summary(text: str, max_sentences: int = 5) -> str:
+    """Le ``max_sentences`` frasi più centrali, nell'ordine in cui compaiono nel testo."""
+    sentences = split_sentences(text)
+    if len(sentences) <= max_sentences:
+        return " ".join(sentences)
+    scores = textrank_scores(sentences)
+    # A parità di punteggio vince la frase che compare prima
+    ranked = np.lexsort((np.arange(len(sentences)), -scores))[:max_sentences]
+    return " ".join(sentences[i] for i in sorted(ranked))
@@ -0,0 +1,71 @@
+"""Diagrammi dei flow generati fuori dal percorso critico della run.
+
+Il grafo di un flow dipende solo dalla sua definizione (metodi di start,
+listener, router), non dallo stato: :func:`schedule_flow_plot` calcola un hash
+della definizione e rigenera ``<nome>.html`` solo se l'hash salvato accanto
+(``<nome>.html.sha256``) è diverso. Il disegno gira in un thread di background,
+e ogni diagramma viene richiesto al più una volta per processo.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import crewai
+
+logger = logging.getLogger(__name__)
+
+_PLOT_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="flow-plot")
+_scheduled: Dict[str, Future] = {}
+_scheduled_lock = threading.Lock()
+
+
+def flow_definition_hash(flow: Any) -> str:
+    """Hash del grafo del flow (e della versione di CrewAI che lo disegna)."""
+    definition = {
+        "flow": type(flow).__qualname__,
+        "crewai": getattr(crewai, "__version__", ""),
+        "start": sorted(flow._start_methods),
+        "listeners": {name: repr(condition) for name, condition in sorted(flow._listeners.items())},
+        "routers": sorted(flow._routers),
+        "router_paths": {name: sorted(paths) for name, paths in sorted(flow._router_paths.items())},
+    }
+    return hashlib.sha256(json.dumps(definition, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _plot_if_changed(flow: Any, filename: Path, digest: str) -> bool:
+    html_path = filename.with_name(filename.name + ".html")
+    hash_path = filename.with_name(filename.name + ".html.sha256")
+    if html_path.exists() and hash_path.exists() and hash_path.read_text(encoding="utf-8").strip() == digest:
+        return False
+    flow.plot(filename=str(filename))
+    hash_path.write_text(digest, encoding="utf-8")
+    return True
+
+
+def _log_failure(future: Future) -> None:
+    if future.exception() is not None:
+        logger.warning("Diagramma del flow non generato: %s", future.exception())
+
+
+def schedule_flow_plot(flow: Any, filename: str | Path) -> Optional[Future]:
+    """Accoda il disegno di ``flow`` in ``filename`` (senza estensione).
+
+    Ritorna il future (``True`` se il file è stato rigenerato), o ``None`` se
+    lo stesso diagramma è già stato richiesto in questo processo.
+    """
+    filename = Path(filename)
+    digest = flow_definition_hash(flow)
+    key = f"{filename.resolve()}:{digest}"
+    with _scheduled_lock:
+        if key in _scheduled:
+            return None
+        future = _PLOT_EXECUTOR.submit(_plot_if_changed, flow, filename, digest)
+        _scheduled[key] = future
+    future.add_done_callback(_log_failure)
+    return future
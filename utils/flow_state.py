@@ -0,0 +1,43 @@
+"""Passaggio dello stato ``ArticleState`` tra flow senza copie.
+
+Di default un ``Flow`` CrewAI costruisce il proprio stato da ``**state.model_dump()``
+(dump + validazione di tutti i paragrafi, riassunti e snippet) e, a ogni metodo
+eseguito, ne fa due ``deepcopy`` per gli eventi di inizio/fine metodo. Con
+:class:`SharedStateFlowMixin` il flow adotta l'istanza ricevuta dallo stage
+precedente e gli eventi ricevono una copia superficiale (i contenitori sono
+condivisi, quindi il costo non cresce con la lunghezza dell'articolo).
+"""
+from __future__ import annotations
+
+from typing import Any
+
+from crewai.flow.flow import FlowState
+from pydantic import BaseModel
+
+
+class SharedStateFlowMixin:
+    """Da mettere prima di ``Flow[...]`` nelle basi della classe del flow."""
+
+    def _adopt_state(self, state: BaseModel, copy_state: bool = False) -> None:
+        """Usa ``state`` come stato del flow.
+
+        Un'istanza già prodotta da un flow (che ha l'``id`` di CrewAI) viene
+        adottata per riferimento: le modifiche del flow sono visibili al
+        chiamante. Un ``ArticleState`` semplice viene avvolto nel tipo di stato
+        del flow condividendone i valori. ``copy_state=True`` ripristina la
+        copia profonda.
+        """
+        if copy_state:
+            state = state.model_copy(deep=True)
+        if isinstance(state, FlowState):
+            self._state = state
+            return
+        state_type = type(self._state)
+        values: dict[str, Any] = {name: getattr(state, name) for name in type(state).model_fields}
+        self._state = state_type.model_construct(id=self._state.id, **values)
+
+    def _copy_state(self) -> Any:
+        # Snapshot per gli eventi CrewAI: copia superficiale invece di deepcopy
+        if isinstance(self._state, BaseModel):
+            return self._state.model_copy()
+        return dict(self._state)
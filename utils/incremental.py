@@ -0,0 +1,65 @@
+"""Rigenerazione incrementale dell'articolo, come in un sistema di build.
+
+Ogni passo che produce contenuto (validazione degli input, scrittura di una
+sezione, codice, review, consolidamento, editing di una sezione) registra in
+``ArticleState.build_records`` l'hash dei propri input e gli output prodotti:
+
+    state.build_records["section:Introduzione"] = {"hash": ..., "paragraph": ..., ...}
+
+Con una :class:`BuildCache` costruita dallo ``state.json`` di una run
+precedente, un passo il cui hash non è cambiato riusa gli output registrati
+invece di chiamare il modello. Le dipendenze a valle sono implicite negli
+hash: il prompt di una sezione contiene i riassunti delle precedenti, per cui
+una sezione rigenerata invalida quelle successive, e un articolo modificato
+invalida review ed editing.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional
+
+STATE_FILE = "state.json"
+
+
+def fingerprint(**inputs: Any) -> str:
+    """Hash stabile (sha256) degli input di un passo."""
+    payload = json.dumps(inputs, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def record_build(state: Any, key: str, digest: str, **outputs: Any) -> None:
+    """Registra nello stato gli output del passo ``key`` e l'hash dei suoi input."""
+    state.build_records[key] = {"hash": digest, **outputs}
+
+
+class BuildCache:
+    """Output riusabili di una run precedente, indicizzati per passo."""
+
+    def __init__(self, records: Optional[Mapping[str, Mapping[str, Any]]] = None) -> None:
+        self.records: Dict[str, Mapping[str, Any]] = dict(records or {})
+        self.reused: Dict[str, int] = {}
+        self.rebuilt: Dict[str, int] = {}
+
+    @classmethod
+    def from_run_dir(cls, run_dir: str | Path) -> "BuildCache":
+        """Carica i ``build_records`` dallo ``state.json`` della run in ``run_dir``."""
+        path = Path(run_dir) / STATE_FILE
+        if not path.exists():
+            raise ValueError(f"Nessuno stato da riusare in {path}: esegui prima una run completa con --run_dir.")
+        payload = json.loads(path.read_text(encoding="utf-8"))
+        return cls(payload.get("state", {}).get("build_records", {}))
+
+    def lookup(self, key: str, digest: str) -> Optional[Mapping[str, Any]]:
+        """Output registrati per ``key`` se gli input non sono cambiati, altrimenti ``None``."""
+        kind = key.split(":", 1)[0]
+        record = self.records.get(key)
+        if record is not None and record.get("hash") == digest:
+            self.reused[kind] = self.reused.get(kind, 0) + 1
+            return record
+        self.rebuilt[kind] = self.rebuilt.get(kind, 0) + 1
+        return None
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {"reused": dict(self.reused), "rebuilt": dict(self.rebuilt)}
@@ -1,37 +1,109 @@
 import re
 import os
+import logging
+from difflib import SequenceMatcher
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Marker con cui il writer chiede un blocco di codice; il gruppo è l'istruzione
+CODE_MARKER_RE = re.compile(r"\[CODICE_RICHIESTO\]\[START\]\s*(.*?)\s*\[END\]", re.DOTALL)
+# Somiglianza minima tra istruzione del marker e istruzione originale (marker riformulato dall'editor)
+INSTRUCTION_MATCH_CUTOFF = 0.6
+
+
+def _normalize_instruction(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+def _match_markers(section: str, markers: List[str], instructions: List[str]) -> List[Optional[int]]:
+    """Indice dell'istruzione (e quindi dello snippet) di ogni marker; ``None`` se non abbinabile.
+
+    Prima l'istruzione identica (a meno di spazi e maiuscole), poi la più simile
+    sopra :data:`INSTRUCTION_MATCH_CUTOFF`; i marker rimasti vengono abbinati per
+    posizione solo se il numero di marker è invariato.
+    """
+    normalized = [_normalize_instruction(text) for text in instructions]
+    unused = list(range(len(instructions)))
+    assigned: List[Optional[int]] = [None] * len(markers)
+
+    for position, marker in enumerate(markers):
+        target = _normalize_instruction(marker)
+        index = next((i for i in unused if normalized[i] == target), None)
+        if index is not None:
+            assigned[position] = index
+            unused.remove(index)
+
+    for position, marker in enumerate(markers):
+        if assigned[position] is not None or not unused:
+            continue
+        target = _normalize_instruction(marker)
+        ratio, index = max((SequenceMatcher(None, target, normalized[i]).ratio(), i) for i in unused)
+        if ratio >= INSTRUCTION_MATCH_CUTOFF:
+            assigned[position] = index
+            unused.remove(index)
+
+    missing = [position for position, index in enumerate(assigned) if index is None]
+    if missing and len(markers) == len(instructions):
+        logger.warning(f"⚠️ Sezione {section}: {len(missing)} marker di codice riformulati, abbinati per posizione.")
+        for position, index in zip(missing, list(unused)):
+            assigned[position] = index
+            unused.remove(index)
+    elif missing:
+        logger.warning(f"⚠️ Sezione {section}: {len(missing)} marker di codice senza istruzione corrispondente, rimossi.")
+    if unused:
+        logger.warning(f"⚠️ Sezione {section}: {len(unused)} snippet senza marker nel testo, non inseriti.")
+    return assigned
 
 
 class MarkdownUtils:
     @staticmethod
-    def inject_code(paragraph: str, section: str, code_snippets: dict) -> str:
+    def extract_code_requests(paragraph: str) -> List[str]:
+        """
+        Istruzioni di tutti i blocchi [CODICE_RICHIESTO][START] ... [END] del paragrafo,
+        nell'ordine in cui compaiono (l'indice è la posizione del blocco).
+        """
+        return [instruction.strip() for instruction in CODE_MARKER_RE.findall(paragraph)]
+
+    @staticmethod
+    def inject_code(paragraph: str, section: str, code_snippets: dict, code_instructions: Optional[dict] = None) -> str:
         """
         Sostituisce i blocchi [CODICE_RICHIESTO][START] ... [END]
-        con il codice corrispondente alla sezione, wrappato in Markdown.
+        con il codice corrispondente, wrappato in Markdown.
+
+        Con ``code_instructions`` ogni blocco riceve lo snippet generato per la
+        sua istruzione, anche se l'editor ha rimosso o riordinato i marker (vedi
+        :func:`_match_markers`); senza, l'i-esimo blocco riceve l'i-esimo snippet.
 
         Args:
             paragraph (str): testo del paragrafo che può contenere placeholder.
             section (str): nome della sezione (chiave in code_snippets).
-            code_snippets (dict): dizionario {section_name: code_string}.
+            code_snippets (dict): dizionario {section_name: [code_string, ...]}.
+            code_instructions (dict, opzionale): dizionario {section_name: [istruzione, ...]},
+                allineato a code_snippets.
 
         Returns:
             str: paragrafo aggiornato con codice iniettato.
         """
-        code_to_insert = code_snippets.get(section, "").strip()
-        if not code_to_insert:
-            # Se non c’è codice per la sezione, rimuovo i placeholder
-            return re.sub(r"\[CODICE_RICHIESTO\]\[START\].*?\[END\]", "", paragraph, flags=re.DOTALL).strip()
+        snippets = list(code_snippets.get(section) or [])
+        markers = [instruction.strip() for instruction in CODE_MARKER_RE.findall(paragraph)]
+        instructions = (code_instructions or {}).get(section)
+        if instructions is not None:
+            order = _match_markers(section, markers, list(instructions))
+        else:
+            if len(markers) != len(snippets):
+                logger.warning(f"⚠️ Sezione {section}: {len(markers)} marker di codice e {len(snippets)} snippet, abbinati per posizione.")
+            order = list(range(len(markers)))
+        chosen = iter(order)
 
         def _replace_block(_):
-            return f"\n{code_to_insert}\n"
+            # Blocchi senza codice (istruzione vuota o snippet mancante) vengono rimossi
+            index = next(chosen, None)
+            code_to_insert = (snippets[index] if index is not None and index < len(snippets) else "") or ""
+            code_to_insert = code_to_insert.strip()
+            return f"\n{code_to_insert}\n" if code_to_insert else ""
 
-        updated_paragraph = re.sub(
-            r"\[CODICE_RICHIESTO\]\[START\].*?\[END\]",
-            _replace_block,
-            paragraph,
-            flags=re.DOTALL
-        )
-        return updated_paragraph.strip()
+        return CODE_MARKER_RE.sub(_replace_block, paragraph).strip()
 
     @staticmethod
     def generate_markdown(
@@ -41,7 +113,8 @@ class MarkdownUtils:
         paragraphs: dict,
         code_snippets: dict,
         write_output: bool = False,
-        output_path: str | None = None
+        output_path: str | None = None,
+        code_instructions: dict | None = None,
     ) -> str:
         """
         Genera un file markdown ben formattato con eventuali snippet di codice iniettati.
@@ -51,7 +124,9 @@ class MarkdownUtils:
             abstract (str): Abstract del contenuto.
             structure (list): Lista ordinata delle sezioni.
             paragraphs (dict): Dizionario {section: testo}.
-            code_snippets (dict): Dizionario {section: codice}.
+            code_snippets (dict): Dizionario {section: [codice, ...]}.
+            code_instructions (dict, opzionale): Dizionario {section: [istruzione, ...]} per abbinare
+                gli snippet ai marker per istruzione (vedi inject_code).
             output_path (str, opzionale): percorso di output per il file .md (default: <title>.md).
 
         Returns:
@@ -71,7 +146,7 @@ class MarkdownUtils:
             md_lines.append(f"## {section}\n")
 
             paragraph_text = paragraphs.get(section, "").strip()
-            processed_text = MarkdownUtils.inject_code(paragraph_text, section, code_snippets)
+            processed_text = MarkdownUtils.inject_code(paragraph_text, section, code_snippets, code_instructions)
 
             md_lines.append(processed_text + "\n")
 
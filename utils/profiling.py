@@ -0,0 +1,304 @@
+"""Profilazione CPU e memoria per stage della pipeline (``--profile``).
+
+Per ogni stage (``input_validator``, ``writing``, ``editing``) vengono scritti in
+una cartella accanto al Markdown:
+
+- ``<stage>.pstats``: cProfile del thread dell'event loop (flow, stato,
+  pydantic) unito a quello delle chiamate eseguite nel pool delle crew
+  (:func:`utils.async_crew.run_blocking`). Si apre con ``snakeviz`` o
+  ``python -m pstats``.
+- ``<stage>.folded``: stack campionati di tutti i thread nel formato "folded"
+  (``frame;frame;frame conteggio``), pronto per ``flamegraph.pl`` o speedscope.
+  I campioni dei thread fermi in attesa (socket, lock, coda del pool) sono
+  scartati e contati a parte, così resta il tempo CPU e non l'attesa dei modelli.
+- ``<stage>.memory.txt``: allocazioni principali (``tracemalloc``) a fine stage
+  e crescita rispetto all'inizio dello stage.
+
+``profile.json`` riassume durata, tempo CPU del processo, picco di memoria e, con
+``steps=True``, le stesse misure per ogni metodo dei flow (dagli eventi
+``MethodExecution*`` di CrewAI).
+
+Da Python 3.12 cProfile ammette un solo profiler attivo per processo: le
+chiamate nel pool delle crew restano allora visibili solo negli stack campionati.
+"""
+from __future__ import annotations
+
+import cProfile
+import json
+import linecache
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SAMPLE_INTERVAL = 0.005
+TOP_ALLOCATIONS = 30
+# Foglie Python di un thread fermo in attesa (I/O, lock, coda del pool)
+IDLE_FUNCTIONS = frozenset({
+    "wait", "select", "poll", "epoll", "accept", "recv", "recv_into", "readinto", "readline",
+    "_worker", "get", "acquire", "sleep", "_wait_for_tstate_lock", "join",
+})
+
+
+@dataclass
+class MeasureResult:
+    name: str
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    memory_delta_kb: float = 0.0
+    peak_memory_kb: float = 0.0
+    steps: List[Dict[str, Any]] = field(default_factory=list)
+
+
+class StackSampler:
+    """Campiona periodicamente gli stack di tutti i thread (``sys._current_frames``)."""
+
+    def __init__(self, interval: float = DEFAULT_SAMPLE_INTERVAL) -> None:
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self.idle_samples = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def drain(self) -> Tuple[Counter, int]:
+        """Campioni raccolti finora (che vengono azzerati) e numero di campioni in attesa."""
+        with self._lock:
+            counts, idle = self.counts, self.idle_samples
+            self.counts, self.idle_samples = Counter(), 0
+        return counts, idle
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = []
+            idle = 0
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if frame.f_code.co_name in IDLE_FUNCTIONS:
+                    idle += 1
+                    continue
+                stacks.append(_fold(names.get(ident, str(ident)), frame))
+            with self._lock:
+                self.counts.update(stacks)
+                self.idle_samples += idle
+
+
+def _fold(thread_name: str, frame: Any) -> str:
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    # Il nome del thread, senza il numero del worker, fa da radice del flamegraph
+    return ";".join([thread_name.rsplit("_", 1)[0]] + frames[::-1])
+
+
+current_profiler: ContextVar[Optional["PipelineProfiler"]] = ContextVar("current_profiler", default=None)
+
+
+class PipelineProfiler:
+    """Profilo CPU (cProfile + campionamento) e memoria (tracemalloc) di una run."""
+
+    def __init__(
+        self,
+        output_dir: str | Path,
+        steps: bool = False,
+        sample_interval: float = DEFAULT_SAMPLE_INTERVAL,
+        tracemalloc_frames: int = 1,
+    ) -> None:
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.steps = steps
+        self.tracemalloc_frames = tracemalloc_frames
+        self.sampler = StackSampler(sample_interval)
+        self.stages: List[MeasureResult] = []
+        self._thread_profiles: List[cProfile.Profile] = []
+        self._profiles_lock = threading.Lock()
+        self._open_steps: Dict[Tuple[str, str], Tuple[float, float, int]] = {}
+        self._current_stage: Optional[MeasureResult] = None
+        self._peak = 0
+
+    def __enter__(self) -> "PipelineProfiler":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        self._started_tracemalloc = not tracemalloc.is_tracing()
+        if self._started_tracemalloc:
+            tracemalloc.start(self.tracemalloc_frames)
+        if self.steps:
+            _register_step_handlers()
+        self._token = current_profiler.set(self)
+        self.sampler.start()
+
+    def stop(self) -> None:
+        """Ferma campionamento e tracemalloc e scrive ``profile.json``."""
+        self.sampler.stop()
+        current_profiler.reset(self._token)
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+        summary = {"python": sys.version.split()[0], "stages": [asdict(stage) for stage in self.stages]}
+        (self.output_dir / "profile.json").write_text(json.dumps(summary, indent=2), encoding="utf-8")
+        logger.info("Profilo della run salvato in %s", self.output_dir)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[MeasureResult]:
+        """Profila lo stage ``name`` (da usare attorno all'``await`` del flow)."""
+        result = MeasureResult(name=name)
+        self._current_stage = result
+        self.sampler.drain()
+        with self._profiles_lock:
+            self._thread_profiles = []
+        baseline = tracemalloc.take_snapshot()
+        memory_before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        self._peak = 0
+        loop_profile = cProfile.Profile()
+        wall, cpu = time.perf_counter(), time.process_time()
+        loop_profile.enable()
+        try:
+            yield result
+        finally:
+            loop_profile.disable()
+            result.wall_seconds = time.perf_counter() - wall
+            result.cpu_seconds = time.process_time() - cpu
+            current, peak = tracemalloc.get_traced_memory()
+            result.memory_delta_kb = (current - memory_before) / 1024
+            result.peak_memory_kb = max(self._peak, peak) / 1024
+            self._current_stage = None
+            self.stages.append(result)
+            self._write_stage(name, loop_profile, baseline)
+
+    def run_in_thread(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Esegue ``func`` nel thread corrente sotto un cProfile unito a quello dello stage."""
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+: è già attivo il profiler del loop
+            return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+            with self._profiles_lock:
+                self._thread_profiles.append(profile)
+
+    # ---------- step dei flow ----------
+
+    def step_started(self, flow_name: str, method_name: str) -> None:
+        self._peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        self._open_steps[(flow_name, method_name)] = (
+            time.perf_counter(), time.process_time(), tracemalloc.get_traced_memory()[0]
+        )
+
+    def step_finished(self, flow_name: str, method_name: str, failed: bool = False) -> None:
+        started = self._open_steps.pop((flow_name, method_name), None)
+        if started is None or self._current_stage is None:
+            return
+        wall, cpu, memory = started
+        current, peak = tracemalloc.get_traced_memory()
+        self._peak = max(self._peak, peak)
+        self._current_stage.steps.append({
+            "step": f"{flow_name}.{method_name}",
+            "wall_seconds": round(time.perf_counter() - wall, 4),
+            "cpu_seconds": round(time.process_time() - cpu, 4),
+            "memory_delta_kb": round((current - memory) / 1024, 1),
+            "peak_memory_kb": round(peak / 1024, 1),
+            "failed": failed,
+        })
+
+    # ---------- output ----------
+
+    def _write_stage(self, name: str, loop_profile: cProfile.Profile, baseline: tracemalloc.Snapshot) -> None:
+        stats = pstats.Stats(loop_profile)
+        with self._profiles_lock:
+            thread_profiles, self._thread_profiles = self._thread_profiles, []
+        for profile in thread_profiles:
+            stats.add(profile)
+        stats.dump_stats(str(self.output_dir / f"{name}.pstats"))
+
+        counts, idle = self.sampler.drain()
+        with open(self.output_dir / f"{name}.folded", "w", encoding="utf-8") as file:
+            for stack, count in counts.most_common():
+                file.write(f"{stack} {count}\n")
+
+        # Escluse le allocazioni degli strumenti di profilazione stessi
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, module.__file__) for module in (tracemalloc, cProfile, pstats, linecache)
+        ] + [tracemalloc.Filter(False, __file__)])
+        lines = [f"# Stage {name}: allocazioni principali a fine stage", ""]
+        lines += [str(stat) for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]]
+        lines += ["", f"# Stage {name}: crescita rispetto all'inizio dello stage", ""]
+        lines += [str(stat) for stat in snapshot.compare_to(baseline, "lineno")[:TOP_ALLOCATIONS]]
+        lines += ["", f"# Campioni CPU: {sum(counts.values())}, in attesa (scartati): {idle}"]
+        (self.output_dir / f"{name}.memory.txt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+_handlers_registered = False
+_handlers_lock = threading.Lock()
+
+
+def _register_step_handlers() -> None:
+    """Collega una sola volta gli eventi dei metodi dei flow al profiler corrente."""
+    global _handlers_registered
+    with _handlers_lock:
+        if _handlers_registered:
+            return
+        from crewai.utilities.events import (
+            MethodExecutionFailedEvent,
+            MethodExecutionFinishedEvent,
+            MethodExecutionStartedEvent,
+            crewai_event_bus,
+        )
+
+        @crewai_event_bus.on(MethodExecutionStartedEvent)
+        def _on_started(source: Any, event: MethodExecutionStartedEvent) -> None:
+            profiler = current_profiler.get()
+            if profiler is not None and profiler.steps:
+                profiler.step_started(event.flow_name, event.method_name)
+
+        @crewai_event_bus.on(MethodExecutionFinishedEvent)
+        def _on_finished(source: Any, event: MethodExecutionFinishedEvent) -> None:
+            profiler = current_profiler.get()
+            if profiler is not None and profiler.steps:
+                profiler.step_finished(event.flow_name, event.method_name)
+
+        @crewai_event_bus.on(MethodExecutionFailedEvent)
+        def _on_failed(source: Any, event: MethodExecutionFailedEvent) -> None:
+            profiler = current_profiler.get()
+            if profiler is not None and profiler.steps:
+                profiler.step_finished(event.flow_name, event.method_name, failed=True)
+
+        _handlers_registered = True
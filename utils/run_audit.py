@@ -0,0 +1,145 @@
+"""Aggregazioni sullo storico delle run per la dashboard di audit.
+
+Gli eventi di tutte le run (``<runs>/<id>/events.jsonl``) vengono caricati in un
+unico DataFrame con colonna ``run_id``; gli snapshot ``state.json`` in una riga
+per run. Tutte le statistiche sono calcolate con operazioni vettoriali
+(``groupby``/``diff``/``quantile``), senza cicli Python sulle run.
+"""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable
+
+import numpy as np
+import pandas as pd
+
+from utils.run_monitor import EVENTS_FILE, STATE_FILE
+
+# Sotto questa soglia il modello era già in memoria (Ollama riporta solo l'overhead)
+RESIDENT_LOAD_SECONDS = 0.5
+STAGES = ["input_validator", "writing", "editing"]
+
+
+def load_run_events(run_dir: str | Path) -> pd.DataFrame:
+    """Eventi di una run; righe troncate (run in scrittura) vengono ignorate."""
+    path = Path(run_dir) / EVENTS_FILE
+    rows = []
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                continue
+    frame = pd.DataFrame(rows)
+    if frame.empty:
+        return frame
+    frame["run_id"] = Path(run_dir).name
+    return frame
+
+
+def load_run_state(run_dir: str | Path) -> Dict[str, Any]:
+    """Riepilogo di una run dal suo ``state.json`` (vuoto se non ancora scritto)."""
+    path = Path(run_dir) / STATE_FILE
+    if not path.exists():
+        return {"run_id": Path(run_dir).name}
+    payload = json.loads(path.read_text(encoding="utf-8"))
+    state = payload.get("state", {})
+    metrics = state.get("llm_metrics", {})
+    return {
+        "run_id": Path(run_dir).name,
+        "title": state.get("title", ""),
+        "last_stage": payload.get("stage"),
+        "sections": len(state.get("structure", [])),
+        "words": sum(len(text.split()) for text in state.get("paragraphs", {}).values()),
+        "skipped_code_reviews": metrics.get("skipped_code_reviews"),
+        "warmup_load_seconds": sum(item.get("load_seconds", 0.0) for item in metrics.get("warmup", [])),
+        "log_warnings": state.get("log_summary", {}).get("log_levels", {}).get("WARNING"),
+    }
+
+
+def combine_events(frames: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=["ts", "kind", "run_id"])
+    events = pd.concat(frames, ignore_index=True, sort=False)
+    events["ts"] = pd.to_numeric(events["ts"], errors="coerce")
+    return events.sort_values(["run_id", "ts"], kind="stable").reset_index(drop=True)
+
+
+def _column(frame: pd.DataFrame, name: str) -> pd.Series:
+    return frame[name] if name in frame else pd.Series(np.nan, index=frame.index)
+
+
+def run_summary(events: pd.DataFrame, states: pd.DataFrame) -> pd.DataFrame:
+    """Una riga per run: inizio, durata, esito e dati dello snapshot."""
+    grouped = events.groupby("run_id")["ts"]
+    summary = pd.DataFrame({"started": grouped.min(), "last_event": grouped.max()})
+    summary["duration_s"] = summary["last_event"] - summary["started"]
+    terminal = events[events["kind"].isin(["run_completed", "run_failed"])]
+    outcome = terminal.groupby("run_id")["kind"].last().map({"run_completed": "completata", "run_failed": "fallita"})
+    summary["status"] = outcome.reindex(summary.index).fillna("in corso")
+    summary["started_at"] = pd.to_datetime(summary["started"], unit="s")
+    if not states.empty:
+        summary = summary.join(states.set_index("run_id"), how="left")
+    return summary.reset_index()
+
+
+def stage_durations(events: pd.DataFrame) -> pd.DataFrame:
+    """Durata di ogni stage: distanza tra ``stage_completed`` consecutivi (o da ``run_started``)."""
+    marks = events[events["kind"].isin(["run_started", "stage_completed"])].copy()
+    marks["seconds"] = marks.groupby("run_id")["ts"].diff()
+    stages = marks[marks["kind"] == "stage_completed"]
+    return stages[["run_id", "stage", "seconds"]].dropna()
+
+
+def section_durations(events: pd.DataFrame) -> pd.DataFrame:
+    """Tempo di scrittura di ogni sezione, dalla fine della sezione (o dello stage) precedente."""
+    marks = events[
+        (events["kind"] == "section_written")
+        | ((events["kind"] == "stage_completed") & (_column(events, "stage") == "input_validator"))
+    ].copy()
+    marks["seconds"] = marks.groupby("run_id")["ts"].diff()
+    sections = marks[marks["kind"] == "section_written"]
+    return sections[["run_id", "section", "seconds"]].dropna()
+
+
+def latency_distribution(frame: pd.DataFrame, by: str, value: str = "seconds") -> pd.DataFrame:
+    """Conteggio, media e quantili di ``value`` per gruppo ``by``."""
+    if frame.empty:
+        return pd.DataFrame(columns=[by, "count", "mean", "p50", "p90", "p95", "max"])
+    grouped = frame.groupby(by)[value]
+    quantiles = grouped.quantile([0.5, 0.9, 0.95]).unstack()
+    quantiles.columns = ["p50", "p90", "p95"]
+    table = pd.concat([grouped.agg(["count", "mean", "max"]), quantiles], axis=1)
+    return table[["count", "mean", "p50", "p90", "p95", "max"]].round(3).reset_index()
+
+
+def model_latencies(events: pd.DataFrame) -> pd.DataFrame:
+    calls = events[events["kind"] == "llm_call"]
+    return calls[["run_id", "model", "seconds", "wait_seconds"]] if not calls.empty else calls
+
+
+def tokens_per_run(events: pd.DataFrame) -> pd.DataFrame:
+    """Token valutati (prompt) e generati per run, dai contatori Ollama."""
+    evals = events[events["kind"] == "prompt_eval"]
+    if evals.empty:
+        return pd.DataFrame(columns=["run_id", "prompt_tokens", "eval_tokens", "total_tokens"])
+    tokens = evals.assign(
+        prompt_tokens=pd.to_numeric(evals["prompt_tokens"], errors="coerce"),
+        eval_tokens=pd.to_numeric(_column(evals, "eval_tokens"), errors="coerce"),
+    ).groupby("run_id")[["prompt_tokens", "eval_tokens"]].sum(min_count=1)
+    tokens["total_tokens"] = tokens.sum(axis=1, min_count=1)
+    return tokens.reset_index()
+
+
+def cache_hit_rates(events: pd.DataFrame) -> pd.DataFrame:
+    """Per run: quota di chiamate con modello già residente e di code review evitate."""
+    evals = events[events["kind"] == "prompt_eval"]
+    loads = pd.to_numeric(_column(evals, "load_seconds"), errors="coerce")
+    resident = (loads < RESIDENT_LOAD_SECONDS).where(loads.notna())
+    rates = pd.DataFrame({"model_resident_rate": resident.groupby(evals["run_id"]).mean()})
+    reviews = events[events["kind"] == "code_reviewed"]
+    skipped = _column(reviews, "skipped").astype(float)
+    rates = rates.join(skipped.groupby(reviews["run_id"]).mean().rename("code_review_skip_rate"), how="outer")
+    return rates.reset_index().rename(columns={"index": "run_id"})
@@ -0,0 +1,70 @@
+"""Eventi di avanzamento di un'esecuzione della pipeline.
+
+Ogni run può avere un :class:`RunEventLog` che accoda eventi JSON (uno per
+riga) in ``events.jsonl`` e li inoltra agli eventuali sottoscrittori (es. lo
+stream del servizio HTTP). Il log attivo è propagato con una ``ContextVar``:
+flow, crew e :class:`LocalLLMTool` emettono eventi con :func:`emit_event` senza
+doverlo ricevere come parametro.
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+EventListener = Callable[[Dict[str, Any]], None]
+
+
+class RunEventLog:
+    """Registro append-only degli eventi di una run."""
+
+    def __init__(self, path: str | Path | None = None, run_id: Optional[str] = None) -> None:
+        self.path = Path(path) if path is not None else None
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.run_id = run_id
+        self._listeners: List[EventListener] = []
+        self._lock = threading.Lock()
+
+    def emit(self, kind: str, **data: Any) -> Dict[str, Any]:
+        event = {"ts": time.time(), "kind": kind, **data}
+        if self.run_id is not None:
+            event.setdefault("run_id", self.run_id)
+        line = json.dumps(event, ensure_ascii=False, default=str)
+        with self._lock:
+            if self.path is not None:
+                with open(self.path, "a", encoding="utf-8") as file:
+                    file.write(line + "\n")
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(event)
+        return event
+
+    def subscribe(self, listener: EventListener) -> None:
+        with self._lock:
+            self._listeners.append(listener)
+
+    def unsubscribe(self, listener: EventListener) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def read_all(self) -> List[Dict[str, Any]]:
+        """Rilegge gli eventi già scritti su file."""
+        if self.path is None or not self.path.exists():
+            return []
+        with open(self.path, "r", encoding="utf-8") as file:
+            return [json.loads(line) for line in file if line.strip()]
+
+
+current_run_events: ContextVar[Optional[RunEventLog]] = ContextVar("current_run_events", default=None)
+
+
+def emit_event(kind: str, **data: Any) -> None:
+    """Emette un evento sul log della run corrente, se presente."""
+    event_log = current_run_events.get()
+    if event_log is not None:
+        event_log.emit(kind, **data)
@@ -0,0 +1,141 @@
+"""Lettura incrementale delle run in corso, per la dashboard di monitoraggio.
+
+``events.jsonl`` è append-only: :class:`RunProgress` ricorda l'offset in byte già
+letto e a ogni aggiornamento legge solo le righe complete aggiunte nel frattempo,
+aggiornando contatori di avanzamento e latenze LLM senza rileggere il file.
+"""
+from __future__ import annotations
+
+import json
+import os
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+EVENTS_FILE = "events.jsonl"
+STATE_FILE = "state.json"
+TERMINAL_EVENTS = {"run_completed", "run_failed"}
+
+
+def tail_events(path: str | Path, offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+    """Eventi scritti dopo ``offset`` e nuovo offset.
+
+    Una riga non ancora terminata da ``\\n`` (scrittura in corso) viene lasciata
+    alla lettura successiva. Se il file è più corto dell'offset (ricreato) si
+    riparte dall'inizio.
+    """
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return [], 0
+    if size < offset:
+        offset = 0
+    if size == offset:
+        return [], offset
+    with open(path, "rb") as file:
+        file.seek(offset)
+        chunk = file.read(size - offset)
+    complete = chunk.rfind(b"\n") + 1
+    events = []
+    for line in chunk[:complete].splitlines():
+        try:
+            events.append(json.loads(line))
+        except ValueError:
+            continue
+    return events, offset + complete
+
+
+@dataclass
+class RunProgress:
+    """Stato di avanzamento di una run ricostruito dai suoi eventi."""
+
+    run_dir: Path
+    offset: int = 0
+    title: str = ""
+    status: str = "in attesa"
+    stage: str = ""
+    sections_total: int = 0
+    sections_written: List[str] = field(default_factory=list)
+    sections_edited: List[str] = field(default_factory=list)
+    reviews_done: int = 0
+    reviews_total: int = 0
+    code_reviews: int = 0
+    code_reviews_skipped: int = 0
+    started_at: Optional[float] = None
+    last_event_at: Optional[float] = None
+    last_event: str = ""
+    error: Optional[str] = None
+    llm_latencies: Dict[str, Deque[float]] = field(default_factory=lambda: defaultdict(lambda: deque(maxlen=500)))
+
+    @property
+    def active(self) -> bool:
+        return self.status == "in corso"
+
+    def refresh(self) -> int:
+        """Legge i nuovi eventi; ritorna quanti ne ha applicati."""
+        events, self.offset = tail_events(self.run_dir / EVENTS_FILE, self.offset)
+        for event in events:
+            self.apply(event)
+        return len(events)
+
+    def apply(self, event: Dict[str, Any]) -> None:
+        kind = event.get("kind", "")
+        self.last_event, self.last_event_at = kind, event.get("ts", self.last_event_at)
+        if kind == "run_started":
+            self.status = "in corso"
+            self.started_at = self.started_at or event.get("ts")
+            self.title = event.get("title", self.title)
+            self.sections_total = event.get("sections", self.sections_total) or self.sections_total
+        elif kind == "structure_ready":
+            self.sections_total = event.get("sections", self.sections_total)
+        elif kind == "section_written":
+            if event.get("section") not in self.sections_written:
+                self.sections_written.append(event.get("section"))
+            self.sections_total = event.get("total", self.sections_total)
+        elif kind == "section_edited":
+            self.sections_edited.append(event.get("section"))
+        elif kind == "review_completed":
+            self.reviews_done = event.get("index", self.reviews_done + 1)
+            self.reviews_total = event.get("total", self.reviews_total)
+        elif kind == "code_reviewed":
+            self.code_reviews += 1
+            self.code_reviews_skipped += bool(event.get("skipped"))
+        elif kind == "llm_call":
+            self.llm_latencies[event.get("model", "?")].append(float(event.get("seconds", 0.0)))
+        elif kind == "stage_completed":
+            self.stage = event.get("stage", self.stage)
+        elif kind in TERMINAL_EVENTS:
+            self.status = "completata" if kind == "run_completed" else "fallita"
+            self.error = event.get("error")
+
+    def latency_summary(self) -> List[Dict[str, Any]]:
+        """Chiamate, media e p95 della latenza per modello."""
+        rows = []
+        for model, values in sorted(self.llm_latencies.items()):
+            ordered = sorted(values)
+            rows.append({
+                "modello": model,
+                "chiamate": len(ordered),
+                "media_s": round(sum(ordered) / len(ordered), 2),
+                "p95_s": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 2),
+                "ultima_s": round(values[-1], 2),
+            })
+        return rows
+
+
+def list_run_dirs(root: str | Path) -> List[Tuple[str, float]]:
+    """Cartelle di run sotto ``root`` (nome, mtime di ``events.jsonl``), dalla più recente."""
+    runs = []
+    try:
+        entries = list(os.scandir(root))
+    except OSError:
+        return []
+    for entry in entries:
+        if not entry.is_dir():
+            continue
+        try:
+            runs.append((entry.name, os.stat(os.path.join(entry.path, EVENTS_FILE)).st_mtime))
+        except OSError:
+            continue
+    return sorted(runs, key=lambda item: item[1], reverse=True)
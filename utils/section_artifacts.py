@@ -0,0 +1,116 @@
+"""Pubblicazione progressiva delle sezioni durante la run.
+
+Ogni sezione viene scritta in ``<run_dir>/sections/`` appena è definitiva per
+uno stage: la bozza (``NN-<slug>.draft.md``) quando testo e codice della
+sezione sono completi nel ``WritingArticleFlow``, la versione finale
+(``NN-<slug>.final.md``) quando l'``EditingFlow`` l'ha rivista. ``manifest.json``
+elenca lo stato di ogni sezione (``pending``/``draft``/``final``) con percorso
+e sha256 dei file, e viene sostituito atomicamente dopo ogni file scritto: chi
+lo legge vede sempre un manifest completo che punta a file già scritti.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from utils.markdown_utils import MarkdownUtils
+from utils.run_events import emit_event
+
+MANIFEST_FILE = "manifest.json"
+ABSTRACT = "Abstract"
+STAGES = ("draft", "final")
+
+
+def _slug(text: str, max_len: int = 60) -> str:
+    slug = re.sub(r"[^\w\s-]", "", text, flags=re.UNICODE)
+    slug = re.sub(r"[\s_-]+", "-", slug).strip("-").lower()
+    return slug[:max_len] or "sezione"
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(text, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+class SectionArtifactWriter:
+    """Scrive le sezioni man mano che diventano definitive e ne tiene il manifest."""
+
+    def __init__(self, output_dir: str | Path) -> None:
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._manifest: Dict[str, Any] = {"status": "pending", "title": "", "sections": []}
+
+    def start(self, title: str, structure: List[str]) -> None:
+        """Inizializza il manifest con abstract e sezioni in attesa."""
+        with self._lock:
+            self._manifest = {
+                "status": "running",
+                "title": title,
+                "started_at": time.time(),
+                "sections": [
+                    {"index": index, "name": name, "status": "pending", "draft": None, "final": None}
+                    for index, name in enumerate([ABSTRACT] + list(structure))
+                ],
+            }
+            self._write_manifest()
+
+    def emit(
+        self,
+        stage: str,
+        section: str,
+        text: str,
+        code_snippets: Optional[Dict[str, List[str]]] = None,
+        code_instructions: Optional[Dict[str, List[str]]] = None,
+    ) -> Path:
+        """Pubblica la versione ``stage`` (``"draft"`` o ``"final"``) di ``section``.
+
+        Gli snippet vengono abbinati ai marker per istruzione (vedi :meth:`MarkdownUtils.inject_code`)."""
+        if stage not in STAGES:
+            raise ValueError(f"Stage non supportato: {stage}. Opzioni valide: {STAGES}.")
+        with self._lock:
+            entry = next((item for item in self._manifest["sections"] if item["name"] == section), None)
+            if entry is None:
+                raise ValueError(f"Sezione '{section}' non presente nel manifest.")
+            body = text.strip() if section == ABSTRACT else MarkdownUtils.inject_code(
+                text.strip(), section, code_snippets or {}, code_instructions
+            )
+            content = f"## {section}\n\n{body}\n"
+            path = self.output_dir / f"{entry['index']:02d}-{_slug(section)}.{stage}.md"
+            _write_atomic(path, content)
+            entry[stage] = {
+                "path": path.name,
+                "sha256": hashlib.sha256(content.encode("utf-8")).hexdigest(),
+                "written_at": time.time(),
+            }
+            # Una bozza arrivata dopo la versione finale non la declassa
+            if entry["status"] != "final":
+                entry["status"] = stage
+            self._write_manifest()
+        emit_event("section_artifact", section=section, stage=stage, path=str(path))
+        return path
+
+    def complete(self, markdown_path: Optional[str] = None) -> None:
+        with self._lock:
+            self._manifest.update(status="completed", completed_at=time.time(), markdown_path=markdown_path)
+            self._write_manifest()
+
+    def fail(self, error: str) -> None:
+        with self._lock:
+            self._manifest.update(status="failed", error=error)
+            self._write_manifest()
+
+    def manifest(self) -> Dict[str, Any]:
+        with self._lock:
+            return json.loads(json.dumps(self._manifest))
+
+    def _write_manifest(self) -> None:
+        self._manifest["updated_at"] = time.time()
+        _write_atomic(self.output_dir / MANIFEST_FILE, json.dumps(self._manifest, ensure_ascii=False, indent=2))
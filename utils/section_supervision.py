@@ -0,0 +1,104 @@
+"""Supervisione per sezione avviata durante la scrittura (``overlap_supervision``).
+
+Di norma l'``EditingFlow`` parte solo a scrittura conclusa e i modelli dei
+supervisori restano fermi per tutta la fase di scrittura. In modalità
+sovrapposta il ``WritingArticleFlow`` consegna ogni sezione a
+:class:`SectionSupervisionBuffer` appena testo e codice sono definitivi (lo
+stesso momento in cui viene pubblicata la bozza): la review della sezione parte
+subito sull'event loop, in parallelo alla scrittura delle successive, e il
+risultato resta nel buffer. L'``EditingFlow`` esegue poi le review sull'intero
+articolo, attende le review di sezione ancora in corso e le aggiunge al report
+passato al consolidatore come voci ``Section_<nome>``.
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.async_crew import kickoff_crew
+from utils.config_loader import build_crew
+from utils.incremental import BuildCache, fingerprint
+from utils.logger import get_logger
+from utils.markdown_utils import MarkdownUtils
+from utils.run_events import emit_event
+
+logger = get_logger("EditingFlow")
+
+SECTION_SUPERVISOR = "section_supervisor"
+SECTION_SUPERVISION_TASK = "section_supervision_task"
+REPORT_PREFIX = "Section_"
+
+
+class SectionSupervisionBuffer:
+    """Review delle singole sezioni, avviate appena pronte e raccolte per il consolidatore.
+
+    ``agents`` e ``tasks`` sono quelli della crew di editing. Con ``build_cache``
+    le sezioni invariate rispetto alla run precedente riusano la loro review.
+    """
+
+    def __init__(
+        self,
+        agents: Dict[str, Any],
+        tasks: Dict[str, Any],
+        title: str,
+        build_cache: Optional[BuildCache] = None,
+    ) -> None:
+        if SECTION_SUPERVISOR not in agents or SECTION_SUPERVISION_TASK not in tasks:
+            raise ValueError(
+                f"La supervisione sovrapposta richiede l'agente '{SECTION_SUPERVISOR}' e il task '{SECTION_SUPERVISION_TASK}'."
+            )
+        self.agents = agents
+        self.tasks = tasks
+        self.title = title
+        self.build_cache = build_cache
+        self.records: Dict[str, Tuple[str, str]] = {}
+        self._pending: Dict[str, asyncio.Task] = {}
+        # L'agente section_supervisor è condiviso: una review di sezione alla volta
+        self._crew_lock = asyncio.Lock()
+
+    def submit(
+        self,
+        section: str,
+        text: str,
+        code_snippets: Optional[Dict[str, List[str]]] = None,
+        code_instructions: Optional[Dict[str, List[str]]] = None,
+    ) -> None:
+        """Avvia la review di ``section`` (da chiamare dall'event loop dei flow)."""
+        previous = self._pending.get(section)
+        if previous is not None and not previous.done():
+            previous.cancel()
+        section_text = MarkdownUtils.inject_code(text.strip(), section, code_snippets or {}, code_instructions)
+        self._pending[section] = asyncio.get_running_loop().create_task(self._review(section, section_text))
+
+    async def _review(self, section: str, section_text: str) -> None:
+        inputs = {"title": self.title, "section_name": section, "section_text": section_text}
+        digest = fingerprint(**inputs)
+        cached = self.build_cache.lookup(f"section_review:{section}", digest) if self.build_cache is not None else None
+        if cached is not None:
+            logger.info(f"♻️ Sezione {section} invariata: riuso la sua review della run precedente.")
+            review = cached["review"]
+        else:
+            logger.info(f"🕵️ Review della sezione {section} avviata durante la scrittura.")
+            async with self._crew_lock:
+                crew = build_crew(
+                    agents=self.agents,
+                    tasks=self.tasks,
+                    agent_keys=[SECTION_SUPERVISOR],
+                    task_keys=[SECTION_SUPERVISION_TASK],
+                )
+                result = await kickoff_crew(crew, inputs=inputs)
+            review = getattr(result, "raw", result)
+        self.records[section] = (digest, review)
+        emit_event("section_review_completed", section=section, reused=cached is not None)
+
+    async def collect(self) -> Dict[str, str]:
+        """Attende le review ancora in corso e le restituisce come voci del report di supervisione."""
+        if self._pending:
+            await asyncio.gather(*self._pending.values())
+        return {f"{REPORT_PREFIX}{section}": self.records[section][1] for section in self._pending}
+
+    def cancel(self) -> None:
+        """Annulla le review non ancora concluse (run fallita prima dell'editing)."""
+        for task in self._pending.values():
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,199 @@
+"""Output strutturati (liste/JSON) dei task: schema per il decoding vincolato e parser tollerante.
+
+Un task dichiara in ``tasks.yaml`` la chiave ``output_schema``, con il nome di uno
+schema di :data:`OUTPUT_SCHEMAS` oppure uno JSON Schema inline. Lo schema viene
+passato a Ollama come ``format``, così il modello può generare solo JSON valido
+per quello schema. Il parser resta comunque tollerante per i modelli o i server
+che ignorano il vincolo: accetta blocchi fenced, testo attorno al JSON, sintassi
+Python, virgole finali, output troncati ed elenchi puntati. In questo modo un
+problema di formattazione non costa una nuova esecuzione.
+"""
+from __future__ import annotations
+
+import ast
+import json
+import re
+from typing import Any, Dict, Iterator, List, Mapping, Optional
+
+SECTION_LIST_SCHEMA: Dict[str, Any] = {
+    "type": "array",
+    "items": {"type": "string"},
+    "minItems": 1,
+}
+
+REVIEW_REPORT_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "additionalProperties": {"type": "array", "items": {"type": "string"}},
+}
+
+OUTPUT_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    "section_list": SECTION_LIST_SCHEMA,
+    "review_report": REVIEW_REPORT_SCHEMA,
+}
+
+_FENCE_RE = re.compile(r"```[\w+-]*[^\n]*\n(.*?)(?:```|$)", re.DOTALL)
+_TRAILING_COMMA_RE = re.compile(r",\s*([\]}])")
+_LIST_ITEM_RE = re.compile(r"^\s*(?:[-*+•]|\d+[.)])\s+(.+?)\s*$", re.MULTILINE)
+
+
+class StructuredOutputError(ValueError):
+    """Nessuna interpretazione dell'output è conforme allo schema."""
+
+
+def resolve_output_schema(schema: Any) -> Optional[Dict[str, Any]]:
+    """Schema dichiarato in ``tasks.yaml``: nome registrato o JSON Schema inline."""
+    if schema is None:
+        return None
+    if isinstance(schema, str):
+        if schema not in OUTPUT_SCHEMAS:
+            raise ValueError(f"output_schema sconosciuto: {schema}. Opzioni valide: {sorted(OUTPUT_SCHEMAS)}.")
+        return OUTPUT_SCHEMAS[schema]
+    if isinstance(schema, Mapping) and "type" in schema:
+        return dict(schema)
+    raise ValueError(f"output_schema non valido: {schema!r}.")
+
+
+def _balanced_span(text: str, start: int) -> str:
+    """Da ``start`` fino alla parentesi di chiusura corrispondente (o fine testo se troncato)."""
+    closing = {"{": "}", "[": "]"}
+    stack: List[str] = []
+    quote: Optional[str] = None
+    escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if quote:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char in closing:
+            stack.append(closing[char])
+        elif stack and char == stack[-1]:
+            stack.pop()
+            if not stack:
+                return text[start:index + 1]
+    return text[start:]
+
+
+def _repair(fragment: str) -> str:
+    """Rimuove virgole finali e chiude stringhe e parentesi lasciate aperte da un output troncato."""
+    fragment = _TRAILING_COMMA_RE.sub(r"\1", fragment.strip())
+    stack: List[str] = []
+    in_string = escaped = False
+    for char in fragment:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+    if in_string:
+        fragment += '"'
+    fragment = re.sub(r"[,:]\s*$", "", fragment)
+    return _TRAILING_COMMA_RE.sub(r"\1", fragment + "".join(reversed(stack)))
+
+
+def _candidates(text: str, opener: Optional[str]) -> Iterator[str]:
+    yield text
+    for block in _FENCE_RE.findall(text):
+        yield block.strip()
+    openers = [opener] if opener else ["{", "["]
+    for char in openers:
+        start = text.find(char)
+        if start != -1:
+            yield _balanced_span(text, start)
+
+
+def _decode(fragment: str) -> Iterator[Any]:
+    try:
+        yield json.loads(fragment)
+    except ValueError:
+        pass
+    try:
+        yield ast.literal_eval(fragment)
+    except (SyntaxError, ValueError, TypeError, MemoryError, RecursionError):
+        pass
+    repaired = _repair(fragment)
+    if repaired != fragment:
+        try:
+            yield json.loads(repaired)
+        except ValueError:
+            pass
+
+
+def _coerce(value: Any, schema: Mapping[str, Any]) -> Any:
+    """Adatta ``value`` allo schema; solleva :class:`StructuredOutputError` se non è possibile."""
+    kind = schema.get("type")
+    if kind == "string":
+        if isinstance(value, (dict, list)) or value is None:
+            raise StructuredOutputError(f"Attesa una stringa, trovato {type(value).__name__}.")
+        return str(value).strip()
+    if kind == "array":
+        if isinstance(value, tuple):
+            value = list(value)
+        if isinstance(value, Mapping) and len(value) == 1:
+            # {"sections": [...]} al posto della lista
+            value = next(iter(value.values()))
+        if isinstance(value, str) and schema.get("items", {}).get("type") == "string":
+            value = [value]
+        if not isinstance(value, list):
+            raise StructuredOutputError(f"Attesa una lista, trovato {type(value).__name__}.")
+        items = [_coerce(item, schema.get("items", {})) for item in value]
+        items = [item for item in items if item != ""]
+        if len(items) < schema.get("minItems", 0):
+            raise StructuredOutputError(f"Attesi almeno {schema['minItems']} elementi, trovati {len(items)}.")
+        return items
+    if kind == "object":
+        if not isinstance(value, Mapping):
+            raise StructuredOutputError(f"Atteso un oggetto, trovato {type(value).__name__}.")
+        properties = schema.get("properties", {})
+        missing = [key for key in schema.get("required", []) if key not in value]
+        if missing:
+            raise StructuredOutputError(f"Chiavi obbligatorie mancanti: {missing}.")
+        extra = schema.get("additionalProperties", {})
+        return {
+            str(key): _coerce(item, properties.get(key, extra if isinstance(extra, Mapping) else {}))
+            for key, item in value.items()
+        }
+    return value
+
+
+def parse_structured_output(text: Any, schema: Mapping[str, Any]) -> Any:
+    """Interpreta ``text`` secondo ``schema``, provando dalla lettura più stretta alla più tollerante."""
+    if not isinstance(text, str):
+        text = json.dumps(text) if isinstance(text, (dict, list)) else str(text or "")
+    text = text.strip()
+    opener = {"array": "[", "object": "{"}.get(schema.get("type"))
+    last_error: Optional[StructuredOutputError] = None
+    for fragment in _candidates(text, opener):
+        for value in _decode(fragment):
+            try:
+                return _coerce(value, schema)
+            except StructuredOutputError as exc:
+                last_error = exc
+    if schema.get("type") == "array":
+        # Nessun JSON: elenco puntato o numerato
+        items = [item.strip("\"'` ") for item in _LIST_ITEM_RE.findall(text)]
+        if items:
+            return _coerce(items, schema)
+    raise StructuredOutputError(
+        f"Output non conforme allo schema: {last_error or 'nessun JSON riconoscibile'} — {text[:200]!r}"
+    )
+
+
+def render_review_report(report: Mapping[str, List[str]]) -> str:
+    """Report consolidato in Markdown (stabile, per il prompt dell'editor)."""
+    return "\n\n".join(
+        f"### {section}\n" + "\n".join(f"- {item}" for item in items) for section, items in report.items()
+    )